@@ -128,22 +128,29 @@ def check_connection():
 def receive_bluetooth_payload():
     ble_service.start()
     while True:
+        # Drain every queued payload, so a relay flush is stored in one commit
+        received: list[Emergency] = []
         payload: bytes | None = ble_service.receive_payload_nowait()
-        if payload:
-            # DB stuff
+        while payload:
             p: Payload = Payload.unpack_data(payload)
-            em: Emergency = Emergency(
-                emergency_id=p.emergency_id,
-                user_uuid=p.user_uuid,
-                severity=p.severity,
-                position=p.position,
-                emergency_type="Unknow",
-                description="Emergency from Bluetooth",
-                created_at=datetime.datetime.now(),
+            received.append(
+                Emergency(
+                    emergency_id=p.emergency_id,
+                    user_uuid=p.user_uuid,
+                    severity=p.severity,
+                    position=p.position,
+                    emergency_type="Unknow",
+                    description="Emergency from Bluetooth",
+                    created_at=datetime.datetime.now(),
+                )
             )
+            payload = ble_service.receive_payload_nowait()
+
+        if received:
+            # DB stuff
             dbm = db.DatabaseManager.get_instance()
             try:
-                dbm.insert_emergency(em)
+                dbm.insert_emergencies_many(received, assign_ids=True)
             except Exception as e:
                 print(e)
         time.sleep(0.5)
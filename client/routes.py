@@ -6,8 +6,8 @@ import requests
 import random
 import json
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, abort, jsonify
-from common.models.db import DatabaseManager
+from flask import render_template, request, redirect, url_for, abort, jsonify, Response
+from common.models.db import DatabaseManager, PageCursor
 
 import client
 from client import network
@@ -16,12 +16,8 @@ from common.models.emergency import Emergency
 from common.services import crypto
 
 CLOUD_URL = "http://127.0.0.1:8000"
-
-# --- IN-MEMORY STORAGE (Replaces DatabaseManager) ---
-# These act as a local cache for the running session.
-# Data is lost when the client app restarts.
-LOCAL_USER_CACHE = None
-LOCAL_EMERGENCY_CACHE = {}  # Format: {emergency_id: EmergencyObject}
+# Emergencies shown per page on the Rescuer dashboard
+RESCUER_PAGE_SIZE = 50
 
 
 def rescuer_only(route):
@@ -121,8 +117,6 @@ def welcome():
 
 @client.app.route("/registration/", methods=["GET", "POST"])
 def registration():
-    global LOCAL_USER_CACHE
-
     if client.ENC_CIPHER is not None:
         return redirect(url_for("index"))
 
@@ -156,7 +150,7 @@ def registration():
 
             try:
                 b_type = BloodType[request.form.get("bloodtype")]
-                LOCAL_USER_CACHE = client.USER = User(
+                client.USER = User(
                     uuid=client.UUID,
                     is_rescuer=is_rescuer,
                     name=request.form.get("name"),
@@ -196,19 +190,17 @@ def myemergencies():
         return render_template("error.html", user=client.USER, status_code=500), 500
 
 
-@client.app.route("/emergency/<emergency_id>", methods=["GET"])
+@client.app.route("/emergency/<int:emergency_id>", methods=["GET"])
 @login_required
 def emergency_details(emergency_id):
     try:
-        em = LOCAL_EMERGENCY_CACHE.get(emergency_id)
-        if not em:
-            db = DatabaseManager.get_instance()
-            em = db.get_emergency_by_id(client.UUID, emergency_id)
+        db = DatabaseManager.get_instance()
+        em = db.get_emergency_by_id(client.UUID, emergency_id)
 
-            if not em:
-                return render_template(
-                    "error.html", user=client.USER, status_code=404
-                ), 404
+        if not em:
+            return render_template(
+                "error.html", user=client.USER, status_code=404
+            ), 404
 
         return render_template(
             "emergency_status.html", user=client.USER, single_emergency=em
@@ -218,19 +210,17 @@ def emergency_details(emergency_id):
         return render_template("error.html", user=client.USER, status_code=500), 500
 
 
-@client.app.route("/edit/<emergency_id>", methods=["GET", "POST"])
+@client.app.route("/edit/<int:emergency_id>", methods=["GET", "POST"])
 @login_required
 def emergency_update(emergency_id):
     try:
-        em = LOCAL_EMERGENCY_CACHE.get(emergency_id)
-        if not em:
-            db = DatabaseManager.get_instance()
-            em = db.get_emergency_by_id(client.UUID, emergency_id)
+        db = DatabaseManager.get_instance()
+        em = db.get_emergency_by_id(client.UUID, emergency_id)
 
-            if not em:
-                return render_template(
-                    "error.html", user=client.USER, status_code=404
-                ), 404
+        if not em:
+            return render_template(
+                "error.html", user=client.USER, status_code=404
+            ), 404
     except Exception as e:
         client.app.logger.error(f"Get emergency error: {traceback.format_exc()}")
         return render_template("error.html", user=client.USER, status_code=500), 500
@@ -258,8 +248,6 @@ def emergency_update(emergency_id):
                 f"{CLOUD_URL}/emergency/update/", json=payload, timeout=5
             ).raise_for_status()
 
-            LOCAL_EMERGENCY_CACHE[em.emergency_id] = em
-
             return redirect(url_for("index"))
         except:
             client.app.logger.error(f"Update emergency error: {traceback.format_exc()}")
@@ -317,8 +305,6 @@ def new_emergency():
                 f"{CLOUD_URL}/emergency/submit/", json=payload, timeout=5
             ).raise_for_status()
 
-            LOCAL_EMERGENCY_CACHE[out] = temp_em
-
             return redirect(url_for("rescuee_home"))
 
         except Exception as e:
@@ -339,7 +325,8 @@ def rescuer_home():
         try:
             em_id = int(request.form.get("emergency_id"))
 
-            target_em = LOCAL_EMERGENCY_CACHE.get(em_id)
+            dbm = DatabaseManager.get_instance()
+            target_em = dbm.get_emergency_by_id(request.form.get("user_uuid"), em_id)
             if not target_em:
                 abort(404)
 
@@ -363,26 +350,53 @@ def rescuer_home():
             client.app.logger.error(f"Accept Error: {traceback.format_exc()}")
             return render_template("error.html", user=client.USER, status_code=500), 500
 
-    ems = list()
+    after = None
+    if request.args.get("after"):
+        try:
+            after = PageCursor.decode(request.args.get("after"))
+        except ValueError:
+            abort(400)
+
     dbm = DatabaseManager.get_instance()
-    ems_from_db = dbm.get_emergencies()
+    emergencies_list, next_cursor = dbm.get_emergency_summaries(
+        after, page_size=RESCUER_PAGE_SIZE
+    )
 
-    emergencies_list = list(ems_from_db)
     return render_template(
-        "rescuer_home.html", user=client.USER, received_emergencies=emergencies_list
+        "rescuer_home.html",
+        user=client.USER,
+        received_emergencies=emergencies_list,
+        next_page=next_cursor.encode() if next_cursor else None,
     )
 
 
+@client.app.route("/photo/<photo_hash>", methods=["GET"])
+@rescuer_only
+def photo(photo_hash):
+    dbm = DatabaseManager.get_instance()
+    size = dbm.get_photo_size(photo_hash)
+    if size is None:
+        abort(404)
+
+    response = Response(dbm.iter_photo(photo_hash), mimetype="image/jpeg")
+    response.content_length = size
+    # NOTE: Content-addressed, the bytes behind a hash never change
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
 @client.app.route("/rescuee/")
 @login_required
 def rescuee_home():
     if not client.UUID:
         return redirect(url_for("welcome"))
 
-    my_emergencies = [
-        e for e in LOCAL_EMERGENCY_CACHE.values() if e.user_uuid == client.UUID
-    ]
-    last_emergency = my_emergencies[-1] if my_emergencies else None
+    db = DatabaseManager.get_instance()
+    my_emergencies = db.get_emergencies_by_user_uuid(client.UUID)
+    last_emergency = max(
+        my_emergencies, key=lambda e: (e.created_at, e.emergency_id), default=None
+    )
 
     return render_template(
         "rescuee_home.html", user=client.USER, last_emergency=last_emergency
@@ -393,7 +407,7 @@ def rescuee_home():
 def emergency_receive():
     """
     Callback from Cloud to push data to the client.
-    Stores data in the global in-memory dictionary.
+    Stores the emergency in the local database.
     """
     try:
         data = request.get_json()
@@ -408,8 +422,6 @@ def emergency_receive():
         db = DatabaseManager.get_instance()
         db.insert_emergency_from_rescuee(emergency)
 
-        LOCAL_EMERGENCY_CACHE[emergency.emergency_id] = emergency
-
         return jsonify(
             {"message": "Emergency received", "id": emergency.emergency_id}
         ), 200
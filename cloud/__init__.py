@@ -1,3 +1,4 @@
+import atexit
 import logging
 import datetime
 import os
@@ -5,7 +6,7 @@ import os
 from flask import Flask
 from flask.logging import default_handler
 from common.services import emergency_queue, crypto
-from common.models import db
+from common.models import db, storage
 from pathlib import Path
 
 
@@ -16,7 +17,40 @@ CLIENTS = dict()
 # subset of CLIENTS
 RESCUERS = dict()
 
-db.DatabaseManager.get_instance(Path(os.getenv("DB_DIR", None)) / Path(os.getenv("DB_NAME", None)))
+# NOTE: PostgreSQL only moves the data to a server, the state above still
+# lives in this process, which is why gunicorn runs a single worker
+if os.getenv("DATABASE_URL"):
+    from common.models.postgres import PostgresStorage
+
+    storage.use_storage(PostgresStorage.get_instance(os.getenv("DATABASE_URL")))
+else:
+    db.DatabaseManager.get_instance(Path(os.getenv("DB_DIR", None)) / Path(os.getenv("DB_NAME", None)))
+
+from . import persistence
+
+# Opt-in: requests return before their writes are committed
+if os.getenv("PERSISTENCE_WRITE_BEHIND") == "1":
+    persistence.enable_write_behind()
+    atexit.register(persistence.disable_write_behind)
+
+# Opt-in: archives resolved emergencies and vacuums the database periodically
+if os.getenv("DB_MAINTENANCE_INTERVAL"):
+    # NOTE: The archive and the vacuum work on the SQLite file, a PostgreSQL
+    # server vacuums itself
+    if os.getenv("DATABASE_URL"):
+        raise ValueError(
+            "DB_MAINTENANCE_INTERVAL only applies to the SQLite database, unset it or DATABASE_URL"
+        )
+
+    db.DatabaseManager.get_instance().start_maintenance(
+        interval=float(os.getenv("DB_MAINTENANCE_INTERVAL")),
+        on_report=lambda report: app.logger.info(f"Database maintenance: {report}"),
+        on_error=lambda e: app.logger.error(f"Database maintenance error: {e}"),
+    )
+
+# Opt-in: pending emergencies keep their place in line across restarts
+if os.getenv("EMERGENCY_QUEUE_JOURNAL") == "1":
+    emergency_queue.EmergencyQueue.get_instance().enable_journal(storage.get_storage())
 
 # not subject to race conditions
 SKEY_PATH = Path(os.getenv("CERTIFICATE_DIR", None)) / Path(os.getenv("SIGNING_KEY_NAME", None))
@@ -47,7 +81,7 @@ def init_certificate_and_skey():
 def init_clients():
     global CLIENTS, RESCUERS
 
-    dbm = db.DatabaseManager.get_instance()
+    dbm = storage.get_storage()
 
     for user in dbm.get_users():
         uuid = user.uuid
@@ -60,7 +94,10 @@ init_certificate_and_skey()
 
 gunicorn_logger = logging.getLogger("gunicorn.error")
 app.logger.removeHandler(default_handler)
-app.logger.addHandler(gunicorn_logger)
+# NOTE: The handlers, not the logger itself: a logger used as a handler passes
+# every record on to its own parents, which already got it by propagation
+for handler in gunicorn_logger.handlers:
+    app.logger.addHandler(handler)
 app.logger.setLevel(gunicorn_logger.level)
 
 from . import routes
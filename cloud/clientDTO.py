@@ -10,3 +10,5 @@ class ClientDTO:
     cloud_nonce: bytes
     is_rescuer: bool
     busy: bool = False
+    # Last known (lat, lon), sent by rescuers to /rescuer/position/
+    position: tuple[float, float] | None = None
@@ -6,7 +6,14 @@ bind = "0.0.0.0:8000"
 
 # Worker settings
 #workers = 2 * multiprocessing.cpu_count() + 1
+# NOTE: A single worker, whatever the database. The connected clients and
+# their session keys (cloud.CLIENTS, cloud.RESCUERS), the emergency queues and
+# the database caches live in the memory of the worker process, and another
+# worker would not see them. Running several workers needs that state moved
+# out of process first; until then requests are served concurrently by the
+# threads of this worker, which share it
 workers = 1
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
 
 # Logging
 accesslog = os.getenv("LOGS_DIR") + "/access.log"
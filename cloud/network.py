@@ -1,45 +1,152 @@
 import base64
+import os
+import traceback
 import requests
 
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import cloud
 
 from common.models import emergency, enc_emergency
-from common.services import crypto, emergency_queue
+from common.services import crypto, emergency_queue, geo_queue
+
+# Maximum distance, in meters, between a Rescuer and the emergencies
+# dispatched to them by `dispatch_nearby_emergencies`
+DISPATCH_RADIUS = float(os.getenv("DISPATCH_RADIUS", "10000"))
+# Seconds to wait for a Rescuer to answer before giving up on the send
+SEND_TIMEOUT = 3
+
+# Runs `dispatch_nearby_emergencies` off the request threads. A single
+# thread, so two dispatches never match the same idle Rescuers
+_DISPATCHER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dispatcher")
 
-def broadcast_emergency_to_rescuers(emergency: emergency.Emergency):
+def send_emergency_to_rescuer(rescuer, emergency: emergency.Emergency):
+    """
+    Send an emergency to a Rescuer, encrypted for them
+
+    Args:
+        rescuer (ClientDTO): Rescuer to send the emergency to
+        emergency (Emergency): emergency to send
+    """
+
+    encrypted_emergency = enc_emergency.EncryptedEmergency(
+        emergency_id=emergency.emergency_id,
+        user_uuid=emergency.user_uuid,
+        severity=emergency.severity,
+        routing_info_json="",  # unnecessary in this case
+        blob=crypto.encrypt(
+            rescuer.enc_cipher, rescuer.cloud_nonce, emergency.pack(), b""
+        ),
+        created_at=emergency.created_at,
+    )
+
+    resp = requests.post(
+        "http://" + rescuer.ip + "/emergency/receive",
+        json={
+            "encrypted_emergency": base64.b64encode(
+                str(encrypted_emergency.to_db_tuple()).encode()
+            ).decode()
+        },
+        timeout=SEND_TIMEOUT,
+    )
+    resp.raise_for_status()
+
+def broadcast_emergency_to_rescuers(emergency: emergency.Emergency) -> int:
     """
     Broadcast an emergency to available Rescuers
 
+    A Rescuer that cannot be reached is logged and skipped.
+
     Args:
         emergency (Emergency): emergency to send to Rescuers
+
+    Returns:
+        int: Number of Rescuers the emergency was sent to
     """
 
-    for rescuer in cloud.RESCUERS.values():
+    sent = 0
+    for rescuer in list(cloud.RESCUERS.values()):
         if rescuer.busy:
             continue
 
-        encrypted_emergency = enc_emergency.EncryptedEmergency(
-            emergency_id=emergency.emergency_id,
-            user_uuid=emergency.user_uuid,
-            severity=emergency.severity,
-            routing_info_json="",  # unnecessary in this case
-            blob=crypto.encrypt(
-                rescuer.enc_cipher, rescuer.cloud_nonce, emergency.pack(), b""
-            ),
-            created_at=emergency.created_at,
-        )
+        try:
+            send_emergency_to_rescuer(rescuer, emergency)
+        except Exception:
+            cloud.app.logger.error(traceback.format_exc())
+            continue
+        sent += 1
+
+    return sent
+
+def dispatch_nearby_emergencies(
+    radius: float = DISPATCH_RADIUS,
+) -> list[tuple[str, emergency.Emergency]]:
+    """
+    Send each idle Rescuer the most urgent queued emergency near them.
+
+    Rescuers are matched to emergencies by `GeoEmergencyQueue.match_rescuers`.
+    A Rescuer sent an emergency is marked busy, and the emergency leaves the
+    `EmergencyQueue` too. An emergency that could not be sent goes back to
+    the geographic queue.
+
+    Args:
+        radius (float): Maximum distance between a Rescuer and the emergency
+            sent to them, in meters
+
+    Returns:
+        list[tuple[str, Emergency]]: UUID of the Rescuer and emergency of
+        each emergency sent
+    """
 
-        resp = requests.post(
-            "http://" + rescuer.ip + "/emergency/receive",
-            json={
-                "encrypted_emergency": base64.b64encode(
-                    str(encrypted_emergency.to_db_tuple()).encode()
-                ).decode()
-            },
+    geo = geo_queue.GeoEmergencyQueue.get_instance()
+    queue = emergency_queue.EmergencyQueue.get_instance()
+
+    sent = []
+    for uuid, matched in geo.match_rescuers(cloud.RESCUERS, radius):
+        rescuer = cloud.RESCUERS.get(uuid)
+        try:
+            if rescuer is None:
+                raise Exception("Rescuer disconnected")
+            send_emergency_to_rescuer(rescuer, matched)
+        except Exception:
+            cloud.app.logger.error(traceback.format_exc())
+            geo.push_emergency(matched)
+            continue
+
+        rescuer.busy = True
+        try:
+            queue.remove_emergency(matched)
+        except ValueError:
+            pass  # already dispatched from the EmergencyQueue
+        sent.append((uuid, matched))
+
+    return sent
+
+def _log_dispatch_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        cloud.app.logger.error(
+            "Dispatch of nearby emergencies failed", exc_info=future.exception()
         )
 
+def schedule_dispatch(radius: float = DISPATCH_RADIUS) -> Future:
+    """
+    Runs `dispatch_nearby_emergencies` in the background, so a slow or
+    unreachable Rescuer does not hold up the request that triggered it.
+
+    Args:
+        radius (float): See `dispatch_nearby_emergencies`
+
+    Returns:
+        Future: Resolved with the result of `dispatch_nearby_emergencies`
+    """
+
+    future = _DISPATCHER.submit(dispatch_nearby_emergencies, radius)
+    future.add_done_callback(_log_dispatch_failure)
+    return future
+
 def sync_new_emergency(
     emergency: emergency.Emergency | enc_emergency.EncryptedEmergency,
+    locate: bool = True,
 ) -> None:
     """
     Synchronizes a new emergency with the priority queue.
@@ -51,8 +158,37 @@ def sync_new_emergency(
     Args:
         emergency (Emergency | EncryptedEmergency): The emergency instance to
             be synchronized and queued.
+        locate (bool): Whether to also queue the emergency for
+            `dispatch_nearby_emergencies`. False if Rescuers already received
+            it, so they do not get it twice.
+    """
+
+    queue = emergency_queue.EmergencyQueue.get_instance()
+
+    queue.push_emergency(emergency, source="cloud")
+
+    # NOTE: Emergencies without a known position are only in the EmergencyQueue
+    if (
+        locate
+        and not isinstance(emergency, enc_emergency.EncryptedEmergency)
+        and emergency.position != geo_queue.UNKNOWN_POSITION
+    ):
+        geo_queue.GeoEmergencyQueue.get_instance().push_emergency(emergency)
+
+def withdraw_emergency(
+    emergency: emergency.Emergency | enc_emergency.EncryptedEmergency,
+) -> None:
+    """
+    Removes an emergency taken in charge by a Rescuer from the queues.
+
+    Args:
+        emergency (Emergency | EncryptedEmergency): The emergency, found by
+            user UUID and emergency ID.
     """
 
-    queue = emergency_queue.get_instance()
+    try:
+        emergency_queue.EmergencyQueue.get_instance().remove_emergency(emergency)
+    except ValueError:
+        pass  # not queued
 
-    queue.push_emergency(emergency)
+    geo_queue.GeoEmergencyQueue.get_instance().remove_emergency(emergency)
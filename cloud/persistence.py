@@ -1,96 +1,383 @@
-from common.models import db, enc_emergency, user, emergency
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Callable
 
+import functools
+import logging
+import queue
+import threading
+import time
 
-def save_user(user: user.User) -> None:
+from common.models import storage, enc_emergency, user, emergency
+
+# Most mutations committed together by the write-behind writer
+WRITE_BEHIND_MAX_BATCH = 256
+# Seconds the writer waits for more mutations before committing a batch
+WRITE_BEHIND_MAX_DELAY = 0.002
+
+# Tells the writer thread to exit once the mutations before it are committed
+_STOP = object()
+
+# NOTE: A child of the Flask app logger, "cloud"
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindWriter:
+    """
+    Commits mutations from a dedicated writer thread.
+
+    Callers enqueue a mutation with `submit` and get back a `Future` right
+    away, without waiting on SQLite. The writer takes up to `max_batch`
+    queued mutations, waiting at most `max_delay` seconds for more to arrive,
+    and runs them in a single `Storage.transaction()`, so a burst of
+    requests pays for one commit. Mutations are committed in submission
+    order.
+
+    Each future is resolved once the transaction containing its mutation is
+    committed, which is the durability acknowledgement. A mutation that
+    fails gets the error in its future and is left out of the commit, the
+    rest of its batch is committed.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = WRITE_BEHIND_MAX_BATCH,
+        max_delay: float = WRITE_BEHIND_MAX_DELAY,
+    ) -> None:
+        if max_batch < 1:
+            raise ValueError("'max_batch' must be at least 1")
+
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self.__queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.__closed = False
+        self.__lock = threading.Lock()
+        self.__thread = threading.Thread(
+            target=self.__run, name="persistence-writer", daemon=True
+        )
+        self.__thread.start()
+
+    def submit(self, method: Callable, *args) -> Future:
+        """
+        Enqueues a mutation for the writer thread.
+
+        Args:
+            method (Callable): A write method of the `Storage`.
+            *args: The arguments of `method`.
+
+        Returns:
+            Future: Resolved with the result of `method` once its changes are
+            committed, or with the error it raised.
+
+        Raises:
+            RuntimeError: If the writer has been closed.
+        """
+
+        future = Future()
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("Cannot submit to a closed writer")
+            self.__queue.put((method, args, future))
+
+        return future
+
+    def flush(self, timeout: float | None = None) -> None:
+        """
+        Waits until every mutation submitted so far is committed.
+
+        Args:
+            timeout (float | None): Maximum number of seconds to wait, or
+                None to wait indefinitely.
+
+        Raises:
+            TimeoutError: If the mutations are not committed in time.
+        """
+
+        # NOTE: A barrier is an empty mutation, resolved after the ones before it
+        self.submit(lambda: None).result(timeout)
+
+    def close(self, timeout: float | None = None) -> None:
+        """
+        Commits the pending mutations and stops the writer thread.
+
+        Args:
+            timeout (float | None): Maximum number of seconds to wait, or
+                None to wait indefinitely.
+
+        Raises:
+            TimeoutError: If the writer thread does not stop in time.
+        """
+
+        with self.__lock:
+            if not self.__closed:
+                self.__closed = True
+                self.__queue.put(_STOP)
+
+        self.__thread.join(timeout)
+        if self.__thread.is_alive():
+            raise TimeoutError(f"Writer still running after {timeout} seconds")
+
+    def __next_batch(self) -> tuple[list, bool]:
+        batch = []
+        item = self.__queue.get()
+        deadline = time.monotonic() + self.max_delay
+
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) == self.max_batch:
+                return batch, False
+
+            try:
+                item = self.__queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return batch, False
+
+        return batch, True
+
+    def __commit(self, batch: list) -> None:
+        results = []
+        try:
+            with storage.get_storage().transaction():
+                for method, args, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+
+                    try:
+                        results.append((future, method(*args), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            # NOTE: Nothing was committed, every mutation of the batch failed
+            for method, args, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def __run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self.__next_batch()
+            if batch:
+                self.__commit(batch)
+
+
+# Write-behind writer used by the functions of this module, if enabled
+_WRITER: WriteBehindWriter | None = None
+
+
+def enable_write_behind(
+    max_batch: int = WRITE_BEHIND_MAX_BATCH,
+    max_delay: float = WRITE_BEHIND_MAX_DELAY,
+) -> None:
+    """
+    Switches the functions of this module to write-behind mode.
+
+    From now on they return as soon as the mutation is queued, and the
+    mutation is committed later by a `WriteBehindWriter`. Errors are no
+    longer raised to the caller, they are set in the returned future.
+
+    Args:
+        max_batch (int): Most mutations committed together.
+        max_delay (float): Seconds the writer waits for more mutations
+            before committing a batch.
+
+    Raises:
+        RuntimeError: If write-behind mode is already enabled.
+    """
+
+    global _WRITER
+
+    if _WRITER is not None:
+        raise RuntimeError("Write-behind mode is already enabled")
+
+    _WRITER = WriteBehindWriter(max_batch, max_delay)
+
+
+def disable_write_behind(timeout: float | None = None) -> None:
+    """
+    Commits the pending mutations and goes back to synchronous writes.
+
+    Meant to be called on shutdown. Does nothing if write-behind mode is not
+    enabled.
+
+    Args:
+        timeout (float | None): Maximum number of seconds to wait, or None
+            to wait indefinitely.
+
+    Raises:
+        TimeoutError: If the pending mutations are not committed in time.
+    """
+
+    global _WRITER
+
+    if _WRITER is not None:
+        writer, _WRITER = _WRITER, None
+        writer.close(timeout)
+
+
+def flush(timeout: float | None = None) -> None:
+    """
+    Waits until every mutation submitted so far is committed.
+
+    Does nothing if write-behind mode is not enabled, since synchronous
+    writes are committed before returning.
+
+    Args:
+        timeout (float | None): Maximum number of seconds to wait, or None
+            to wait indefinitely.
+
+    Raises:
+        TimeoutError: If the mutations are not committed in time.
+    """
+
+    if _WRITER is not None:
+        _WRITER.flush(timeout)
+
+
+def _log_failure(name: str, future: Future) -> None:
+    """
+    Logs the error of a failed write-behind mutation.
+    """
+
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Write-behind {name} failed", exc_info=future.exception())
+
+
+def _write(method: Callable, *args) -> Future:
+    """
+    Runs a write method of the `Storage` in the current mode.
+
+    In write-behind mode a failed mutation is logged, since callers such as
+    the routes do not wait for the future.
+
+    Returns:
+        Future: Resolved once the mutation is committed. In synchronous mode
+        it is already resolved, and errors are raised directly.
+    """
+
+    if _WRITER is not None:
+        future = _WRITER.submit(method, *args)
+        future.add_done_callback(functools.partial(_log_failure, method.__name__))
+        return future
+
+    future = Future()
+    future.set_result(method(*args))
+    return future
+
+
+def save_user(user: user.User) -> Future:
     """
     Persists a user to the database.
 
     This function stores the given `User` instance in the database by
-    delegating the operation to the `DatabaseManager`.
+    delegating the operation to the `Storage`.
 
     Args:
         user (user.User): The User instance to be persisted in the database.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while inserting the user into the
             database.
     """
-    dbm = db.DatabaseManager.get_instance()
-    dbm.insert_user(user)
+    dbm = storage.get_storage()
+    return _write(dbm.insert_user, user)
 
 
-def update_user(uuid: str, user: user.User) -> None:
+def update_user(uuid: str, user: user.User) -> Future:
     """
     Updates an existing user in the database.
 
     This function updates the user identified by the given UUID using the
     values provided by the `User` instance. The update operation is delegated
-    to the `DatabaseManager`.
+    to the `Storage`.
 
     Args:
         uuid (str): The UUID of the user to update.
         user (user.User): A User instance containing the updated values.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while updating the user in the
             database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.update_user(uuid, user)
+    dbm = storage.get_storage()
+    return _write(dbm.update_user, uuid, user)
 
 
-def delete_user(uuid: str) -> None:
+def delete_user(uuid: str) -> Future:
     """
     Deletes a user from the database.
 
     This function removes the user identified by the given UUID from the
-    database by delegating the operation to the `DatabaseManager`.
+    database by delegating the operation to the `Storage`.
 
     Args:
         uuid (str): The UUID of the user to delete.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while deleting the user from the
             database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.delete_user(uuid)
+    dbm = storage.get_storage()
+    return _write(dbm.delete_user, uuid)
 
 
-def save_emergency(emergency: emergency.Emergency) -> None:
+def save_emergency(emergency: emergency.Emergency) -> Future:
     """
     Persists an emergency to the database.
 
     This function stores the given `Emergency` instance in the database by
-    delegating the operation to the `DatabaseManager`.
+    delegating the operation to the `Storage`.
     The emergency is persisted until it is resolved or explicitly removed.
 
     Args:
         emergency (emergency.Emergency): The Emergency instance to be
             persisted in the database.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while inserting the emergency into
             the database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.insert_emergency(emergency)
+    dbm = storage.get_storage()
+    return _write(dbm.insert_emergency, emergency)
 
 
 def update_emergency(
     user_uuid: str,
     emergency_id: int,
     emergency: emergency.Emergency,
-) -> None:
+) -> Future:
     """
     Updates an emergency record in the database.
 
     This function updates the data of an emergency associated with the
     given user UUID and emergency ID by delegating the operation to the
-    `DatabaseManager`.
+    `Storage`.
 
     Args:
         user_uuid (str): The UUID of the user associated with the
@@ -100,68 +387,80 @@ def update_emergency(
         emergency (emergency.Emergency): An Emergency instance containing
             the updated data.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while updating the emergency into
             the database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.update_emergency(user_uuid, emergency_id, emergency)
+    dbm = storage.get_storage()
+    return _write(dbm.update_emergency, user_uuid, emergency_id, emergency)
 
 
-def delete_emergency(user_uuid: str, emergency_id: int):
+def delete_emergency(user_uuid: str, emergency_id: int) -> Future:
     """
     Deletes an emergency from the database.
 
     This function removes a specific emergency associated with the given
     user UUID and emergency ID by delegating the operation to the
-    `DatabaseManager`.
+    `Storage`.
 
     Args:
         user_uuid (str): The UUID of the user associated with the request.
         emergency_id (int): The unique identifier of the emergency request
         to delete.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while deleting the request from the
             database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.delete_emergency(user_uuid, emergency_id)
+    dbm = storage.get_storage()
+    return _write(dbm.delete_emergency, user_uuid, emergency_id)
 
 
-def save_encrypted_emergency(enc_emergency: enc_emergency.EncryptedEmergency) -> None:
+def save_encrypted_emergency(enc_emergency: enc_emergency.EncryptedEmergency) -> Future:
     """Persists an encrypted emergency to the database.
 
     This function stores the given `EncryptedEmergency` instance in the database by
-    delegating the operation to the `DatabaseManager`.
+    delegating the operation to the `Storage`.
     The encrypted emergency is persisted until it is resolved or explicitly removed.
 
     Args:
         enc_emergency (enc_emergency.EncryptedEmergency): The EncryptedEmergency instance
         to be persisted in the database.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while inserting the encrypted emergency into
             the database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.insert_encrypted_emergency(enc_emergency)
+    dbm = storage.get_storage()
+    return _write(dbm.insert_encrypted_emergency, enc_emergency)
 
 
 def update_encrypted_emergency(
     user_uuid: str,
     emergency_id: int,
     enc_emergency: enc_emergency.EncryptedEmergency,
-) -> None:
+) -> Future:
     """
     Updates an encrypted emergency record in the database.
 
     This function updates the encrypted data of an emergency associated with
     the given user UUID and emergency ID by delegating the operation to the
-    `DatabaseManager`.
+    `Storage`.
 
     Args:
         user_uuid (str): The UUID of the user associated with the encrypted
@@ -171,32 +470,42 @@ def update_encrypted_emergency(
         enc_emergency (enc_emergency.EncryptedEmergency): An
             EncryptedEmergency instance containing the updated encrypted data.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while updating the encrypted
             emergency in the database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.update_encrypted_emergency(user_uuid, emergency_id, enc_emergency)
+    dbm = storage.get_storage()
+    return _write(
+        dbm.update_encrypted_emergency, user_uuid, emergency_id, enc_emergency
+    )
 
 
-def delete_encrypted_emergency(user_uuid: str, emergency_id: int):
+def delete_encrypted_emergency(user_uuid: str, emergency_id: int) -> Future:
     """
     Deletes an encrypted emergency from the database.
 
     This function removes a specific encrypted emergency associated with the
     given user UUID and emergency ID by delegating the operation to the
-    `DatabaseManager`.
+    `Storage`.
 
     Args:
         user_uuid (str): The UUID of the user associated with the request.
         emergency_id (int): The unique identifier of the encrypted emergency
             request to delete.
 
+    Returns:
+        Future: Resolved once the change is committed (see
+        `enable_write_behind`).
+
     Raises:
         sqlite3.Error: If an error occurs while deleting the request from the
             database.
     """
 
-    dbm = db.DatabaseManager.get_instance()
-    dbm.delete_encrypted_emergency(user_uuid, emergency_id)
+    dbm = storage.get_storage()
+    return _write(dbm.delete_encrypted_emergency, user_uuid, emergency_id)
@@ -126,7 +126,10 @@ def emergency_submit() -> tuple[Any, int]:
             decrypted_blob,
         )
 
-        network.broadcast_emergency_to_rescuers(emergency)
+        # NOTE: Only an emergency no Rescuer received is left to the
+        # dispatch by position, so nobody gets it twice
+        sent = network.broadcast_emergency_to_rescuers(emergency)
+        network.sync_new_emergency(emergency, locate=sent == 0)
 
         app.logger.debug(data)
         return jsonify(
@@ -192,6 +195,7 @@ def emergency_accept() -> tuple[Any, int]:
             return jsonify({"error": f"Internal server error: {traceback.format_exc()}"}), 500
 
         rescuer.busy = True
+        network.withdraw_emergency(encrypted_emergency)
 
         app.logger.debug(data)
         return jsonify(
@@ -437,7 +441,8 @@ def pkey() -> tuple[Any, int]:
                 client_dto.client_nonce,
                 client_dto.cloud_nonce,
                 client_dto.is_rescuer,
-                client_dto.busy
+                client_dto.busy,
+                client_dto.position,
                 )
 
         if uuid in cloud.RESCUERS:
@@ -448,7 +453,8 @@ def pkey() -> tuple[Any, int]:
                 client_dto.client_nonce,
                 client_dto.cloud_nonce,
                 client_dto.is_rescuer,
-                client_dto.busy
+                client_dto.busy,
+                client_dto.position,
                 )
 
 
@@ -461,6 +467,37 @@ def pkey() -> tuple[Any, int]:
         return jsonify({"error": f"Internal server error: {traceback.format_exc()}"}), 500
 
 
+@app.route("/rescuer/position/", methods=["POST"])
+def rescuer_position() -> tuple[Any, int]:
+    """Update the position of a rescuer"""
+    try:
+        data, error_response = get_validated_json()
+        if error_response:
+            app.logger.error(error_response)
+            return error_response
+
+        uuid: Optional[str] = data.get("uuid")
+        lat, lon = data.get("lat"), data.get("lon")
+
+        if not uuid or lat is None or lon is None:
+            app.logger.error("Missing required fields")
+            return jsonify({"error": "Missing required fields"}), 400
+
+        if uuid not in cloud.RESCUERS:
+            raise Exception("Rescuer uuid not found")
+
+        cloud.RESCUERS[uuid].position = (float(lat), float(lon))
+
+        # NOTE: A Rescuer reporting their position may have come within reach
+        # of a queued emergency
+        network.schedule_dispatch()
+
+        return jsonify({"message": "Position updated"}), 200
+    except Exception:
+        app.logger.error(traceback.format_exc())
+        return jsonify({"error": f"Internal server error: {traceback.format_exc()}"}), 500
+
+
 @app.route("/health/", methods=["GET"])
 def health_check() -> tuple[Response, int]:
     return jsonify({"message": "Cloud is healthy"}), 200
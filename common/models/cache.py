@@ -0,0 +1,156 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+import threading
+import time
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """
+    Counters of a cache since it was created.
+
+    Attributes:
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to load the value.
+        evictions (int): Entries dropped to stay within `max_size`.
+        expirations (int): Entries dropped because they outlived `ttl`.
+        size (int): Entries currently held.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the lookups answered from the cache, 0 if there were none."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A thread-safe read-through cache bounded in size and age.
+
+    Values are loaded on a miss by the loader given to `get_or_load`. When
+    the cache is full the least recently used entry is evicted, and entries
+    older than `ttl` seconds are loaded again.
+
+    A value loaded while its source is being changed could be stale by the
+    time it is stored. Every `invalidate` therefore bumps a generation, and a
+    load that overlapped an invalidation returns its value without storing
+    it.
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None) -> None:
+        if max_size < 1:
+            raise ValueError("'max_size' must be at least 1")
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.__lock = threading.Lock()
+        # Key to (value, expiry), least recently used first
+        self.__entries: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self.__generation = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    def __lookup(self, key: K) -> tuple[bool, V | None]:
+        # NOTE: Called with the lock held
+        entry = self.__entries.get(key)
+        if entry is None:
+            return False, None
+
+        value, expiry = entry
+        if expiry < time.monotonic():
+            del self.__entries[key]
+            self.__expirations += 1
+            return False, None
+
+        self.__entries.move_to_end(key)
+        return True, value
+
+    def get_or_load(self, key: K, loader: Callable[[], V | None]) -> V | None:
+        """
+        Returns the cached value of `key`, loading and caching it on a miss.
+
+        Args:
+            key (K): The key to look up.
+            loader (Callable[[], V | None]): Loads the value. Called without
+                the lock held. A None result is returned but not cached.
+
+        Returns:
+            V | None: The value.
+        """
+
+        with self.__lock:
+            found, value = self.__lookup(key)
+            if found:
+                self.__hits += 1
+                return value
+            self.__misses += 1
+            generation = self.__generation
+
+        value = loader()
+        if value is None:
+            return None
+
+        with self.__lock:
+            if generation == self.__generation:
+                self.__store(key, value)
+
+        return value
+
+    def __store(self, key: K, value: V) -> None:
+        # NOTE: Called with the lock held
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self.__entries[key] = (value, expiry)
+        self.__entries.move_to_end(key)
+
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+            self.__evictions += 1
+
+    def invalidate(self, *keys: K) -> None:
+        """
+        Drops the given keys, so the next lookups load them again.
+        """
+
+        with self.__lock:
+            self.__generation += 1
+            for key in keys:
+                self.__entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drops every entry.
+        """
+
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.clear()
+
+    def stats(self) -> CacheStats:
+        """
+        Returns the counters of the cache.
+        """
+
+        with self.__lock:
+            return CacheStats(
+                hits=self.__hits,
+                misses=self.__misses,
+                evictions=self.__evictions,
+                expirations=self.__expirations,
+                size=len(self.__entries),
+            )
@@ -1,42 +1,752 @@
 from __future__ import annotations
-from typing import List, Self
-
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Self
+
+import base64
+import binascii
+import copy
+import hashlib
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import date, datetime, timedelta
 from common.models import emergency, user, enc_emergency
+from common.models.cache import LRUCache
+from common.models.geometry import bounding_box, haversine
+from common.models.pool import ConnectionPool
+from common.models.statements import StatementConnection, StatementRegistry
+from common.models.storage import (
+    DEFAULT_PAGE_SIZE,
+    PHOTO_CHUNK_SIZE,
+    BatchResult,
+    Change,
+    PageCursor,
+    Storage,
+)
+
+# Maximum number of read-only connections opened towards a database file
+DEFAULT_POOL_SIZE = 8
+# NOTE: SQLite admits a single writer at a time, more write connections would
+# only contend on the database lock
+WRITER_POOL_SIZE = 1
+# Seconds a caller waits for a free connection before giving up
+POOL_TIMEOUT = 30.0
+# Primary keys looked up per statement when checking a batch for conflicts.
+# Keeps composite keys under SQLite's default limit of 999 bound parameters
+BATCH_KEY_CHUNK = 450
+# Rows moved to the archive per transaction by `run_maintenance`
+ARCHIVE_BATCH_SIZE = 500
+# Seconds between two runs of the background maintenance
+MAINTENANCE_INTERVAL = 3600.0
+# Users and emergencies kept in memory by `get_user_by_uuid` and
+# `get_emergency_by_id`
+USER_CACHE_SIZE = 1024
+EMERGENCY_CACHE_SIZE = 4096
+# Seconds a cached row is served before being read again. Bounds how stale a
+# row can get when another process writes the same database file
+CACHE_TTL = 300.0
+
+
+def _split_photo(
+    values: tuple,
+) -> tuple[tuple, tuple[str, bytes, int] | None]:
+    """
+    Moves the photo of an emergency row out of the row.
+
+    Photos are stored once, as raw bytes, in the `photo` table keyed by their
+    SHA-256 hash, and the emergency row only references the hash. A photo
+    that is not canonical base64 cannot be restored from its bytes, so it is
+    kept verbatim in the `photo_b64` column instead.
+
+    Args:
+        values (tuple): An emergency row as returned by
+            `Emergency.to_db_tuple`.
+
+    Returns:
+        tuple[tuple, tuple[str, bytes, int] | None]: The row to store, with
+        `photo_b64` cleared and `photo_hash` appended, and the
+        `(hash, data, size)` row of the `photo` table, or None if there is no
+        photo to store.
+    """
+
+    photo_b64 = values[7]
+    if not photo_b64:
+        return (*values, None), None
+
+    try:
+        data = base64.b64decode(photo_b64, validate=True)
+    except (binascii.Error, ValueError):
+        return (*values, None), None
+
+    if base64.b64encode(data).decode() != photo_b64:
+        return (*values, None), None
+
+    photo_hash = hashlib.sha256(data).hexdigest()
+    row = (*values[:7], None, *values[8:], photo_hash)
+
+    return row, (photo_hash, data, len(data))
+
+
+def _b64encode(data: bytes | None) -> str | None:
+    # NOTE: Registered on every connection as the SQL function b64encode()
+    return base64.b64encode(data).decode() if data is not None else None
+
+
+def _adapt_datetime(value: datetime) -> str:
+    # NOTE: Always with microseconds, so stored timestamps sort as strings
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _convert_date(value: bytes) -> date | datetime:
+    # NOTE: DATE columns hold either a day (birthday) or a timestamp
+    text = value.decode()
+    if len(text) == 10:
+        return date.fromisoformat(text)
+    return datetime.fromisoformat(text)
+
+
+# Applied to every connection opened with `detect_types=PARSE_DECLTYPES`
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATE", _convert_date)
+
+# Name to member, looked up without going through `Enum.__getitem__`
+_BLOOD_TYPES = dict(user.BloodType.__members__)
+
+# Columns read by the row factories below, in the order they expect them
+_USER_COLUMNS = """uuid, is_rescuer, name, surname, birthday, blood_type,
+    health_info_json"""
+_EMERGENCY_COLUMNS = """emergency_id, user_uuid, lat, lon, address, city, street_number,
+    place_description,
+    IFNULL((SELECT b64encode(data) FROM photo WHERE hash = photo_hash), photo_b64),
+    severity, resolved, emergency_type, description, details_json, created_at, photo_hash"""
+# NOTE: Same positions as `_EMERGENCY_COLUMNS`, the heavy fields are replaced
+# by flags telling if they are set
+_EMERGENCY_SUMMARY_COLUMNS = """emergency_id, user_uuid, lat, lon, address, city,
+    street_number, place_description,
+    photo_hash IS NOT NULL OR IFNULL(photo_b64, '') != '',
+    severity, resolved, emergency_type, description, IFNULL(details_json, '') != '',
+    created_at, photo_hash"""
+_ENCRYPTED_EMERGENCY_COLUMNS = """emergency_id, user_uuid, severity, routing_info_json,
+    blob, created_at"""
+
+
+def _user_row(cursor: sqlite3.Cursor, row: tuple) -> user.User:
+    """
+    Row factory building a `User` from the `_USER_COLUMNS` of a row.
+    """
+
+    uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json = row
+    return user.User(
+        uuid,
+        is_rescuer == 1,
+        name,
+        surname,
+        birthday,
+        _BLOOD_TYPES[blood_type],
+        health_info_json,
+    )
+
+
+def _emergency_fields(row: tuple) -> dict:
+    """
+    Maps the `_EMERGENCY_COLUMNS` of a row to `Emergency` keyword arguments.
+    """
+
+    (
+        emergency_id,
+        user_uuid,
+        lat,
+        lon,
+        address,
+        city,
+        street_number,
+        place_description,
+        photo_b64,
+        severity,
+        resolved,
+        emergency_type,
+        description,
+        details_json,
+        created_at,
+        photo_hash,
+    ) = row
+
+    return dict(
+        emergency_id=emergency_id,
+        user_uuid=user_uuid,
+        position=(lat, lon),
+        address=address,
+        city=city,
+        street_number=street_number,
+        place_description=place_description,
+        photo_b64=photo_b64,
+        severity=severity,
+        resolved=resolved == 1,  # If True the emergency is resolved
+        emergency_type=emergency_type,
+        description=description,
+        details_json=details_json,
+        created_at=created_at,
+        photo_hash=photo_hash or "",
+    )
+
+
+def _emergency_row(cursor: sqlite3.Cursor, row: tuple) -> emergency.Emergency:
+    """
+    Row factory building an `Emergency` from the `_EMERGENCY_COLUMNS` of a row.
+    """
+
+    return emergency.Emergency(**_emergency_fields(row))
+
+
+def _encrypted_emergency_row(
+    cursor: sqlite3.Cursor, row: tuple
+) -> enc_emergency.EncryptedEmergency:
+    """
+    Row factory building an `EncryptedEmergency` from the
+    `_ENCRYPTED_EMERGENCY_COLUMNS` of a row.
+    """
+
+    emergency_id, user_uuid, severity, routing_info_json, blob, created_at = row
+    return enc_emergency.EncryptedEmergency(
+        emergency_id=emergency_id,
+        user_uuid=user_uuid,
+        severity=severity,
+        routing_info_json=routing_info_json,
+        blob=blob,
+        created_at=created_at,
+    )
+
+
+def _mapped(
+    conn: sqlite3.Connection, row_factory: Callable[[sqlite3.Cursor, tuple], object]
+) -> sqlite3.Cursor:
+    """
+    Opens a cursor on `conn` whose rows are built by `row_factory`.
+    """
+
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory
+    return cursor
+
+
+def _migrate_photos_to_blobs(conn: sqlite3.Connection) -> None:
+    """
+    Creates the `photo` table and moves the existing photos into it.
+    """
+
+    conn.execute(
+        """
+        CREATE TABLE photo (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("ALTER TABLE emergency ADD COLUMN photo_hash TEXT")
+    conn.execute("CREATE INDEX idx_emergency_photo_hash ON emergency (photo_hash)")
+
+    select_query = """
+        SELECT rowid, photo_b64 FROM emergency
+        WHERE rowid > ? AND IFNULL(photo_b64, '') != ''
+        ORDER BY rowid
+        LIMIT 100
+    """
+
+    # NOTE: Walks the table in small batches, to never hold every photo
+    last_rowid = 0
+    while rows := conn.execute(select_query, (last_rowid,)).fetchall():
+        for rowid, photo_b64 in rows:
+            _, photo = _split_photo((None,) * 7 + (photo_b64,))
+            if photo is not None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO photo (hash, data, size) VALUES (?, ?, ?)",
+                    photo,
+                )
+                conn.execute(
+                    "UPDATE emergency SET photo_b64 = NULL, photo_hash = ? WHERE rowid = ?",
+                    (photo[0], rowid),
+                )
+
+        last_rowid = rows[-1][0]
+
+
+def _split_position(position: str) -> tuple[float, float]:
+    """
+    Parses a position serialized by `Emergency.to_db_tuple`.
+
+    Args:
+        position (str): The position, as "lat,lon".
+
+    Returns:
+        tuple[float, float]: The latitude and longitude.
+
+    Raises:
+        ValueError: If `position` is not made of two numbers.
+    """
+
+    lat, lon = position.split(",")
+    return float(lat), float(lon)
+
+
+def _migrate_positions_to_coordinates(conn: sqlite3.Connection) -> None:
+    """
+    Replaces the "lat,lon" text position with REAL columns and indexes them.
+    """
+
+    conn.execute("ALTER TABLE emergency ADD COLUMN lat REAL NOT NULL DEFAULT 0.0")
+    conn.execute("ALTER TABLE emergency ADD COLUMN lon REAL NOT NULL DEFAULT 0.0")
+    conn.execute(
+        """
+        UPDATE emergency
+        SET lat = CAST(substr(position, 1, instr(position, ',') - 1) AS REAL),
+        lon = CAST(substr(position, instr(position, ',') + 1) AS REAL)
+        WHERE instr(position, ',') > 0
+        """
+    )
+    conn.execute("ALTER TABLE emergency DROP COLUMN position")
+
+    # NOTE: Points are stored as zero-area boxes, keyed by the emergency rowid
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE emergency_rtree
+        USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER emergency_rtree_insert AFTER INSERT ON emergency
+        BEGIN
+            INSERT INTO emergency_rtree VALUES (new.rowid, new.lat, new.lat, new.lon, new.lon);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER emergency_rtree_update AFTER UPDATE OF lat, lon ON emergency
+        BEGIN
+            UPDATE emergency_rtree
+            SET min_lat = new.lat, max_lat = new.lat, min_lon = new.lon, max_lon = new.lon
+            WHERE id = new.rowid;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER emergency_rtree_delete AFTER DELETE ON emergency
+        BEGIN
+            DELETE FROM emergency_rtree WHERE id = old.rowid;
+        END
+        """
+    )
+    conn.execute(
+        "INSERT INTO emergency_rtree SELECT rowid, lat, lat, lon, lon FROM emergency"
+    )
+
+
+def _migrate_write_clock(conn: sqlite3.Connection) -> None:
+    """
+    Adds the timestamp of the last write to the emergency tables, and moves
+    the release of unreferenced photos into triggers.
+    """
+
+    conn.execute("ALTER TABLE emergency ADD COLUMN updated_at DATE")
+    conn.execute("ALTER TABLE encrypted_emergency ADD COLUMN updated_at DATE")
+
+    # NOTE: Any write replacing or deleting a photo reference, upserts
+    # included, drops the photo once nothing references it
+    conn.execute(
+        """
+        CREATE TRIGGER photo_release_update AFTER UPDATE OF photo_hash ON emergency
+        WHEN old.photo_hash IS NOT NULL AND old.photo_hash IS NOT new.photo_hash
+        BEGIN
+            DELETE FROM photo
+            WHERE hash = old.photo_hash
+            AND NOT EXISTS (SELECT 1 FROM emergency WHERE photo_hash = old.photo_hash);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER photo_release_delete AFTER DELETE ON emergency
+        WHEN old.photo_hash IS NOT NULL
+        BEGIN
+            DELETE FROM photo
+            WHERE hash = old.photo_hash
+            AND NOT EXISTS (SELECT 1 FROM emergency WHERE photo_hash = old.photo_hash);
+        END
+        """
+    )
+
+
+def _migrate_change_log(conn: sqlite3.Connection) -> None:
+    """
+    Creates the append-only log of the changes to the emergency tables.
+    """
+
+    # NOTE: AUTOINCREMENT, so a sequence number is never handed out twice,
+    # even after the newest entries are pruned
+    conn.execute(
+        """
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            emergency_id INTEGER NOT NULL,
+            user_uuid TEXT NOT NULL,
+
+            CHECK (op IN ('insert', 'update', 'delete'))
+        )
+        """
+    )
+
+    for table in ("emergency", "encrypted_emergency"):
+        conn.execute(
+            f"""
+            CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, op, emergency_id, user_uuid)
+                VALUES ('{table}', 'insert', new.emergency_id, new.user_uuid);
+            END
+            """
+        )
+        # NOTE: A changed primary key is logged as a delete of the old key
+        conn.execute(
+            f"""
+            CREATE TRIGGER {table}_log_update AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, op, emergency_id, user_uuid)
+                SELECT '{table}', 'delete', old.emergency_id, old.user_uuid
+                WHERE old.emergency_id IS NOT new.emergency_id
+                OR old.user_uuid IS NOT new.user_uuid;
+
+                INSERT INTO change_log (table_name, op, emergency_id, user_uuid)
+                VALUES ('{table}', 'update', new.emergency_id, new.user_uuid);
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, op, emergency_id, user_uuid)
+                VALUES ('{table}', 'delete', old.emergency_id, old.user_uuid);
+            END
+            """
+        )
+
+
+def _migrate_timestamps_to_microseconds(conn: sqlite3.Connection) -> None:
+    """
+    Rewrites every `created_at` in the format of `_adapt_datetime`.
+
+    Rows written before the adapter was registered hold the default format
+    of Python or of CURRENT_TIMESTAMP, without a fractional part when it
+    would be zero. Timestamps are compared as strings by the keyset
+    pagination, where "12:00:00" sorts before "12:00:00.000000".
+    """
+
+    # NOTE: The rewrite changes no value, it must not reach the change log
+    last_seq = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    for table in ("emergency", "encrypted_emergency"):
+        # NOTE: CAST, so the DATE converter does not parse the value
+        rows = conn.execute(
+            f"""
+            SELECT emergency_id, user_uuid, CAST(created_at AS TEXT)
+            FROM {table}
+            WHERE created_at IS NOT NULL
+            """
+        ).fetchall()
+
+        rewritten = []
+        for emergency_id, user_uuid, created_at in rows:
+            try:
+                value = _adapt_datetime(datetime.fromisoformat(created_at))
+            except ValueError:
+                continue
+            if value != created_at:
+                rewritten.append((value, emergency_id, user_uuid))
+
+        conn.executemany(
+            f"UPDATE {table} SET created_at = ? WHERE emergency_id = ? AND user_uuid = ?",
+            rewritten,
+        )
+
+    conn.execute("DELETE FROM change_log WHERE seq > ?", (last_seq,))
+
+
+# Versioned schema changes applied, in order, on top of the base schema.
+# `PRAGMA user_version` stores how many of them a database has received.
+# A step is either a SQL script or a function receiving the connection.
+# NOTE: Never edit or reorder a released step, append a new one instead
+MIGRATIONS: list[str | Callable[[sqlite3.Connection], None]] = [
+    # 1: Secondary indexes for the access paths of the get_* methods
+    """
+    CREATE INDEX IF NOT EXISTS idx_user_is_rescuer ON user (is_rescuer);
+
+    CREATE INDEX IF NOT EXISTS idx_emergency_user_uuid ON emergency (user_uuid);
+
+    CREATE INDEX IF NOT EXISTS idx_emergency_triage
+    ON emergency (resolved, severity DESC, created_at);
+
+    CREATE INDEX IF NOT EXISTS idx_encrypted_emergency_user_uuid
+    ON encrypted_emergency (user_uuid);
+
+    CREATE INDEX IF NOT EXISTS idx_encrypted_emergency_triage
+    ON encrypted_emergency (severity DESC, created_at);
+    """,
+    # 2: Primary key tie-breakers in the triage indexes, for keyset pagination
+    """
+    DROP INDEX IF EXISTS idx_emergency_triage;
+
+    CREATE INDEX idx_emergency_triage
+    ON emergency (resolved, severity DESC, created_at, emergency_id, user_uuid);
+
+    DROP INDEX IF EXISTS idx_encrypted_emergency_triage;
+
+    CREATE INDEX idx_encrypted_emergency_triage
+    ON encrypted_emergency (severity DESC, created_at, emergency_id, user_uuid);
+    """,
+    # 3: Photos as raw bytes in a content-addressed table
+    _migrate_photos_to_blobs,
+    # 4: Numeric coordinates with an R*Tree spatial index
+    _migrate_positions_to_coordinates,
+    # 5: Last write timestamps for conflict resolution
+    _migrate_write_clock,
+    # 6: Change data capture for incremental sync
+    _migrate_change_log,
+    # 7: Journal of the emergencies waiting in the durable EmergencyQueue
+    """
+    CREATE TABLE IF NOT EXISTS queue_entry (
+        tier INTEGER NOT NULL,
+        user_uuid TEXT NOT NULL,
+        emergency_id INTEGER NOT NULL,
+        table_name TEXT NOT NULL,
+
+        PRIMARY KEY (tier, user_uuid, emergency_id),
+        CHECK (table_name IN ('emergency', 'encrypted_emergency'))
+    ) WITHOUT ROWID
+    """,
+    # 8: Timestamps in one format, so they compare correctly as strings
+    _migrate_timestamps_to_microseconds,
+]
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """
+    Tuning applied to every SQLite connection when it is opened.
+
+    Attributes:
+        journal_mode (str): Journal mode of the database file. "WAL" lets
+            readers proceed while a write transaction is committing.
+        synchronous (str): Durability level. "NORMAL" is safe in WAL mode and
+            only syncs at checkpoints instead of on every commit.
+        mmap_size (int): Bytes of the database file mapped in memory.
+        cache_size (int): Page cache size. Negative values are KiB, positive
+            values are pages.
+        busy_timeout (int): Milliseconds a connection waits on a locked
+            database before raising `sqlite3.OperationalError`.
+        auto_vacuum (str): Free page handling. "INCREMENTAL" lets
+            `DatabaseManager.run_maintenance` give the pages of deleted rows
+            back to the file system without rewriting the whole file. Only
+            takes effect on new databases; existing ones are converted by the
+            first maintenance run.
+        cached_statements (int): Compiled statements kept per connection.
+            Must exceed the number of distinct statements the hot paths run,
+            or they are compiled again on every call.
+        track_statements (bool): Count the executions, rows and time of every
+            statement in `DatabaseManager.statements`. Costs a few
+            microseconds per statement.
+    """
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -64 * 1024
+    busy_timeout: int = 5000
+    auto_vacuum: str = "INCREMENTAL"
+    cached_statements: int = 256
+    track_statements: bool = True
+
+    def apply(self, conn: sqlite3.Connection, read_only: bool = False) -> None:
+        """
+        Applies the profile to an open connection.
 
+        Args:
+            conn (sqlite3.Connection): The connection to configure.
+            read_only (bool): If True, skip the pragmas that write to the
+                database file (journal mode and synchronous) and forbid any
+                change through the connection.
+        """
 
-class DatabaseManager:
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            # NOTE: Before anything creates a table, or it is ignored
+            conn.execute(f"PRAGMA auto_vacuum = {self.auto_vacuum}")
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    Which emergencies `DatabaseManager.run_maintenance` moves to the archive.
+
+    Attributes:
+        resolved_after (timedelta): Resolved emergencies are archived once
+            they have not been written for this long.
+        max_age (timedelta | None): Emergencies, resolved or not, and
+            encrypted emergencies are archived once they were created this
+            long ago. None keeps them regardless of age.
+        archive_path (str | None): SQLite file receiving the archived rows.
+            Defaults to the database path with the ".archive.db" suffix.
+        batch_size (int): Rows moved per transaction, so writers are never
+            held back for long.
+    """
+
+    resolved_after: timedelta = timedelta(days=1)
+    max_age: timedelta | None = timedelta(days=30)
+    archive_path: str | None = None
+    batch_size: int = ARCHIVE_BATCH_SIZE
+
+
+@dataclass
+class MaintenanceReport:
+    """
+    Outcome of a maintenance run.
+
+    Attributes:
+        archived_emergencies (int): Emergencies moved to the archive.
+        archived_encrypted_emergencies (int): Encrypted emergencies moved to
+            the archive.
+        reclaimed_bytes (int): Bytes the database file shrank by.
+    """
+
+    archived_emergencies: int = 0
+    archived_encrypted_emergencies: int = 0
+    reclaimed_bytes: int = 0
+
+
+class DatabaseManager(Storage):
     __instance = None
     __allow_init = False
 
-    def __init__(self, db_path: str) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        profile: StorageProfile | None = None,
+    ) -> None:
         if not DatabaseManager.__allow_init:
             raise TypeError(
                 "DatabaseManager singleton must be created using DatabaseManager.get_instance"
             )
 
-        # NOTE: For multithreading
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        self.db_path = db_path
+        self.profile = profile or StorageProfile()
+        # Transaction opened by `transaction()` in the current thread, if any
+        self.__local = threading.local()
+        # Archive attached to the write connection by `run_maintenance`
+        self.__archive_path: str | None = None
+        # Thread and stop flag of `start_maintenance`
+        self.__maintenance: tuple[threading.Thread, threading.Event] | None = None
+        # Statements run through any connection, with their counters
+        self.statements = StatementRegistry()
+        # Read-through caches of the point lookups, invalidated by the writes
+        self.user_cache: LRUCache[str, user.User] = LRUCache(USER_CACHE_SIZE, CACHE_TTL)
+        self.emergency_cache: LRUCache[tuple[str, int], emergency.Emergency] = LRUCache(
+            EMERGENCY_CACHE_SIZE, CACHE_TTL
+        )
+
+        self.write_pool = ConnectionPool(
+            self.__connect, WRITER_POOL_SIZE, timeout=POOL_TIMEOUT
+        )
+
+        # NOTE: An in-memory database lives and dies with its connection, so
+        # readers and writers must share the only one there is
+        if str(db_path) == ":memory:":
+            self.read_pool = self.write_pool
+        else:
+            self.read_pool = ConnectionPool(
+                self.__connect_read_only, pool_size, timeout=POOL_TIMEOUT
+            )
+
+        # Creates the database file, the read-only connections need it
+        self.__init_db()
+
+    def __connection_factory(self) -> type[sqlite3.Connection]:
+        if self.profile.track_statements:
+            return StatementConnection
+        return sqlite3.Connection
+
+    def __track_statements(self, conn: sqlite3.Connection) -> None:
+        if isinstance(conn, StatementConnection):
+            conn.statements = self.statements
+
+    def __connect(self) -> sqlite3.Connection:
+        # NOTE: For multithreading. Pooled connections move between threads,
+        # but the pool never lends the same connection to two threads at once
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.profile.cached_statements,
+            factory=self.__connection_factory(),
+        )
+        self.__track_statements(conn)
         # Enable Foreign Key constraints. It's disabled by default
         # See: https://sqlite.org/foreignkeys.html "Overview" and "2. Enabling Foreign Key Support"
-        # self.conn.execute("PRAGMA foreign_keys = ON")
-        self.__init_db()
+        # conn.execute("PRAGMA foreign_keys = ON")
+        self.profile.apply(conn)
+        conn.create_function("b64encode", 1, _b64encode, deterministic=True)
+        return conn
+
+    def __connect_read_only(self) -> sqlite3.Connection:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.profile.cached_statements,
+            factory=self.__connection_factory(),
+        )
+        self.__track_statements(conn)
+        self.profile.apply(conn, read_only=True)
+        conn.create_function("b64encode", 1, _b64encode, deterministic=True)
+        return conn
 
     @classmethod
-    def get_instance(cls: type[Self], db_path: str | None = None) -> Self:
+    def get_instance(
+        cls: type[Self],
+        db_path: str | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        profile: StorageProfile | None = None,
+    ) -> Self:
         """
         Returns the singleton instance of DatabaseManager.
 
         This class method implements the Singleton pattern. On the first call,
         a database path must be provided to initialize the underlying SQLite
         connection. Subsequent calls will return the already-created instance
-        and will ignore the `db_path` parameter.
+        and will ignore the `db_path`, `pool_size` and `profile` parameters.
 
         Args:
             db_path (str | None): Path to the SQLite database file. This parameter
                 is required only on the first invocation.
+            pool_size (int): Maximum number of pooled read-only connections.
+                In-memory databases always use a single connection.
+            profile (StorageProfile | None): Pragmas applied to every
+                connection. Defaults to WAL journaling with `synchronous=NORMAL`.
 
         Returns:
             DatabaseManager: The singleton instance of the database manager.
@@ -50,14 +760,15 @@ class DatabaseManager:
                 raise ValueError("'db_path' required on first initialization")
 
             cls.__allow_init = True
-            cls.__instance = cls(db_path)
+            cls.__instance = cls(db_path, pool_size, profile)
             cls.__allow_init = False
 
         return cls.__instance
 
     def __init_db(self) -> None:
         """
-        Initialize the database by creating the schema.
+        Initialize the database by creating the schema and bringing it up to
+        date with `MIGRATIONS`.
         """
 
         schema: str = """
@@ -102,557 +813,2105 @@ class DatabaseManager:
 
             PRIMARY KEY (emergency_id, user_uuid)
         );
+
+        CREATE TABLE IF NOT EXISTS id_sequence (
+            name TEXT PRIMARY KEY,
+            next_id INTEGER NOT NULL
+        );
+
+        -- NOTE: Seeds the counter of databases created before the sequence.
+        -- MAX() reads the primary key index, it never scans the table
+        INSERT OR IGNORE INTO id_sequence (name, next_id)
+        SELECT 'emergency', IFNULL(MAX(emergency_id), 0) + 1 FROM emergency;
         """
 
-        for sub_query in schema.split(";"):
-            self.conn.execute(sub_query)
+        with self.__transaction() as conn:
+            for sub_query in schema.split(";"):
+                conn.execute(sub_query)
 
-        self.conn.commit()
+        self.__migrate()
 
-    def insert_user(self, user: user.User) -> None:
+    def __migrate(self) -> None:
         """
-        Inserts a User into the database.
+        Applies the steps of `MIGRATIONS` the database has not received yet.
 
-        The operation is wrapped in an explicit transaction:
-        the transaction is committed on success and rolled back if an error
-        occurs.
+        Every step runs in its own transaction together with the update of
+        `PRAGMA user_version`, so an interrupted upgrade resumes from the
+        first step that was not committed.
 
-        Args:
-            user (user.User): The User instance to be inserted into the database.
+        Raises:
+            sqlite3.Error: If a step fails, its transaction is rolled back and
+                the original database error is re-raised.
+        """
+
+        with self.write_pool.connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.__transaction() as conn:
+                if callable(step):
+                    step(conn)
+                else:
+                    for sub_query in step.split(";"):
+                        conn.execute(sub_query)
+
+                conn.execute(f"PRAGMA user_version = {number}")
+
+    @contextmanager
+    def __transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrows the write connection and wraps the block in a transaction.
+
+        The transaction is started with `BEGIN IMMEDIATE`, so concurrent
+        writers queue on the database lock instead of failing midway. It is
+        committed on success and rolled back if an error occurs.
+
+        Inside `transaction()` the block joins the transaction already open
+        in the thread, within a savepoint: a failing block undoes only its own
+        changes and the outer transaction goes on.
+
+        Yields:
+            sqlite3.Connection: The connection owning the transaction.
 
         Raises:
-            sqlite3.Error: If the insertion fails, the transaction is rolled back
-                and the original database error is re-raised.
+            sqlite3.Error: If any statement fails, the transaction (or the
+                savepoint) is rolled back and the original database error is
+                re-raised.
         """
 
-        insert_query: str = "INSERT INTO user(uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json) VALUES(?, ?, ?, ?, ?, ?, ?)"
+        conn = getattr(self.__local, "conn", None)
+        if conn is not None:
+            conn.execute("SAVEPOINT write")
+            try:
+                yield conn
+                conn.execute("RELEASE write")
+            except Exception:
+                conn.execute("ROLLBACK TO write")
+                conn.execute("RELEASE write")
+                raise
+            return
+
+        with self.write_pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Groups the write methods called in the block into one transaction.
+
+        The writes are committed together when the block exits, paying for a
+        single commit, or rolled back together if the block raises. A write
+        method that fails inside the block only undoes its own changes; the
+        error propagates and the caller decides whether to go on. Blocks can
+        be nested.
+
+        Getters must not be called inside the block: they do not see its
+        uncommitted writes, and on an in-memory database they wait for the
+        connection the block holds.
+
+        The cache entries of the rows written in the block are invalidated
+        once more when the outermost block exits, so a concurrent getter
+        cannot keep serving the rows read before the commit.
+
+        Raises:
+            sqlite3.Error: If the transaction cannot be started or committed.
+        """
+
+        outer = getattr(self.__local, "conn", None)
+        if outer is None:
+            self.__local.invalidated = []
 
-        # Begin transaction
-        self.conn.execute("BEGIN")
         try:
-            self.conn.execute(insert_query, user.to_db_tuple())
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+            with self.__transaction() as conn:
+                self.__local.conn = conn
+                try:
+                    yield
+                finally:
+                    self.__local.conn = outer
+        finally:
+            if outer is None:
+                invalidated, self.__local.invalidated = self.__local.invalidated, None
+                for cache, keys in invalidated:
+                    cache.invalidate(*keys)
+
+    def __invalidate(self, cache: LRUCache, *keys) -> None:
+        """
+        Drops written rows from a cache, once the write has been committed.
 
-    def insert_emergency(self, emergency: emergency.Emergency) -> int | None:
+        Inside `transaction()` the keys are invalidated again when the
+        outermost block exits.
         """
-        Inserts an Emergency into the database.
 
-        The operation is wrapped in an explicit transaction:
-        the transaction is committed on success and rolled back if an error
-        occurs.
+        cache.invalidate(*keys)
+        invalidated = getattr(self.__local, "invalidated", None)
+        if invalidated is not None:
+            invalidated.append((cache, keys))
+
+    def __allocate_emergency_ids(
+        self, conn: sqlite3.Connection, count: int = 1
+    ) -> int:
+        """
+        Reserves a block of consecutive emergency IDs.
+
+        The `emergency` counter of the `id_sequence` table is advanced by
+        `count` with a single `UPDATE ... RETURNING`, so no scan of the
+        `emergency` table is needed. Running inside the caller's write
+        transaction, concurrent allocations can never hand out the same ID,
+        and a rolled back transaction gives its IDs back.
 
         Args:
-            emergency (emergency.Emergency): The Emergency instance to be
-                inserted into the database.
+            conn (sqlite3.Connection): Connection owning the write transaction.
+            count (int): Number of IDs to reserve.
 
         Returns:
-        int | None: The ID of the newly inserted emergency record, or `None`
-            if the database does not provide a last inserted row ID.
+            int: The first reserved ID. The block is `[first, first + count)`.
 
         Raises:
-            sqlite3.Error: If the insertion fails, the transaction is rolled back
-                and the original database error is re-raised.
+            ValueError: If `count` is not positive.
         """
 
-        get_next_id_query = """
-            SELECT IFNULL(MAX(emergency_id), 0) + 1 FROM emergency
+        if count < 1:
+            raise ValueError("'count' must be at least 1")
+
+        update_query = """
+            UPDATE id_sequence SET next_id = next_id + ?
+            WHERE name = 'emergency'
+            RETURNING next_id - ?
         """
+        update_query = self.statements.register("allocate_emergency_ids", update_query)
 
-        insert_query: str = """
-            INSERT INTO emergency (emergency_id, user_uuid, position, address, city, street_number, place_description,
-            photo_b64, severity, resolved, emergency_type, description, details_json, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        return conn.execute(update_query, (count, count)).fetchone()[0]
+
+    def __advance_emergency_ids(self, conn: sqlite3.Connection, used_id: int) -> None:
         """
+        Moves the emergency counter past an ID chosen outside the allocator.
 
-        # Begin transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(get_next_id_query)
-            next_id = self.cursor.fetchone()[0]
-            # Skip the field `id`
-            values = emergency.to_db_tuple()[1:]
-            self.conn.execute(insert_query, (next_id, *values))
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+        Emergencies inserted with their own ID (e.g. received from a Rescuee)
+        must not be handed out again by `__allocate_emergency_ids`.
 
-        return next_id
+        Args:
+            conn (sqlite3.Connection): Connection owning the write transaction.
+            used_id (int): The highest emergency ID just written.
+        """
 
-    def insert_emergency_from_rescuee(self, emergency: emergency.Emergency) -> None:
+        update_query = """
+            UPDATE id_sequence SET next_id = ?
+            WHERE name = 'emergency' AND next_id <= ?
         """
-        Inserts an Emergency from the Rescuee into the database.
+        update_query = self.statements.register("advance_emergency_ids", update_query)
 
-        The operation is wrapped in an explicit transaction:
-        the transaction is committed on success and rolled back if an error
-        occurs.
+        conn.execute(update_query, (used_id + 1, used_id))
+
+    def reserve_emergency_ids(self, count: int) -> range:
+        """
+        Reserves a block of emergency IDs for a bulk import.
+
+        The IDs are committed as used before the method returns: they will
+        never be allocated again, even if the caller ends up not inserting
+        them.
 
         Args:
-            emergency (emergency.Emergency): The Emergency instance to be
-                inserted into the database.
+            count (int): Number of IDs to reserve.
 
         Returns:
-        int | None: The ID of the newly inserted emergency record, or `None`
-            if the database does not provide a last inserted row ID.
+            range: The reserved IDs.
 
         Raises:
-            sqlite3.Error: If the insertion fails, the transaction is rolled back
-                and the original database error is re-raised.
+            ValueError: If `count` is not positive.
+            sqlite3.Error: If the reservation fails, the transaction is rolled
+                back and the original database error is re-raised.
         """
 
-        insert_query: str = """
-            INSERT INTO emergency (emergency_id, user_uuid, position, address, city, street_number, place_description, photo_b64,
-            severity, resolved, emergency_type, description, details_json, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        with self.__transaction() as conn:
+            first = self.__allocate_emergency_ids(conn, count)
+
+        return range(first, first + count)
+
+    def __store_emergency_rows(
+        self,
+        conn: sqlite3.Connection,
+        rows: list[tuple],
+        updated_at: datetime | None = None,
+    ) -> list[tuple]:
         """
+        Stores the photos of emergency rows about to be written.
 
-        # Begin transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.conn.execute(insert_query, emergency.to_db_tuple())
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+        Args:
+            conn (sqlite3.Connection): Connection owning the write transaction.
+            rows (list[tuple]): Emergency rows as returned by
+                `Emergency.to_db_tuple`.
+            updated_at (datetime | None): Timestamp of the write, now if None.
 
-    def insert_encrypted_emergency(
-        self, enc_emergency: enc_emergency.EncryptedEmergency
+        Returns:
+            list[tuple]: The rows to write, with the position split into
+            latitude and longitude, the photo referenced by hash (see
+            `_split_photo`) and `updated_at` appended.
+
+        Raises:
+            ValueError: If the position of a row cannot be parsed.
+        """
+
+        updated_at = updated_at or datetime.now()
+
+        stored = []
+        photos = []
+        for values in rows:
+            row, photo = _split_photo(values)
+            stored.append((*row[:2], *_split_position(row[2]), *row[3:], updated_at))
+            if photo is not None:
+                photos.append(photo)
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO photo (hash, data, size) VALUES (?, ?, ?)", photos
+        )
+
+        return stored
+
+    def __release_photos(
+        self, conn: sqlite3.Connection, photo_hashes: Iterable[str]
     ) -> None:
         """
-        Inserts an EncryptedEmergency into the database.
+        Deletes the photos among `photo_hashes` no emergency references.
 
-        The operation is wrapped in an explicit transaction:
-        the transaction is committed on success and rolled back if an error
-        occurs.
+        Replaced and deleted references are released by triggers; this is
+        for photos stored ahead of a write that did not take place.
 
         Args:
-            enc_emergency (emergency.Emergency): The EncryptedEmergency instance to be
-                inserted into the database.
+            conn (sqlite3.Connection): Connection owning the write transaction.
+            photo_hashes (Iterable[str]): Hashes of the photos to check.
+        """
+
+        delete_query = """
+            DELETE FROM photo
+            WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM emergency WHERE photo_hash = ?)
+        """
+        delete_query = self.statements.register("release_photos", delete_query)
+
+        conn.executemany(delete_query, ((h, h) for h in set(photo_hashes)))
+
+    def __attach_archive(self, conn: sqlite3.Connection, archive_path: str) -> None:
+        """
+        Attaches the archive database to the write connection as "archive".
+
+        Args:
+            conn (sqlite3.Connection): The write connection, outside of any
+                transaction.
+            archive_path (str): Path of the archive file, created if missing.
 
         Raises:
-            sqlite3.Error: If the insertion fails, the transaction is rolled back
-                and the original database error is re-raised.
+            ValueError: If another archive is already attached.
         """
 
-        insert_query = """
-            INSERT INTO encrypted_emergency(emergency_id, user_uuid, severity, routing_info_json, blob, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
+        if self.__archive_path == archive_path:
+            return
+        if self.__archive_path is not None:
+            raise ValueError(
+                f"Archive '{self.__archive_path}' is already attached, cannot attach '{archive_path}'"
+            )
+
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive.photo (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            )
             """
+        )
+        self.__archive_path = archive_path
 
-        # Begin transaction
-        self.conn.execute("BEGIN")
-        try:
-            values = enc_emergency.to_db_tuple()
-            self.conn.execute(insert_query, values)
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+    def __archive_columns(self, conn: sqlite3.Connection, table: str) -> str:
+        """
+        Creates or extends the archive copy of `table` to match its columns.
 
-    def get_users(self) -> List[user.User]:
+        Columns added by later migrations are appended to the archive table,
+        so archives written by older versions stay readable.
+
+        Args:
+            conn (sqlite3.Connection): Connection owning the write transaction.
+            table (str): Name of the table in the main database.
+
+        Returns:
+            str: The comma separated columns to copy.
         """
-        Retrieves all users stored in the database.
 
-        This method queries the `user` table and converts each database row
-        into a `User` object. Database-specific representations are
-        translated into application-level types.
+        columns = [
+            (name, decl_type)
+            for _, name, decl_type, *_ in conn.execute(f"PRAGMA main.table_info({table})")
+        ]
+        archived = {name for _, name, *_ in conn.execute(f"PRAGMA archive.table_info({table})")}
+
+        if not archived:
+            definitions = ", ".join(f"{name} {decl_type}" for name, decl_type in columns)
+            conn.execute(f"CREATE TABLE archive.{table} ({definitions})")
+        else:
+            for name, decl_type in columns:
+                if name not in archived:
+                    conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {decl_type}")
+
+        return ", ".join(name for name, _ in columns)
+
+    def __archive_batch(
+        self, table: str, condition: str, params: tuple, batch_size: int
+    ) -> int:
+        """
+        Moves up to `batch_size` rows of `table` matching `condition` to the
+        archive, in one transaction.
+
+        Args:
+            table (str): "emergency" or "encrypted_emergency".
+            condition (str): SQL condition selecting the rows to move.
+            params (tuple): Parameters of `condition`.
+            batch_size (int): Maximum number of rows to move.
 
         Returns:
-            List[user.User]: A list of User instances representing all users
-            currently stored in the database.
+            int: The number of rows moved.
+        """
+
+        # NOTE: Ordered by rowid so the three statements pick the same rows
+        batch = f"""
+            SELECT rowid FROM main.{table}
+            WHERE {condition}
+            ORDER BY rowid
+            LIMIT ?
+        """
+
+        with self.__transaction() as conn:
+            columns = self.__archive_columns(conn, table)
+
+            if table == "emergency":
+                conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO archive.photo (hash, data, size)
+                    SELECT hash, data, size FROM main.photo
+                    WHERE hash IN (SELECT photo_hash FROM main.emergency WHERE rowid IN ({batch}))
+                    """,
+                    (*params, batch_size),
+                )
+
+            conn.execute(
+                f"""
+                INSERT INTO archive.{table} ({columns})
+                SELECT {columns} FROM main.{table} WHERE rowid IN ({batch})
+                """,
+                (*params, batch_size),
+            )
+            # NOTE: Triggers release the photos and log the deletes
+            moved = conn.execute(
+                f"DELETE FROM main.{table} WHERE rowid IN ({batch})",
+                (*params, batch_size),
+            ).rowcount
+
+        return moved
+
+    def run_maintenance(self, policy: RetentionPolicy | None = None) -> MaintenanceReport:
+        """
+        Archives expired emergencies and compacts the database.
+
+        The emergencies selected by `policy` are moved, with their photos, to
+        the archive file in batches of `policy.batch_size` rows, each in its
+        own transaction. Since the rows are deleted, `get_changes_since`
+        reports them as deletes. The freed pages are then returned to the file
+        system with `PRAGMA incremental_vacuum` and the query planner
+        statistics are refreshed with `PRAGMA optimize`.
+
+        A database created before `StorageProfile.auto_vacuum` was set is
+        converted by a one-time full VACUUM, which blocks every other writer
+        until it is done.
+
+        Args:
+            policy (RetentionPolicy | None): What to archive, the defaults of
+                `RetentionPolicy` if None.
+
+        Returns:
+            MaintenanceReport: What was archived and reclaimed.
 
         Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
-            ValueError: If the stored date or enum values cannot be parsed into
-                the expected Python types.
+            ValueError: If `policy.batch_size` is not positive, or if another
+                archive file is already attached.
+            sqlite3.Error: If an error occurs while archiving or vacuuming.
+                Batches already moved stay moved.
+        """
+
+        policy = policy or RetentionPolicy()
+        if policy.batch_size < 1:
+            raise ValueError("'batch_size' must be at least 1")
+
+        archive_path = policy.archive_path
+        if archive_path is None:
+            if str(self.db_path) == ":memory:":
+                archive_path = ":memory:"
+            else:
+                archive_path = str(Path(self.db_path).with_suffix(".archive.db"))
+
+        now = datetime.now()
+        # NOTE: An empty string sorts before every timestamp, matching no row
+        expired = now - policy.max_age if policy.max_age is not None else ""
+        work = [
+            (
+                "emergency",
+                "(resolved = 1 AND IFNULL(updated_at, created_at) < ?) OR created_at < ?",
+                (now - policy.resolved_after, expired),
+            ),
+            ("encrypted_emergency", "created_at < ?", (expired,)),
+        ]
+
+        with self.write_pool.connection() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+            self.__convert_auto_vacuum(conn)
+            self.__attach_archive(conn, archive_path)
+
+        archived = {}
+        for table, condition, params in work:
+            archived[table] = 0
+            while True:
+                moved = self.__archive_batch(table, condition, params, policy.batch_size)
+                archived[table] += moved
+                if moved and table == "emergency":
+                    self.emergency_cache.clear()
+                if moved < policy.batch_size:
+                    break
+
+        with self.write_pool.connection() as conn:
+            # NOTE: `execute` would stop after the first freed page, a script
+            # runs the pragma to completion
+            conn.executescript("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA optimize")
+            pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+
+        return MaintenanceReport(
+            archived_emergencies=archived["emergency"],
+            archived_encrypted_emergencies=archived["encrypted_emergency"],
+            reclaimed_bytes=max(0, pages_before - pages_after) * page_size,
+        )
+
+    def __convert_auto_vacuum(self, conn: sqlite3.Connection) -> None:
+        """
+        Switches an existing database to the `auto_vacuum` mode of the
+        profile, rewriting the file with a full VACUUM if needed.
+
+        Args:
+            conn (sqlite3.Connection): The write connection, outside of any
+                transaction.
+        """
+
+        modes = {"NONE": 0, "FULL": 1, "INCREMENTAL": 2}
+        wanted = modes.get(str(self.profile.auto_vacuum).upper())
+        if wanted is None or conn.execute("PRAGMA auto_vacuum").fetchone()[0] == wanted:
+            return
+
+        conn.execute(f"PRAGMA auto_vacuum = {self.profile.auto_vacuum}")
+        conn.execute("VACUUM")
+
+        # NOTE: VACUUM may renumber the rowids the spatial index is keyed by
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM emergency_rtree")
+            conn.execute(
+                """
+                INSERT INTO emergency_rtree (id, min_lat, max_lat, min_lon, max_lon)
+                SELECT rowid, lat, lat, lon, lon FROM emergency
+                """
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def start_maintenance(
+        self,
+        policy: RetentionPolicy | None = None,
+        interval: float = MAINTENANCE_INTERVAL,
+        on_report: Callable[[MaintenanceReport], None] | None = None,
+        on_error: Callable[[Exception], None] | None = None,
+    ) -> None:
+        """
+        Runs `run_maintenance` every `interval` seconds in a daemon thread,
+        until `stop_maintenance` or `close` is called.
+
+        A failed run does not stop the schedule; the next one tries again.
+
+        Args:
+            policy (RetentionPolicy | None): Passed to every run.
+            interval (float): Seconds between the end of a run and the start
+                of the next. The first run starts after one interval.
+            on_report (Callable[[MaintenanceReport], None] | None): Called with
+                the report of every successful run.
+            on_error (Callable[[Exception], None] | None): Called with the
+                error of every failed run.
+
+        Raises:
+            RuntimeError: If the maintenance is already running.
+        """
+
+        if self.__maintenance is not None:
+            raise RuntimeError("Maintenance is already running")
+
+        stop = threading.Event()
+
+        def loop() -> None:
+            while not stop.wait(interval):
+                try:
+                    report = self.run_maintenance(policy)
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(e)
+                    continue
+
+                if on_report is not None:
+                    on_report(report)
+
+        thread = threading.Thread(target=loop, name="db-maintenance", daemon=True)
+        self.__maintenance = (thread, stop)
+        thread.start()
+
+    def stop_maintenance(self, timeout: float | None = None) -> None:
+        """
+        Stops the maintenance started by `start_maintenance`, waiting for a
+        run in progress to finish. Does nothing if it is not running.
+
+        Args:
+            timeout (float | None): Seconds to wait for the run in progress,
+                forever if None.
+        """
+
+        if self.__maintenance is None:
+            return
+
+        thread, stop = self.__maintenance
+        self.__maintenance = None
+        stop.set()
+        thread.join(timeout)
+
+    def close(self) -> None:
+        """
+        Stops the background maintenance and closes every pooled connection.
+        """
+
+        self.stop_maintenance()
+        self.write_pool.close()
+        self.read_pool.close()
+
+    def insert_user(self, user: user.User) -> None:
+        """
+        Inserts a User into the database.
+
+        The operation is wrapped in an explicit transaction:
+        the transaction is committed on success and rolled back if an error
+        occurs.
+
+        Args:
+            user (user.User): The User instance to be inserted into the database.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        insert_query: str = "INSERT INTO user(uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json) VALUES(?, ?, ?, ?, ?, ?, ?)"
+        insert_query = self.statements.register("insert_user", insert_query)
+
+        with self.__transaction() as conn:
+            conn.execute(insert_query, user.to_db_tuple())
+
+    def insert_emergency(self, emergency: emergency.Emergency) -> int | None:
+        """
+        Inserts an Emergency into the database.
+
+        The operation is wrapped in an explicit transaction:
+        the transaction is committed on success and rolled back if an error
+        occurs.
+
+        Args:
+            emergency (emergency.Emergency): The Emergency instance to be
+                inserted into the database.
+
+        Returns:
+        int | None: The ID of the newly inserted emergency record, or `None`
+            if the database does not provide a last inserted row ID.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        insert_query: str = """
+            INSERT INTO emergency (emergency_id, user_uuid, lat, lon, address, city, street_number, place_description,
+            photo_b64, severity, resolved, emergency_type, description, details_json, created_at, photo_hash,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        insert_query = self.statements.register("insert_emergency", insert_query)
+
+        with self.__transaction() as conn:
+            next_id = self.__allocate_emergency_ids(conn)
+            # Replace the field `id` with the allocated one
+            values = (next_id, *emergency.to_db_tuple()[1:])
+            (row,) = self.__store_emergency_rows(conn, [values])
+            conn.execute(insert_query, row)
+
+        return next_id
+
+    def insert_emergency_from_rescuee(self, emergency: emergency.Emergency) -> None:
+        """
+        Inserts an Emergency from the Rescuee into the database.
+
+        The operation is wrapped in an explicit transaction:
+        the transaction is committed on success and rolled back if an error
+        occurs.
+
+        Args:
+            emergency (emergency.Emergency): The Emergency instance to be
+                inserted into the database.
+
+        Returns:
+        int | None: The ID of the newly inserted emergency record, or `None`
+            if the database does not provide a last inserted row ID.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        insert_query: str = """
+            INSERT INTO emergency (emergency_id, user_uuid, lat, lon, address, city, street_number, place_description, photo_b64,
+            severity, resolved, emergency_type, description, details_json, created_at, photo_hash,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        insert_query = self.statements.register("insert_emergency_from_rescuee", insert_query)
+
+        with self.__transaction() as conn:
+            (row,) = self.__store_emergency_rows(conn, [emergency.to_db_tuple()])
+            conn.execute(insert_query, row)
+            self.__advance_emergency_ids(conn, emergency.emergency_id)
+
+    def insert_encrypted_emergency(
+        self, enc_emergency: enc_emergency.EncryptedEmergency
+    ) -> None:
+        """
+        Inserts an EncryptedEmergency into the database.
+
+        The operation is wrapped in an explicit transaction:
+        the transaction is committed on success and rolled back if an error
+        occurs.
+
+        Args:
+            enc_emergency (emergency.Emergency): The EncryptedEmergency instance to be
+                inserted into the database.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        insert_query = """
+            INSERT INTO encrypted_emergency(emergency_id, user_uuid, severity, routing_info_json, blob, created_at,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """
+        insert_query = self.statements.register("insert_encrypted_emergency", insert_query)
+
+        with self.__transaction() as conn:
+            values = (*enc_emergency.to_db_tuple(), datetime.now())
+            conn.execute(insert_query, values)
+
+    def __find_conflicts(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        key_columns: tuple[str, ...],
+        keys: list[tuple],
+    ) -> list[bool]:
+        """
+        Flags the primary keys of a batch that cannot be inserted.
+
+        A key conflicts if it is already stored in `table` or if it appears
+        earlier in `keys`. Existing keys are looked up in chunks of
+        `BATCH_KEY_CHUNK` with a single indexed query each.
+
+        Args:
+            conn (sqlite3.Connection): Connection owning the write transaction.
+            table (str): Name of the table the batch is inserted into.
+            key_columns (tuple[str, ...]): Primary key columns of `table`.
+            keys (list[tuple]): Primary keys of the batch, in input order.
+
+        Returns:
+            list[bool]: For each key, True if the row must be skipped.
+        """
+
+        columns = ", ".join(key_columns)
+        row_value = "(" + ", ".join("?" * len(key_columns)) + ")"
+
+        existing: set[tuple] = set()
+        for start in range(0, len(keys), BATCH_KEY_CHUNK):
+            chunk = keys[start:start + BATCH_KEY_CHUNK]
+            select_query = (
+                f"SELECT {columns} FROM {table} "
+                f"WHERE ({columns}) IN (VALUES {', '.join([row_value] * len(chunk))})"
+            )
+            select_query = self.statements.register("find_conflicts", select_query)
+            params = [value for key in chunk for value in key]
+            existing.update(conn.execute(select_query, params).fetchall())
+
+        flags = []
+        for key in keys:
+            flags.append(key in existing)
+            existing.add(key)
+
+        return flags
+
+    def insert_users_many(self, users: Iterable[user.User]) -> BatchResult:
+        """
+        Inserts several Users into the database with a single commit.
+
+        All rows are written with `executemany` inside one transaction. Users
+        whose UUID is already stored (or repeated within the batch) are not
+        written and are reported as conflicts instead of aborting the batch.
+
+        Args:
+            users (Iterable[user.User]): The User instances to be inserted.
+
+        Returns:
+            BatchResult: Positions of the inserted and conflicting users.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the whole transaction is
+                rolled back and the original database error is re-raised.
+        """
+
+        insert_query: str = "INSERT INTO user(uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json) VALUES(?, ?, ?, ?, ?, ?, ?)"
+        insert_query = self.statements.register("insert_users_many", insert_query)
+
+        rows = [u.to_db_tuple() for u in users]
+        result = BatchResult()
+
+        with self.__transaction() as conn:
+            conflicts = self.__find_conflicts(
+                conn, "user", ("uuid",), [(row[0],) for row in rows]
+            )
+
+            to_insert = []
+            for pos, (row, conflict) in enumerate(zip(rows, conflicts)):
+                if conflict:
+                    result.conflicts.append(pos)
+                else:
+                    result.inserted.append(pos)
+                    to_insert.append(row)
+
+            conn.executemany(insert_query, to_insert)
+
+        return result
+
+    def insert_emergencies_many(
+        self, emergencies: Iterable[emergency.Emergency], assign_ids: bool = False
+    ) -> BatchResult:
+        """
+        Inserts several Emergencies into the database with a single commit.
+
+        All rows are written with `executemany` inside one transaction.
+
+        By default the emergencies keep their own IDs, like
+        `insert_emergency_from_rescuee`: rows whose `(emergency_id, user_uuid)`
+        is already stored (or repeated within the batch) are not written and
+        are reported as conflicts. With `assign_ids`, every emergency gets a
+        new ID, like `insert_emergency`, and no conflict can occur.
+
+        Args:
+            emergencies (Iterable[emergency.Emergency]): The Emergency
+                instances to be inserted.
+            assign_ids (bool): If True, ignore the IDs of the emergencies and
+                allocate new ones.
+
+        Returns:
+            BatchResult: Positions of the inserted and conflicting emergencies
+            and the IDs they were stored with.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the whole transaction is
+                rolled back and the original database error is re-raised.
+        """
+
+        insert_query: str = """
+            INSERT INTO emergency (emergency_id, user_uuid, lat, lon, address, city, street_number, place_description,
+            photo_b64, severity, resolved, emergency_type, description, details_json, created_at, photo_hash,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        insert_query = self.statements.register("insert_emergencies_many", insert_query)
+
+        rows = [em.to_db_tuple() for em in emergencies]
+        result = BatchResult()
+
+        with self.__transaction() as conn:
+            if assign_ids and rows:
+                next_id = self.__allocate_emergency_ids(conn, len(rows))
+                # Skip the field `id`
+                rows = [(next_id + pos, *row[1:]) for pos, row in enumerate(rows)]
+                conflicts = [False] * len(rows)
+            else:
+                conflicts = self.__find_conflicts(
+                    conn,
+                    "emergency",
+                    ("emergency_id", "user_uuid"),
+                    [(row[0], row[1]) for row in rows],
+                )
+
+            to_insert = []
+            for pos, (row, conflict) in enumerate(zip(rows, conflicts)):
+                if conflict:
+                    result.conflicts.append(pos)
+                else:
+                    result.inserted.append(pos)
+                    result.ids.append(row[0])
+                    to_insert.append(row)
+
+            conn.executemany(
+                insert_query, self.__store_emergency_rows(conn, to_insert)
+            )
+
+            if not assign_ids and to_insert:
+                self.__advance_emergency_ids(conn, max(result.ids))
+
+        return result
+
+    def insert_encrypted_emergencies_many(
+        self, enc_emergencies: Iterable[enc_emergency.EncryptedEmergency]
+    ) -> BatchResult:
+        """
+        Inserts several EncryptedEmergencies into the database with a single
+        commit.
+
+        All rows are written with `executemany` inside one transaction.
+        Encrypted emergencies whose `(emergency_id, user_uuid)` is already
+        stored (or repeated within the batch) are not written and are reported
+        as conflicts instead of aborting the batch.
+
+        Args:
+            enc_emergencies (Iterable[enc_emergency.EncryptedEmergency]): The
+                EncryptedEmergency instances to be inserted.
+
+        Returns:
+            BatchResult: Positions of the inserted and conflicting encrypted
+            emergencies and the IDs they were stored with.
+
+        Raises:
+            sqlite3.Error: If the insertion fails, the whole transaction is
+                rolled back and the original database error is re-raised.
+        """
+
+        insert_query = """
+            INSERT INTO encrypted_emergency(emergency_id, user_uuid, severity, routing_info_json, blob, created_at,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """
+        insert_query = self.statements.register("insert_encrypted_emergencies_many", insert_query)
+
+        updated_at = datetime.now()
+        rows = [(*enc.to_db_tuple(), updated_at) for enc in enc_emergencies]
+        result = BatchResult()
+
+        with self.__transaction() as conn:
+            conflicts = self.__find_conflicts(
+                conn,
+                "encrypted_emergency",
+                ("emergency_id", "user_uuid"),
+                [(row[0], row[1]) for row in rows],
+            )
+
+            to_insert = []
+            for pos, (row, conflict) in enumerate(zip(rows, conflicts)):
+                if conflict:
+                    result.conflicts.append(pos)
+                else:
+                    result.inserted.append(pos)
+                    result.ids.append(row[0])
+                    to_insert.append(row)
+
+            conn.executemany(insert_query, to_insert)
+
+        return result
+
+    def upsert_emergency(
+        self, emergency: emergency.Emergency, updated_at: datetime | None = None
+    ) -> bool:
+        """
+        Inserts an Emergency, or replaces the stored one if it is older.
+
+        The emergency keeps its own ID, like in
+        `insert_emergency_from_rescuee`. If an emergency with the same
+        `(emergency_id, user_uuid)` is stored, it is replaced only if it was
+        last written before `updated_at` (last writer wins); on a tie the
+        stored emergency is kept, so replaying a write is harmless. Every
+        write method records the time it was called, so an upsert never
+        overwrites a later local change.
+
+        Args:
+            emergency (emergency.Emergency): The Emergency instance to be
+                written.
+            updated_at (datetime | None): When the emergency was written at
+                its origin. If None, the current time is used and the
+                emergency always replaces the stored one.
+
+        Returns:
+            bool: True if the emergency was written, False if the stored one
+            is newer.
+
+        Raises:
+            sqlite3.Error: If the write fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        return self.upsert_emergencies_many([emergency], updated_at) == 1
+
+    def upsert_emergencies_many(
+        self,
+        emergencies: Iterable[emergency.Emergency],
+        updated_at: datetime | None = None,
+    ) -> int:
+        """
+        Upserts several Emergencies with a single statement and commit.
+
+        Every emergency is written like in `upsert_emergency`, with the same
+        `updated_at`, by one `executemany` of an `INSERT ... ON CONFLICT DO
+        UPDATE`. No row is read first.
+
+        Args:
+            emergencies (Iterable[emergency.Emergency]): The Emergency
+                instances to be written.
+            updated_at (datetime | None): When the emergencies were written at
+                their origin, the current time if None.
+
+        Returns:
+            int: Number of emergencies inserted or replaced. The others were
+            older than the stored ones.
+
+        Raises:
+            sqlite3.Error: If the write fails, the whole transaction is rolled
+                back and the original database error is re-raised.
+        """
+
+        # NOTE: Last writer wins, a stored row is only replaced by a newer write
+        upsert_query = """
+            INSERT INTO emergency (emergency_id, user_uuid, lat, lon, address, city, street_number, place_description,
+            photo_b64, severity, resolved, emergency_type, description, details_json, created_at, photo_hash,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (emergency_id, user_uuid) DO UPDATE
+            SET lat = excluded.lat, lon = excluded.lon, address = excluded.address,
+            city = excluded.city, street_number = excluded.street_number,
+            place_description = excluded.place_description, photo_b64 = excluded.photo_b64,
+            severity = excluded.severity, resolved = excluded.resolved,
+            emergency_type = excluded.emergency_type, description = excluded.description,
+            details_json = excluded.details_json, created_at = excluded.created_at,
+            photo_hash = excluded.photo_hash, updated_at = excluded.updated_at
+            WHERE excluded.updated_at > IFNULL(emergency.updated_at, '')
+        """
+        upsert_query = self.statements.register("upsert_emergencies_many", upsert_query)
+
+        rows = [em.to_db_tuple() for em in emergencies]
+        if not rows:
+            return 0
+
+        with self.__transaction() as conn:
+            stored = self.__store_emergency_rows(conn, rows, updated_at)
+            written = conn.executemany(upsert_query, stored).rowcount
+
+            # NOTE: Photos of the emergencies that lost are not referenced
+            self.__release_photos(conn, (r[15] for r in stored if r[15] is not None))
+            self.__advance_emergency_ids(conn, max(row[0] for row in rows))
+
+        self.__invalidate(self.emergency_cache, *((row[1], row[0]) for row in rows))
+        return written
+
+    def upsert_encrypted_emergency(
+        self,
+        enc_emergency: enc_emergency.EncryptedEmergency,
+        updated_at: datetime | None = None,
+    ) -> bool:
+        """
+        Inserts an EncryptedEmergency, or replaces the stored one if it is
+        older.
+
+        Conflicts are resolved like in `upsert_emergency`.
+
+        Args:
+            enc_emergency (enc_emergency.EncryptedEmergency): The
+                EncryptedEmergency instance to be written.
+            updated_at (datetime | None): When the encrypted emergency was
+                written at its origin. If None, the current time is used and
+                it always replaces the stored one.
+
+        Returns:
+            bool: True if the encrypted emergency was written, False if the
+            stored one is newer.
+
+        Raises:
+            sqlite3.Error: If the write fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        return self.upsert_encrypted_emergencies_many([enc_emergency], updated_at) == 1
+
+    def upsert_encrypted_emergencies_many(
+        self,
+        enc_emergencies: Iterable[enc_emergency.EncryptedEmergency],
+        updated_at: datetime | None = None,
+    ) -> int:
+        """
+        Upserts several EncryptedEmergencies with a single statement and
+        commit.
+
+        Every encrypted emergency is written like in
+        `upsert_encrypted_emergency`, with the same `updated_at`, by one
+        `executemany` of an `INSERT ... ON CONFLICT DO UPDATE`. No row is read
+        first.
+
+        Args:
+            enc_emergencies (Iterable[enc_emergency.EncryptedEmergency]): The
+                EncryptedEmergency instances to be written.
+            updated_at (datetime | None): When the encrypted emergencies were
+                written at their origin, the current time if None.
+
+        Returns:
+            int: Number of encrypted emergencies inserted or replaced. The
+            others were older than the stored ones.
+
+        Raises:
+            sqlite3.Error: If the write fails, the whole transaction is rolled
+                back and the original database error is re-raised.
+        """
+
+        upsert_query = """
+            INSERT INTO encrypted_emergency (emergency_id, user_uuid, severity, routing_info_json, blob, created_at,
+            updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (emergency_id, user_uuid) DO UPDATE
+            SET severity = excluded.severity, routing_info_json = excluded.routing_info_json,
+            blob = excluded.blob, created_at = excluded.created_at,
+            updated_at = excluded.updated_at
+            WHERE excluded.updated_at > IFNULL(encrypted_emergency.updated_at, '')
+        """
+        upsert_query = self.statements.register("upsert_encrypted_emergencies_many", upsert_query)
+
+        updated_at = updated_at or datetime.now()
+        rows = [(*enc.to_db_tuple(), updated_at) for enc in enc_emergencies]
+
+        with self.__transaction() as conn:
+            cursor = conn.executemany(upsert_query, rows)
+
+        return cursor.rowcount
+
+    def get_users(self) -> List[user.User]:
+        """
+        Retrieves all users stored in the database.
+
+        This method queries the `user` table and converts each database row
+        into a `User` object. Database-specific representations are
+        translated into application-level types.
+
+        Returns:
+            List[user.User]: A list of User instances representing all users
+            currently stored in the database.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+            ValueError: If the stored date or enum values cannot be parsed into
+                the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_USER_COLUMNS}
+            FROM user
+        """
+        select_query = self.statements.register("get_users", select_query)
+
+        with self.read_pool.connection() as conn:
+            users = _mapped(conn, _user_row).execute(select_query).fetchall()
+
+        return users
+
+    def get_user_by_uuid(self, uuid: str) -> user.User | None:
+        """
+        Retrieves a user by uuid.
+
+        This method queries the `user` table for the user with the UUID
+        passed as an argument and converts each database row into a `User`
+        object. Database-specific representations are translated into
+        application-level types. Users are served from `user_cache` once
+        read, as copies the caller is free to change.
+
+        Args:
+            uuid (str): The UUID of the user to retrieve.
+
+        Returns:
+            user.User | None: The `User` instance corresponding to the given UUID,
+            or `None` if no matching user is found.
+
+        Returns:
+            user.User: The user with the corresponding UUID.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+            ValueError: If the stored date or enum values cannot be parsed into
+                the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_USER_COLUMNS}
+            FROM user
+            WHERE uuid = ?
+        """
+        select_query = self.statements.register("get_user_by_uuid", select_query)
+
+        def load() -> user.User | None:
+            with self.read_pool.connection() as conn:
+                return _mapped(conn, _user_row).execute(select_query, (uuid,)).fetchone()
+
+        return copy.copy(self.user_cache.get_or_load(uuid, load))
+
+    def get_rescuers(self) -> List[user.User]:
+        """
+        Retrieves all Rescuers stored in the database.
+
+        This method queries the `user` table for the role of Rescuer (is_rescuer = 1)
+        and converts each database row into a `User` object. Database-specific
+        representations are translated into application-level types.
+
+        This method queries the `user` table for users whose `is_rescuer` flag
+        is set to true (value `1` in the database) and converts each database
+        row into a `User` object. Database-specific representations are
+        translated into application-level types.
+
+        Returns:
+            List[user.User]: A list of User instances representing all Rescuers
+            currently stored in the database.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+            ValueError: If the stored date or enum values cannot be parsed into
+                the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_USER_COLUMNS}
+            FROM user
+            WHERE is_rescuer = 1
+        """
+        select_query = self.statements.register("get_rescuers", select_query)
+
+        with self.read_pool.connection() as conn:
+            rescuers = _mapped(conn, _user_row).execute(select_query).fetchall()
+
+        return rescuers
+
+    def get_rescuees(self) -> List[user.User]:
+        """
+        Retrieves all Rescuees stored in the database.
+
+        This method queries the `user` table for the role of Rescuee (is_rescuer = 0)
+        and converts each database row into a `User` object. Database-specific
+        representations are translated into application-level types.
+
+        This method queries the `user` table for users whose `is_rescuer` flag
+        is set to false (value `0` in the database) and converts each database
+        row into a `User` object. Database-specific representations are
+        translated into application-level types.
+
+        Returns:
+            List[user.User]: A list of User instances representing all Rescuees
+            currently stored in the database.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+            ValueError: If the stored date or enum values cannot be parsed into
+                the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_USER_COLUMNS}
+            FROM user
+            WHERE is_rescuer = 0
+        """
+        select_query = self.statements.register("get_rescuees", select_query)
+
+        with self.read_pool.connection() as conn:
+            rescuees = _mapped(conn, _user_row).execute(select_query).fetchall()
+
+        return rescuees
+
+    def get_emergencies(self) -> List[emergency.Emergency]:
+        """
+        Retrieves all emergencies stored in the database.
+
+        This method queries the `emergency` table and converts each database row
+        into a `Emergency` object. Database-specific representations are
+        translated into application-level types.
+
+        Unresolved emergencies come first, ordered by decreasing severity and
+        then by age (oldest first), following the `idx_emergency_triage` index.
+
+        Returns:
+            List[emergency.Emergency]: A list of Emergency instances representing all
+            emergencies currently stored in the database.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+            ValueError: If the stored position or other fields cannot be parsed
+                into the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_EMERGENCY_COLUMNS}
+            FROM emergency
+            ORDER BY resolved, severity DESC, created_at
+        """
+        select_query = self.statements.register("get_emergencies", select_query)
+
+        with self.read_pool.connection() as conn:
+            emergencies = _mapped(conn, _emergency_row).execute(select_query).fetchall()
+
+        return emergencies
+
+    def get_emergency_by_id(
+        self, user_uuid: str, id: int
+    ) -> emergency.Emergency | None:
+        """
+        Retrieves a specific emergency by user UUID and emergency ID.
+
+        This method queries the `emergency` table for the emergency with the
+        user UUID and ID passed as argument and converts the resulting database
+        row into an `Emergency` object. Database-specific representations
+        are translated into application-level types. Emergencies are served
+        from `emergency_cache` once read, as copies the caller is free to
+        change.
+
+        Args:
+            user_uuid (str): The UUID of the user associated with the emergency.
+            id (int): The ID of the emergency to retrieve.
+
+        Returns:
+            emergency.Emergency | None: The `Emergency` instance corresponding to
+            the given user UUID and ID, or `None` if no matching record is found.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the result.
+            ValueError: If the stored position or other fields cannot be parsed
+                into the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_EMERGENCY_COLUMNS}
+            FROM emergency
+            WHERE user_uuid = ? AND emergency_id = ?
+        """
+        select_query = self.statements.register("get_emergency_by_id", select_query)
+
+        def load() -> emergency.Emergency | None:
+            with self.read_pool.connection() as conn:
+                return _mapped(conn, _emergency_row).execute(
+                    select_query, (user_uuid, id)
+                ).fetchone()
+
+        return copy.copy(self.emergency_cache.get_or_load((user_uuid, id), load))
+
+    def get_emergencies_by_user_uuid(self, user_uuid: str) -> List[emergency.Emergency]:
+        """
+        Retrieves all emergencies associated with a specific user UUID.
+
+        This method queries the `emergency` table for all the emergencies matching
+        the user UUID passed as an argument and converts each resulting
+        database row into an `Emergency` object. Database-specific representations
+        are translated into application-level types.
+
+        Args:
+            user_uuid (str): The UUID of the user whose emergencies are to be
+                retrieved.
+
+        Returns:
+            List[emergency.Emergency]: A list of Emergency instances associated
+            with the specified user.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+            ValueError: If the stored position or other fields cannot be parsed
+                into the expected Python types.
+        """
+
+        select_query = f"""
+            SELECT {_EMERGENCY_COLUMNS}
+            FROM emergency
+            WHERE user_uuid = ?
+        """
+        select_query = self.statements.register("get_emergencies_by_user_uuid", select_query)
+
+        with self.read_pool.connection() as conn:
+            emergencies = _mapped(conn, _emergency_row).execute(
+                select_query, (user_uuid,)
+            ).fetchall()
+
+        return emergencies
+
+    def get_emergencies_in_bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        resolved: bool | None = None,
+    ) -> List[emergency.Emergency]:
+        """
+        Retrieves the emergencies located inside a bounding box.
+
+        The candidates are found through the `emergency_rtree` spatial index,
+        then checked against the exact coordinates, so the cost depends on
+        the number of emergencies in the box rather than in the table.
+
+        Args:
+            min_lat (float): Southern edge of the box, in degrees.
+            min_lon (float): Western edge of the box, in degrees.
+            max_lat (float): Northern edge of the box, in degrees.
+            max_lon (float): Eastern edge of the box, in degrees. A box
+                crossing the antimeridian has `max_lon` < `min_lon`.
+            resolved (bool | None): If set, only return emergencies with that
+                resolved state.
+
+        Returns:
+            List[emergency.Emergency]: The emergencies inside the box, edges
+            included, in triage order (see `get_emergencies`).
+
+        Raises:
+            ValueError: If `min_lat` is greater than `max_lat`, or if the
+                stored fields cannot be parsed into the expected Python types.
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+        """
+
+        if min_lat > max_lat:
+            raise ValueError("'min_lat' must not be greater than 'max_lat'")
+
+        select_query = f"""
+            SELECT {_EMERGENCY_COLUMNS}
+            FROM emergency_rtree JOIN emergency ON emergency.rowid = emergency_rtree.id
+            WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?
+            AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?
+        """
+        select_query = self.statements.register("get_emergencies_in_bbox", select_query)
+
+        if min_lon <= max_lon:
+            boxes = [(min_lon, max_lon)]
+        else:
+            boxes = [(min_lon, 180.0), (-180.0, max_lon)]
+
+        emergencies = []
+        with self.read_pool.connection() as conn:
+            for west, east in boxes:
+                emergencies += _mapped(conn, _emergency_row).execute(
+                    select_query,
+                    (min_lat, max_lat, west, east, min_lat, max_lat, west, east),
+                ).fetchall()
+
+        if resolved is not None:
+            emergencies = [e for e in emergencies if e.resolved == resolved]
+
+        # NOTE: Sorted here, the spatial index returns rows in no useful order
+        emergencies.sort(key=lambda e: (e.resolved, -e.severity, e.created_at))
+
+        return emergencies
+
+    def get_emergencies_near(
+        self,
+        lat: float,
+        lon: float,
+        radius: float,
+        resolved: bool | None = None,
+    ) -> List[emergency.Emergency]:
+        """
+        Retrieves the emergencies within a distance from a point.
+
+        The circle is first approximated by its bounding box, looked up with
+        `get_emergencies_in_bbox`, and the candidates in the corners of the
+        box are then discarded by their great-circle distance.
+
+        Args:
+            lat (float): Latitude of the center, in degrees.
+            lon (float): Longitude of the center, in degrees.
+            radius (float): Maximum distance from the center, in meters.
+            resolved (bool | None): If set, only return emergencies with that
+                resolved state.
+
+        Returns:
+            List[emergency.Emergency]: The emergencies within `radius`
+            meters, closest first.
+
+        Raises:
+            ValueError: If `radius` is negative, or if the stored fields
+                cannot be parsed into the expected Python types.
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+        """
+
+        if radius < 0:
+            raise ValueError("'radius' must not be negative")
+
+        candidates = self.get_emergencies_in_bbox(
+            *bounding_box(lat, lon, radius), resolved
+        )
+
+        by_distance = []
+        for e in candidates:
+            distance = haversine(lat, lon, e.position[0], e.position[1])
+            if distance <= radius:
+                by_distance.append((distance, e))
+
+        by_distance.sort(key=lambda pair: pair[0])
+
+        return [e for _, e in by_distance]
+
+    def get_changes_since(
+        self, seq: int = 0, limit: int = DEFAULT_PAGE_SIZE
+    ) -> List[Change]:
+        """
+        Retrieves the changes to the emergency tables logged after `seq`.
+
+        The change log is filled by triggers on every insert, update and
+        delete, whatever method made them. At most `limit` log entries are
+        read; when a row changed several times among them, only its last
+        change is returned, with the current state of the row. Syncing from
+        the last `Change.seq` received therefore transfers only the rows that
+        changed since.
+
+        Args:
+            seq (int): Sequence number of the last change already applied, 0
+                to read the log from the start.
+            limit (int): Maximum number of log entries to read.
+
+        Returns:
+            List[Change]: The changes in log order. The last one carries the
+            sequence number to continue from. Empty if there are no newer
+            changes.
+
+        Raises:
+            ValueError: If `limit` is not positive, or if the stored fields
+                cannot be parsed into the expected Python types.
+            sqlite3.Error: If an error occurs while executing the SELECT
+                queries or fetching the results.
+        """
+
+        if limit < 1:
+            raise ValueError("'limit' must be at least 1")
+
+        select_query = """
+            SELECT seq, table_name, op, emergency_id, user_uuid
+            FROM change_log
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        """
+        select_query = self.statements.register("get_changes_since", select_query)
+
+        record_queries = {
+            "emergency": (
+                f"SELECT {_EMERGENCY_COLUMNS}, updated_at FROM emergency",
+                _emergency_row,
+            ),
+            "encrypted_emergency": (
+                f"SELECT {_ENCRYPTED_EMERGENCY_COLUMNS}, updated_at FROM encrypted_emergency",
+                _encrypted_emergency_row,
+            ),
+        }
+
+        with self.read_pool.connection() as conn:
+            entries = conn.execute(select_query, (seq, limit)).fetchall()
+
+            # NOTE: Keeps the last entry of every row, in log order
+            latest = {(e[1], e[3], e[4]): e for e in entries}
+            entries = sorted(latest.values())
+
+            records = {}
+            for table, (record_query, row_factory) in record_queries.items():
+                keys = [(e[3], e[4]) for e in entries if e[1] == table and e[2] != "delete"]
+
+                for start in range(0, len(keys), BATCH_KEY_CHUNK):
+                    chunk = keys[start:start + BATCH_KEY_CHUNK]
+                    query = (
+                        f"{record_query} WHERE (emergency_id, user_uuid) "
+                        f"IN (VALUES {', '.join(['(?, ?)'] * len(chunk))})"
+                    )
+                    params = [value for key in chunk for value in key]
+                    for row in conn.execute(query, params):
+                        record = row_factory(None, row[:-1])
+                        records[(table, row[0], row[1])] = (record, row[-1])
+
+        changes = []
+
+        for change_seq, table, op, emergency_id, user_uuid in entries:
+            record, updated_at = records.get((table, emergency_id, user_uuid), (None, None))
+            changes.append(
+                Change(change_seq, table, op, emergency_id, user_uuid, record, updated_at)
+            )
+
+        return changes
+
+    def get_encrypted_emergencies(self) -> List[enc_emergency.EncryptedEmergency]:
+        """
+        Retrieves all encrypted emergencies stored in the database.
+
+        This method queries the `encrypted_emergency` table and converts each
+        database row into an `EncryptedEmergency` object, ordered by decreasing
+        severity and then by age (oldest first).
+
+        Returns:
+            List[enc_emergency.EncryptedEmergency]: A list of EncryptedEmergency
+            instances representing all encrypted emergencies currently stored
+            in the database.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
         """
 
-        select_query = """
-            SELECT uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json
-            FROM user
+        select_query = f"""
+            SELECT {_ENCRYPTED_EMERGENCY_COLUMNS}
+            FROM encrypted_emergency
+            ORDER BY severity DESC, created_at
         """
+        select_query = self.statements.register("get_encrypted_emergencies", select_query)
 
-        self.cursor.execute(select_query)
-        result = self.cursor.fetchall()
-
-        users = []
+        with self.read_pool.connection() as conn:
+            enc_emergencies = _mapped(conn, _encrypted_emergency_row).execute(
+                select_query
+            ).fetchall()
 
-        for row in result:
-            users.append(
-                user.User(
-                    uuid=row[0],
-                    is_rescuer=row[1] == 1,
-                    name=row[2],
-                    surname=row[3],
-                    birthday=datetime.strptime(row[4], "%Y-%m-%d").date(),
-                    blood_type=user.BloodType[row[5]],
-                    health_info_json=row[6],
-                )
-            )
-
-        return users
+        return enc_emergencies
 
-    def get_user_by_uuid(self, uuid: str) -> user.User | None:
+    def get_encrypted_emergency_by_id(
+        self, user_uuid: str, emergency_id: int
+    ) -> enc_emergency.EncryptedEmergency | None:
         """
-        Retrieves a user by uuid.
-
-        This method queries the `user` table for the user with the UUID
-        passed as an argument and converts each database row into a `User`
-        object. Database-specific representations are translated into
-        application-level types.
+        Retrieves a specific encrypted emergency by user UUID and emergency ID.
 
         Args:
-            uuid (str): The UUID of the user to retrieve.
+            user_uuid (str): The UUID of the user associated with the
+                encrypted emergency.
+            emergency_id (int): The ID of the encrypted emergency to retrieve.
 
         Returns:
-            user.User | None: The `User` instance corresponding to the given UUID,
-            or `None` if no matching user is found.
-
-        Returns:
-            user.User: The user with the corresponding UUID.
+            enc_emergency.EncryptedEmergency | None: The `EncryptedEmergency`
+            instance, or `None` if no matching record is found.
 
         Raises:
             sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
-            ValueError: If the stored date or enum values cannot be parsed into
-                the expected Python types.
+                or fetching the result.
         """
 
-        select_query = """
-            SELECT uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json
-            FROM user
-            WHERE uuid = ?
+        select_query = f"""
+            SELECT {_ENCRYPTED_EMERGENCY_COLUMNS}
+            FROM encrypted_emergency
+            WHERE user_uuid = ? AND emergency_id = ?
+        """
+        select_query = self.statements.register(
+            "get_encrypted_emergency_by_id", select_query
+        )
+
+        with self.read_pool.connection() as conn:
+            return _mapped(conn, _encrypted_emergency_row).execute(
+                select_query, (user_uuid, emergency_id)
+            ).fetchone()
+
+    def __seek_page(
+        self,
+        queries: tuple[str, str, str],
+        partition: tuple,
+        after: PageCursor | None,
+        page_size: int,
+        row_factory: Callable[[sqlite3.Cursor, tuple], object],
+    ) -> list:
         """
+        Reads the rows of a page with keyset pagination.
 
-        self.cursor.execute(select_query, (uuid,))
-        result = self.cursor.fetchone()
+        Rows are read in triage order (decreasing `severity`, then
+        `created_at`, then primary key) inside one partition of the table.
+        Continuing after a cursor takes at most two index seeks: the rest of
+        the cursor's severity level, then the lower severity levels.
 
-        if result is None:
-            return None
+        Args:
+            queries (tuple[str, str, str]): The SELECT statements for the
+                first page, for the rest of the cursor's severity level and
+                for the lower severity levels. Their parameters are the
+                `partition` values followed by the keyset values and the limit.
+            partition (tuple): Values selecting the partition (e.g. the
+                resolved flag). Empty if the table is not partitioned.
+            after (PageCursor | None): Position of the last row already read,
+                or None to read the first page.
+            page_size (int): Maximum number of rows to read.
+            row_factory (Callable[[sqlite3.Cursor, tuple], object]): Builds
+                the returned objects from the rows.
 
-        return user.User(
-            uuid=result[0],
-            is_rescuer=result[1] == 1,
-            name=result[2],
-            surname=result[3],
-            birthday=datetime.strptime(result[4], "%Y-%m-%d").date(),
-            blood_type=user.BloodType[result[5]],
-            health_info_json=result[6],
-        )
+        Returns:
+            list: Up to `page_size` objects built by `row_factory`, in triage
+            order.
+        """
 
-    def get_rescuers(self) -> List[user.User]:
+        first_query, same_severity_query, lower_severity_query = queries
+
+        with self.read_pool.connection() as conn:
+            cursor = _mapped(conn, row_factory)
+            if after is None:
+                return cursor.execute(first_query, (*partition, page_size)).fetchall()
+
+            rows = cursor.execute(
+                same_severity_query,
+                (
+                    *partition,
+                    after.severity,
+                    after.created_at,
+                    after.emergency_id,
+                    after.user_uuid,
+                    page_size,
+                ),
+            ).fetchall()
+
+            if len(rows) < page_size:
+                rows += cursor.execute(
+                    lower_severity_query,
+                    (*partition, after.severity, page_size - len(rows)),
+                ).fetchall()
+
+        return rows
+
+    def __emergencies_page(
+        self,
+        after: PageCursor | None,
+        page_size: int,
+        resolved: bool | None,
+        summary: bool,
+    ) -> tuple[List[emergency.Emergency], PageCursor | None]:
         """
-        Retrieves all Rescuers stored in the database.
+        Reads one page of emergencies in triage order.
 
-        This method queries the `user` table for the role of Rescuer (is_rescuer = 1)
-        and converts each database row into a `User` object. Database-specific
-        representations are translated into application-level types.
+        See `get_emergencies_page` and `get_emergency_summaries`.
+        """
 
-        This method queries the `user` table for users whose `is_rescuer` flag
-        is set to true (value `1` in the database) and converts each database
-        row into a `User` object. Database-specific representations are
-        translated into application-level types.
+        if page_size < 1:
+            raise ValueError("'page_size' must be at least 1")
 
-        Returns:
-            List[user.User]: A list of User instances representing all Rescuers
-            currently stored in the database.
+        if summary:
+            columns, row_factory = _EMERGENCY_SUMMARY_COLUMNS, self.__summary_row
+        else:
+            columns, row_factory = _EMERGENCY_COLUMNS, _emergency_row
 
-        Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
-            ValueError: If the stored date or enum values cannot be parsed into
-                the expected Python types.
+        first_query = f"""
+            SELECT {columns}
+            FROM emergency
+            WHERE resolved = ?
+            ORDER BY severity DESC, created_at, emergency_id, user_uuid
+            LIMIT ?
         """
+        first_query = self.statements.register("emergencies_page.first", first_query)
 
-        select_query = """
-            SELECT uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json
-            FROM user
-            WHERE is_rescuer = 1
+        same_severity_query = f"""
+            SELECT {columns}
+            FROM emergency
+            WHERE resolved = ? AND severity = ?
+            AND (created_at, emergency_id, user_uuid) > (?, ?, ?)
+            ORDER BY created_at, emergency_id, user_uuid
+            LIMIT ?
+        """
+        same_severity_query = self.statements.register("emergencies_page.same_severity", same_severity_query)
+
+        lower_severity_query = f"""
+            SELECT {columns}
+            FROM emergency
+            WHERE resolved = ? AND severity < ?
+            ORDER BY severity DESC, created_at, emergency_id, user_uuid
+            LIMIT ?
         """
+        lower_severity_query = self.statements.register("emergencies_page.lower_severity", lower_severity_query)
 
-        self.cursor.execute(select_query)
-        result = self.cursor.fetchall()
+        queries = (first_query, same_severity_query, lower_severity_query)
+        partitions = [False, True] if resolved is None else [resolved]
+        if after is not None:
+            # Resume from the partition of the cursor
+            partitions = [p for p in partitions if p >= after.resolved]
 
-        rescuers = []
+        emergencies = []
+        for partition in partitions:
+            cursor = after if after is not None and after.resolved == partition else None
+            emergencies += self.__seek_page(
+                queries,
+                (partition,),
+                cursor,
+                page_size - len(emergencies),
+                row_factory,
+            )
 
-        for row in result:
-            rescuers.append(
-                user.User(
-                    uuid=row[0],
-                    is_rescuer=row[1] == 1,
-                    name=row[2],
-                    surname=row[3],
-                    birthday=datetime.strptime(row[4], "%Y-%m-%d").date(),
-                    blood_type=user.BloodType[row[5]],
-                    health_info_json=row[6],
-                )
+            if len(emergencies) == page_size:
+                break
+
+        next_cursor = None
+        if emergencies and len(emergencies) == page_size:
+            last = emergencies[-1]
+            next_cursor = PageCursor(
+                last.resolved,
+                last.severity,
+                _adapt_datetime(last.created_at),
+                last.emergency_id,
+                last.user_uuid,
             )
 
-        return rescuers
+        return emergencies, next_cursor
 
-    def get_rescuees(self) -> List[user.User]:
+    def __summary_row(
+        self, cursor: sqlite3.Cursor, row: tuple
+    ) -> emergency.LazyEmergency:
+        """
+        Row factory building a `LazyEmergency` from the
+        `_EMERGENCY_SUMMARY_COLUMNS` of a row.
         """
-        Retrieves all Rescuees stored in the database.
 
-        This method queries the `user` table for the role of Rescuee (is_rescuer = 0)
-        and converts each database row into a `User` object. Database-specific
-        representations are translated into application-level types.
+        fields = _emergency_fields(row)
+        has_photo = fields.pop("photo_b64") == 1
+        has_details = fields.pop("details_json") == 1
 
-        This method queries the `user` table for users whose `is_rescuer` flag
-        is set to false (value `0` in the database) and converts each database
-        row into a `User` object. Database-specific representations are
-        translated into application-level types.
+        return emergency.LazyEmergency(
+            loader=self.__details_loader(fields["user_uuid"], fields["emergency_id"]),
+            has_photo=has_photo,
+            has_details=has_details,
+            **fields,
+        )
 
-        Returns:
-            List[user.User]: A list of User instances representing all Rescuees
-            currently stored in the database.
+    def __details_loader(
+        self, user_uuid: str, emergency_id: int
+    ) -> Callable[[str], str]:
+        """
+        Builds the loader of the heavy fields of a `LazyEmergency`.
 
-        Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
-            ValueError: If the stored date or enum values cannot be parsed into
-                the expected Python types.
+        Args:
+            user_uuid (str): The UUID of the user associated with the emergency.
+            emergency_id (int): The ID of the emergency.
+
+        Returns:
+            Callable[[str], str]: A function fetching one heavy field
+            (`photo_b64` or `details_json`) of the emergency with a primary
+            key lookup. It returns an empty string if the emergency no longer
+            exists.
         """
 
-        select_query = """
-            SELECT uuid, is_rescuer, name, surname, birthday, blood_type, health_info_json
-            FROM user
-            WHERE is_rescuer = 0
+        select_queries = {
+            "photo_b64": """
+                SELECT IFNULL(
+                    (SELECT b64encode(data) FROM photo WHERE hash = photo_hash),
+                    IFNULL(photo_b64, '')
+                )
+                FROM emergency
+                WHERE emergency_id = ? AND user_uuid = ?
+            """,
+            "details_json": """
+                SELECT IFNULL(details_json, '') FROM emergency
+                WHERE emergency_id = ? AND user_uuid = ?
+            """,
+        }
+
+        def load(field: str) -> str:
+            with self.read_pool.connection() as conn:
+                result = conn.execute(
+                    select_queries[field], (emergency_id, user_uuid)
+                ).fetchone()
+
+            return result[0] if result is not None else ""
+
+        return load
+
+    def get_emergencies_page(
+        self,
+        after: PageCursor | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        resolved: bool | None = None,
+    ) -> tuple[List[emergency.Emergency], PageCursor | None]:
         """
+        Retrieves one page of emergencies in triage order.
 
-        self.cursor.execute(select_query)
-        result = self.cursor.fetchall()
+        Unresolved emergencies come first, ordered by decreasing severity and
+        then by age (oldest first). Pages are located with a keyset cursor
+        instead of an offset, so every page is read with index seeks and only
+        `page_size` rows are ever held in memory.
 
-        rescuees = []
+        Args:
+            after (PageCursor | None): Cursor returned with the previous page,
+                or None to read the first page.
+            page_size (int): Maximum number of emergencies in the page.
+            resolved (bool | None): If set, only read emergencies with that
+                resolved state.
 
-        for row in result:
-            rescuees.append(
-                user.User(
-                    uuid=row[0],
-                    is_rescuer=row[1] == 1,
-                    name=row[2],
-                    surname=row[3],
-                    birthday=datetime.strptime(row[4], "%Y-%m-%d").date(),
-                    blood_type=user.BloodType[row[5]],
-                    health_info_json=row[6],
-                )
-            )
+        Returns:
+            tuple[List[emergency.Emergency], PageCursor | None]: The
+            emergencies of the page and the cursor of the next one, or `None`
+            if this is the last page.
 
-        return rescuees
+        Raises:
+            ValueError: If `page_size` is not positive, or if the stored
+                position or other fields cannot be parsed into the expected
+                Python types.
+            sqlite3.Error: If an error occurs while executing the SELECT
+                queries or fetching the results.
+        """
 
-    def get_emergencies(self) -> List[emergency.Emergency]:
+        return self.__emergencies_page(after, page_size, resolved, summary=False)
+
+    def get_emergency_summaries(
+        self,
+        after: PageCursor | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        resolved: bool | None = None,
+    ) -> tuple[List[emergency.LazyEmergency], PageCursor | None]:
         """
-        Retrieves all emergencies stored in the database.
+        Retrieves one page of emergencies without their heavy fields.
 
-        This method queries the `emergency` table and converts each database row
-        into a `Emergency` object. Database-specific representations are
-        translated into application-level types.
+        Works like `get_emergencies_page`, but `photo_b64` and `details_json`
+        are not read: the returned `LazyEmergency` instances fetch each of them
+        with a primary key lookup only if it is accessed and non-empty.
+        `has_photo` is available without loading the photo. Meant for list
+        views and queue rebuilds.
+
+        Args:
+            after (PageCursor | None): Cursor returned with the previous page,
+                or None to read the first page.
+            page_size (int): Maximum number of emergencies in the page.
+            resolved (bool | None): If set, only read emergencies with that
+                resolved state.
 
         Returns:
-            List[emergency.Emergency]: A list of Emergency instances representing all
-            emergencies currently stored in the database.
+            tuple[List[emergency.LazyEmergency], PageCursor | None]: The
+            emergencies of the page and the cursor of the next one, or `None`
+            if this is the last page.
 
         Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
-            ValueError: If the stored position or other fields cannot be parsed
-                into the expected Python types.
+            ValueError: If `page_size` is not positive, or if the stored
+                position or other fields cannot be parsed into the expected
+                Python types.
+            sqlite3.Error: If an error occurs while executing the SELECT
+                queries or fetching the results.
         """
 
-        select_query = """
-            SELECT emergency_id, user_uuid, position, address, city, street_number,
-            place_description, photo_b64, severity, resolved, emergency_type, description,
-            details_json, created_at
-            FROM emergency
+        return self.__emergencies_page(after, page_size, resolved, summary=True)
+
+    def iter_emergencies(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        resolved: bool | None = None,
+        summary: bool = False,
+    ) -> Iterator[emergency.Emergency]:
         """
+        Iterates over the emergencies in triage order, one page at a time.
 
-        self.cursor.execute(select_query)
-        result = self.cursor.fetchall()
+        Only one page of `page_size` emergencies is held in memory, and a
+        pooled connection is borrowed only while a page is being read.
 
-        emergencies = []
+        Args:
+            page_size (int): Number of emergencies read per query.
+            resolved (bool | None): If set, only yield emergencies with that
+                resolved state.
+            summary (bool): If True, yield `LazyEmergency` instances built
+                like in `get_emergency_summaries`.
+
+        Yields:
+            emergency.Emergency: The emergencies, in the order of
+            `get_emergencies_page`.
+        """
 
-        for row in result:
-            emergencies.append(
-                emergency.Emergency(
-                    emergency_id=row[0],
-                    user_uuid=row[1],
-                    position=tuple(row[2].split(",")),
-                    address=row[3],
-                    city=row[4],
-                    street_number=row[5],
-                    place_description=row[6],
-                    photo_b64=row[7],
-                    severity=row[8],
-                    resolved=row[9] == 1,  # If True the emergency is resolved
-                    emergency_type=row[10],
-                    description=row[11],
-                    details_json=row[12],
-                    created_at=datetime.strptime(row[13], "%Y-%m-%d %H:%M:%S.%f"),
-                )
-            )
+        cursor = None
+        while True:
+            page, cursor = self.__emergencies_page(cursor, page_size, resolved, summary)
+            yield from page
 
-        return emergencies
+            if cursor is None:
+                return
 
-    def get_emergency_by_id(
-        self, user_uuid: str, id: int
-    ) -> emergency.Emergency | None:
+    def get_photo_size(self, photo_hash: str) -> int | None:
         """
-        Retrieves a specific emergency by user UUID and emergency ID.
-
-        This method queries the `emergency` table for the emergency with the
-        user UUID and ID passed as argument and converts the resulting database
-        row into an `Emergency` object. Database-specific representations
-        are translated into application-level types.
+        Retrieves the size of a stored photo.
 
         Args:
-            user_uuid (str): The UUID of the user associated with the emergency.
-            id (int): The ID of the emergency to retrieve.
+            photo_hash (str): SHA-256 hash of the photo, as set in
+                `Emergency.photo_hash`.
 
         Returns:
-            emergency.Emergency | None: The `Emergency` instance corresponding to
-            the given user UUID and ID, or `None` if no matching record is found.
+            int | None: The size of the photo in bytes, or None if no photo
+            with that hash is stored.
 
         Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the result.
-            ValueError: If the stored position or other fields cannot be parsed
-                into the expected Python types.
+            sqlite3.Error: If an error occurs while executing the SELECT query.
         """
 
         select_query = """
-            SELECT emergency_id, user_uuid, position, address, city, street_number,
-            place_description, photo_b64, severity, resolved, emergency_type, description,
-            details_json, created_at
-            FROM emergency
-            WHERE user_uuid = ? AND emergency_id = ?
+            SELECT size FROM photo WHERE hash = ?
         """
+        select_query = self.statements.register("get_photo_size", select_query)
 
-        self.cursor.execute(select_query, (user_uuid, id))
-        result = self.cursor.fetchone()
-
-        if result is None:
-            return None
-
-        return emergency.Emergency(
-            emergency_id=result[0],
-            user_uuid=result[1],
-            position=tuple(result[2].split(",")),
-            address=result[3],
-            city=result[4],
-            street_number=result[5],
-            place_description=result[6],
-            photo_b64=result[7],
-            severity=result[8],
-            resolved=result[9] == 1,  # If True the emergency is resolved
-            emergency_type=result[10],
-            description=result[11],
-            details_json=result[12],
-            created_at=datetime.strptime(result[13], "%Y-%m-%d %H:%M:%S.%f"),
-        )
+        with self.read_pool.connection() as conn:
+            result = conn.execute(select_query, (photo_hash,)).fetchone()
 
-    def get_emergencies_by_user_uuid(self, user_uuid: str) -> List[emergency.Emergency]:
+        return result[0] if result is not None else None
+
+    def iter_photo(
+        self, photo_hash: str, chunk_size: int = PHOTO_CHUNK_SIZE
+    ) -> Iterator[bytes]:
         """
-        Retrieves all emergencies associated with a specific user UUID.
+        Streams the raw bytes of a stored photo.
 
-        This method queries the `emergency` table for all the emergencies matching
-        the user UUID passed as an argument and converts each resulting
-        database row into an `Emergency` object. Database-specific representations
-        are translated into application-level types.
+        The photo is read incrementally, `chunk_size` bytes at a time, so it is
+        never held in memory as a whole. A pooled connection is borrowed until
+        the iterator is exhausted or closed.
 
         Args:
-            user_uuid (str): The UUID of the user whose emergencies are to be
-                retrieved.
+            photo_hash (str): SHA-256 hash of the photo, as set in
+                `Emergency.photo_hash`.
+            chunk_size (int): Maximum number of bytes per chunk.
 
-        Returns:
-            List[emergency.Emergency]: A list of Emergency instances associated
-            with the specified user.
+        Yields:
+            bytes: Consecutive chunks of the photo. Nothing is yielded if no
+            photo with that hash is stored.
 
         Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
-            ValueError: If the stored position or other fields cannot be parsed
-                into the expected Python types.
+            ValueError: If `chunk_size` is not positive.
+            sqlite3.Error: If an error occurs while reading the photo.
         """
 
+        if chunk_size < 1:
+            raise ValueError("'chunk_size' must be at least 1")
+
         select_query = """
-            SELECT emergency_id, user_uuid, position, address, city, street_number,
-            place_description, photo_b64, severity, resolved, emergency_type, description,
-            details_json, created_at
-            FROM emergency
-            WHERE user_uuid = ?
+            SELECT rowid FROM photo WHERE hash = ?
         """
+        select_query = self.statements.register("iter_photo", select_query)
 
-        self.cursor.execute(select_query, (user_uuid,))
-        result = self.cursor.fetchall()
-
-        emergencies = []
-
-        for row in result:
-            emergencies.append(
-                emergency.Emergency(
-                    emergency_id=row[0],
-                    user_uuid=row[1],
-                    position=tuple(row[2].split(",")),
-                    address=row[3],
-                    city=row[4],
-                    street_number=row[5],
-                    place_description=row[6],
-                    photo_b64=row[7],
-                    severity=row[8],
-                    resolved=row[9] == 1,  # If True the emergency is resolved
-                    emergency_type=row[10],
-                    description=row[11],
-                    details_json=row[12],
-                    created_at=datetime.strptime(row[13], "%Y-%m-%d %H:%M:%S.%f"),
-                )
-            )
+        with self.read_pool.connection() as conn:
+            result = conn.execute(select_query, (photo_hash,)).fetchone()
+            if result is None:
+                return
 
-        return emergencies
+            with conn.blobopen("photo", "data", result[0], readonly=True) as blob:
+                while chunk := blob.read(chunk_size):
+                    yield chunk
 
-    def get_encrypted_emergencies(self) -> List[enc_emergency.EncryptedEmergency]:
+    def get_encrypted_emergencies_page(
+        self, after: PageCursor | None = None, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> tuple[List[enc_emergency.EncryptedEmergency], PageCursor | None]:
         """
-        Retrieves all encrypted emergencies stored in the database.
+        Retrieves one page of encrypted emergencies in triage order.
 
-        This method queries the `encrypted_emergency` table and converts each
-        database row into an `EncryptedEmergency` object.
+        Encrypted emergencies are ordered by decreasing severity and then by
+        age (oldest first). Pages are located with a keyset cursor instead of
+        an offset, so every page is read with index seeks.
+
+        Args:
+            after (PageCursor | None): Cursor returned with the previous page,
+                or None to read the first page.
+            page_size (int): Maximum number of encrypted emergencies in the
+                page.
 
         Returns:
-            List[enc_emergency.EncryptedEmergency]: A list of EncryptedEmergency
-            instances representing all encrypted emergencies currently stored
-            in the database.
+            tuple[List[enc_emergency.EncryptedEmergency], PageCursor | None]:
+            The encrypted emergencies of the page and the cursor of the next
+            one, or `None` if this is the last page.
 
         Raises:
-            sqlite3.Error: If an error occurs while executing the SELECT query
-                or fetching the results.
+            ValueError: If `page_size` is not positive.
+            sqlite3.Error: If an error occurs while executing the SELECT
+                queries or fetching the results.
         """
 
-        select_query = """
-            SELECT emergency_id, user_uuid, severity, routing_info_json, blob, created_at
+        if page_size < 1:
+            raise ValueError("'page_size' must be at least 1")
+
+        first_query = f"""
+            SELECT {_ENCRYPTED_EMERGENCY_COLUMNS}
             FROM encrypted_emergency
+            ORDER BY severity DESC, created_at, emergency_id, user_uuid
+            LIMIT ?
         """
+        first_query = self.statements.register("get_encrypted_emergencies_page.first", first_query)
 
-        self.cursor.execute(select_query)
-        result = self.cursor.fetchall()
+        same_severity_query = f"""
+            SELECT {_ENCRYPTED_EMERGENCY_COLUMNS}
+            FROM encrypted_emergency
+            WHERE severity = ? AND (created_at, emergency_id, user_uuid) > (?, ?, ?)
+            ORDER BY created_at, emergency_id, user_uuid
+            LIMIT ?
+        """
+        same_severity_query = self.statements.register("get_encrypted_emergencies_page.same_severity", same_severity_query)
 
-        enc_emergencies = []
+        lower_severity_query = f"""
+            SELECT {_ENCRYPTED_EMERGENCY_COLUMNS}
+            FROM encrypted_emergency
+            WHERE severity < ?
+            ORDER BY severity DESC, created_at, emergency_id, user_uuid
+            LIMIT ?
+        """
+        lower_severity_query = self.statements.register("get_encrypted_emergencies_page.lower_severity", lower_severity_query)
+
+        enc_emergencies = self.__seek_page(
+            (first_query, same_severity_query, lower_severity_query),
+            (),
+            after,
+            page_size,
+            _encrypted_emergency_row,
+        )
 
-        for row in result:
-            enc_emergencies.append(
-                enc_emergency.EncryptedEmergency(
-                    emergency_id=row[0],
-                    user_uuid=row[1],
-                    severity=row[2],
-                    routing_info_json=row[3],
-                    blob=row[4],
-                    created_at=datetime.strptime(row[5], "%Y-%m-%d %H:%M:%S.%f"),
-                )
+        next_cursor = None
+        if enc_emergencies and len(enc_emergencies) == page_size:
+            last = enc_emergencies[-1]
+            next_cursor = PageCursor(
+                False,
+                last.severity,
+                _adapt_datetime(last.created_at),
+                last.emergency_id,
+                last.user_uuid,
             )
 
-        return enc_emergencies
+        return enc_emergencies, next_cursor
+
+    def iter_encrypted_emergencies(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[enc_emergency.EncryptedEmergency]:
+        """
+        Iterates over the encrypted emergencies in triage order, one page at
+        a time.
+
+        Only one page of `page_size` encrypted emergencies is held in memory,
+        and a pooled connection is borrowed only while a page is being read.
+
+        Args:
+            page_size (int): Number of encrypted emergencies read per query.
+
+        Yields:
+            enc_emergency.EncryptedEmergency: The encrypted emergencies, in
+            the order of `get_encrypted_emergencies_page`.
+        """
+
+        cursor = None
+        while True:
+            page, cursor = self.get_encrypted_emergencies_page(cursor, page_size)
+            yield from page
+
+            if cursor is None:
+                return
 
     def update_user(self, uuid: str, user: user.User) -> None:
         """
@@ -679,15 +2938,12 @@ class DatabaseManager:
             blood_type = ?, health_info_json = ?
             WHERE uuid = ?
         """
+        update_query = self.statements.register("update_user", update_query)
 
-        # Beging transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(update_query, (*user.to_db_tuple()[1:], uuid))
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+        with self.__transaction() as conn:
+            conn.execute(update_query, (*user.to_db_tuple()[1:], uuid))
+
+        self.__invalidate(self.user_cache, uuid)
 
     def update_emergency(
         self, uuid: str, id: int, emergency: emergency.Emergency
@@ -715,23 +2971,22 @@ class DatabaseManager:
 
         update_query = """
             UPDATE emergency
-            SET position = ?, address = ?, city = ?, street_number = ?,
+            SET lat = ?, lon = ?, address = ?, city = ?, street_number = ?,
             place_description = ?, photo_b64 = ?, severity = ?, resolved = ?,
-            emergency_type = ?, description = ?, details_json = ?, created_at = ?
+            emergency_type = ?, description = ?, details_json = ?, created_at = ?,
+            photo_hash = ?, updated_at = ?
             WHERE emergency_id = ? AND user_uuid = ?
         """
+        update_query = self.statements.register("update_emergency", update_query)
 
-        # Beging transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(
+        with self.__transaction() as conn:
+            (row,) = self.__store_emergency_rows(conn, [emergency.to_db_tuple()])
+            conn.execute(
                 update_query,
-                (*emergency.to_db_tuple()[2:], id, uuid),
+                (*row[2:], id, uuid),
             )
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+
+        self.__invalidate(self.emergency_cache, (uuid, id))
 
     def update_encrypted_emergency(
         self,
@@ -764,21 +3019,22 @@ class DatabaseManager:
 
         update_query = """
             UPDATE encrypted_emergency
-            SET severity = ?, routing_info_json = ?, blob = ?, created_at = ?
+            SET severity = ?, routing_info_json = ?, blob = ?, created_at = ?,
+            updated_at = ?
             WHERE user_uuid = ? AND emergency_id = ?
         """
+        update_query = self.statements.register("update_encrypted_emergency", update_query)
 
-        # Beging transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(
+        with self.__transaction() as conn:
+            conn.execute(
                 update_query,
-                (*enc_emergency.to_db_tuple()[2:], user_uuid, emergency_id),
+                (
+                    *enc_emergency.to_db_tuple()[2:],
+                    datetime.now(),
+                    user_uuid,
+                    emergency_id,
+                ),
             )
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
 
     def delete_user(self, uuid: str) -> None:
         """
@@ -801,15 +3057,12 @@ class DatabaseManager:
             DELETE FROM user
             WHERE uuid = ?
         """
+        delete_query = self.statements.register("delete_user", delete_query)
 
-        # Beging transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(delete_query, (uuid,))
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+        with self.__transaction() as conn:
+            conn.execute(delete_query, (uuid,))
+
+        self.__invalidate(self.user_cache, uuid)
 
     def delete_emergency(self, user_uuid: str, id: int) -> None:
         """
@@ -833,15 +3086,12 @@ class DatabaseManager:
             DELETE FROM emergency
             WHERE emergency_id = ? AND user_uuid = ?
         """
+        delete_query = self.statements.register("delete_emergency", delete_query)
 
-        # Beging transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(delete_query, (id, user_uuid))
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+        with self.__transaction() as conn:
+            conn.execute(delete_query, (id, user_uuid))
+
+        self.__invalidate(self.emergency_cache, (user_uuid, id))
 
     def delete_encrypted_emergency(self, user_uuid: str, emergency_id: int) -> None:
         """
@@ -868,12 +3118,110 @@ class DatabaseManager:
             DELETE FROM encrypted_emergency
             WHERE user_uuid = ? AND emergency_id = ?
         """
+        delete_query = self.statements.register("delete_encrypted_emergency", delete_query)
 
-        # Beging transaction
-        self.conn.execute("BEGIN")
-        try:
-            self.cursor.execute(delete_query, (user_uuid, emergency_id))
-            self.conn.commit()
-        except self.conn.Error as e:
-            self.conn.rollback()
-            raise e
+        with self.__transaction() as conn:
+            conn.execute(delete_query, (user_uuid, emergency_id))
+
+    def save_queue_entries(
+        self,
+        entries: Iterable[
+            tuple[int, emergency.Emergency | enc_emergency.EncryptedEmergency]
+        ],
+    ) -> None:
+        """
+        Records emergencies as waiting in a tier of the durable
+        `EmergencyQueue`.
+
+        Only the keys are recorded: the emergencies themselves must be stored
+        in their tables to be reloaded by `get_queue_entries`. Recording an
+        entry again does nothing.
+
+        Args:
+            entries (Iterable[tuple[int, Emergency | EncryptedEmergency]]):
+                Pairs of tier and queued emergency.
+
+        Raises:
+            sqlite3.Error: If the write fails, the transaction is rolled back
+                and the original database error is re-raised.
+        """
+
+        insert_query = """
+            INSERT OR REPLACE INTO queue_entry (tier, user_uuid, emergency_id, table_name)
+            VALUES (?, ?, ?, ?)
+        """
+        insert_query = self.statements.register("save_queue_entries", insert_query)
+
+        rows = [
+            (
+                tier,
+                em.user_uuid,
+                em.emergency_id,
+                "encrypted_emergency"
+                if isinstance(em, enc_emergency.EncryptedEmergency)
+                else "emergency",
+            )
+            for tier, em in entries
+        ]
+
+        with self.__transaction() as conn:
+            conn.executemany(insert_query, rows)
+
+    def delete_queue_entries(self, keys: Iterable[tuple[int, str, int]]) -> None:
+        """
+        Removes emergencies from the journal of the durable `EmergencyQueue`.
+
+        Args:
+            keys (Iterable[tuple[int, str, int]]): Tier, user UUID and
+                emergency ID of each entry. Missing entries are ignored.
+
+        Raises:
+            sqlite3.Error: If the deletion fails, the transaction is rolled
+                back and the original database error is re-raised.
+        """
+
+        delete_query = """
+            DELETE FROM queue_entry
+            WHERE tier = ? AND user_uuid = ? AND emergency_id = ?
+        """
+        delete_query = self.statements.register("delete_queue_entries", delete_query)
+
+        with self.__transaction() as conn:
+            conn.executemany(delete_query, keys)
+
+    def get_queue_entries(
+        self,
+    ) -> list[tuple[int, str, str, int, int, datetime]]:
+        """
+        Retrieves the keys recorded by `save_queue_entries`, to rebuild the
+        durable `EmergencyQueue` after a restart.
+
+        Only the columns the queue orders by are read, so a large queue is
+        reloaded quickly; the emergencies themselves are fetched when they
+        leave the queue. Entries whose emergency has been deleted or
+        resolved in the meantime are left out.
+
+        Returns:
+            list[tuple[int, str, str, int, int, datetime]]: Tier, table name,
+            user UUID, emergency ID, severity and creation time of each entry,
+            in no particular order.
+
+        Raises:
+            sqlite3.Error: If an error occurs while executing the SELECT query
+                or fetching the results.
+        """
+
+        # NOTE: USING merges the key columns, so they can be named unqualified
+        select_query = """
+            SELECT tier, table_name, user_uuid, emergency_id, severity, created_at
+            FROM queue_entry JOIN emergency USING (user_uuid, emergency_id)
+            WHERE table_name = 'emergency' AND resolved = 0
+            UNION ALL
+            SELECT tier, table_name, user_uuid, emergency_id, severity, created_at
+            FROM queue_entry JOIN encrypted_emergency USING (user_uuid, emergency_id)
+            WHERE table_name = 'encrypted_emergency'
+        """
+        select_query = self.statements.register("get_queue_entries", select_query)
+
+        with self.read_pool.connection() as conn:
+            return conn.execute(select_query).fetchall()
@@ -1,9 +1,31 @@
-from typing import Self
+from typing import Callable, Self
 import datetime
 import struct
 
+# Placeholder of a field that has not been fetched from the database yet
+_UNLOADED = object()
+
 
 class Emergency:
+    # NOTE: No per-instance __dict__, the queues hold up to 100k emergencies
+    __slots__ = (
+        "emergency_id",
+        "user_uuid",
+        "position",
+        "address",
+        "city",
+        "street_number",
+        "place_description",
+        "photo_b64",
+        "severity",
+        "resolved",
+        "emergency_type",
+        "description",
+        "details_json",
+        "created_at",
+        "photo_hash",
+    )
+
     def __init__(
         self,
         emergency_id: int,
@@ -20,6 +42,7 @@ class Emergency:
         place_description: str = "",
         photo_b64: str = "",
         details_json: str = "",
+        photo_hash: str = "",
     ) -> None:
         self.emergency_id = emergency_id
         self.user_uuid = user_uuid
@@ -35,6 +58,13 @@ class Emergency:
         self.description = description
         self.details_json = details_json
         self.created_at = created_at
+        # NOTE: SHA-256 of the stored photo bytes, set by the database layer
+        self.photo_hash = photo_hash
+
+    @property
+    def has_photo(self) -> bool:
+        """Whether a photo is attached to the emergency."""
+        return bool(self.photo_b64)
 
     def to_db_tuple(self) -> tuple:
         """
@@ -149,7 +179,8 @@ class Emergency:
             blob, details_json = unpack_str(blob)
             blob, created_at_str = unpack_str(blob)
 
-            position = tuple(position_str.split(","))
+            lat, lon = position_str.split(",")
+            position = (float(lat), float(lon))
             created_at = datetime.datetime.fromisoformat(created_at_str)
 
             return cls(
@@ -170,3 +201,66 @@ class Emergency:
             )
         except Exception as e:
             raise ValueError("Something went wrong:" + str(e))
+
+
+class LazyEmergency(Emergency):
+    """
+    An Emergency whose heavy fields are fetched only when accessed.
+
+    `photo_b64` and `details_json` can be hundreds of kilobytes per row, so
+    list views build emergencies without them. The first access to one of
+    them calls `loader` with the field name to fetch it from storage.
+    Assigning a field replaces it without hitting storage.
+    """
+
+    __slots__ = ("_loader", "_has_photo", "_has_details", "_photo_b64", "_details_json")
+
+    def __init__(
+        self,
+        loader: Callable[[str], str],
+        has_photo: bool = False,
+        has_details: bool = False,
+        **kwargs,
+    ) -> None:
+        self._loader = loader
+        self._has_photo = has_photo
+        self._has_details = has_details
+        super().__init__(photo_b64=_UNLOADED, details_json=_UNLOADED, **kwargs)
+
+    def __copy__(self) -> Self:
+        # NOTE: The default copy reads every slot by name, which would load
+        # the heavy fields through their properties
+        clone = object.__new__(type(self))
+        for name in Emergency.__slots__ + LazyEmergency.__slots__:
+            if name not in ("photo_b64", "details_json"):
+                object.__setattr__(clone, name, getattr(self, name))
+        return clone
+
+    @property
+    def photo_b64(self) -> str:
+        if self._photo_b64 is _UNLOADED:
+            self._photo_b64 = self._loader("photo_b64") if self._has_photo else ""
+        return self._photo_b64
+
+    @photo_b64.setter
+    def photo_b64(self, value: str) -> None:
+        self._photo_b64 = value
+
+    @property
+    def details_json(self) -> str:
+        if self._details_json is _UNLOADED:
+            self._details_json = (
+                self._loader("details_json") if self._has_details else ""
+            )
+        return self._details_json
+
+    @details_json.setter
+    def details_json(self, value: str) -> None:
+        self._details_json = value
+
+    @property
+    def has_photo(self) -> bool:
+        """Whether a photo is attached, answered without loading it."""
+        if self._photo_b64 is _UNLOADED:
+            return self._has_photo
+        return bool(self._photo_b64)
@@ -2,6 +2,16 @@ import datetime
 
 
 class EncryptedEmergency:
+    # NOTE: No per-instance __dict__, the queues hold up to 100k emergencies
+    __slots__ = (
+        "emergency_id",
+        "user_uuid",
+        "severity",
+        "routing_info_json",
+        "blob",
+        "created_at",
+    )
+
     def __init__(
         self,
         emergency_id: int,
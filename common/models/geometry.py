@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import math
+
+# Mean radius of the Earth, in meters
+EARTH_RADIUS = 6_371_008.8
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Computes the great-circle distance between two points, in meters.
+    """
+
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(
+    lat: float, lon: float, radius: float
+) -> tuple[float, float, float, float]:
+    """
+    Computes a box containing every point within `radius` meters of a point.
+
+    Returns:
+        tuple[float, float, float, float]: The southern, western, northern
+        and eastern edges, in degrees. The western edge is greater than the
+        eastern one when the box crosses the antimeridian.
+    """
+
+    d_lat = math.degrees(radius / EARTH_RADIUS)
+    min_lat, max_lat = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+
+    # NOTE: Near the poles the circle spans every meridian
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if max_lat == 90.0 or min_lat == -90.0 or d_lat / cos_lat >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+
+    d_lon = d_lat / cos_lat
+    min_lon = (lon - d_lon + 180.0) % 360.0 - 180.0
+    max_lon = (lon + d_lon + 180.0) % 360.0 - 180.0
+    return min_lat, min_lon, max_lat, max_lon
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import queue
+import sqlite3
+import threading
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections.
+
+    Connections are created lazily through `factory` up to `max_size` and are
+    handed out one per caller by `connection()`. A connection is never shared
+    by two threads at the same time, so every caller gets its own cursor and
+    result set. When all connections are busy, callers block until one is
+    released or `timeout` expires.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], sqlite3.Connection],
+        max_size: int,
+        timeout: float | None = None,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("'max_size' must be at least 1")
+
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+
+        # LIFO keeps the most recently used (warm) connections in rotation
+        self.__idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self.__lock = threading.Lock()
+        self.__created = 0
+        self.__connections: list[sqlite3.Connection] = []
+        self.__closed = False
+
+    @property
+    def size(self) -> int:
+        """Number of connections opened so far."""
+        return self.__created
+
+    def __acquire(self) -> sqlite3.Connection:
+        if self.__closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed pool")
+
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.__lock:
+            if self.__created < self.max_size:
+                conn = self.factory()
+                self.__connections.append(conn)
+                self.__created += 1
+                return conn
+
+        try:
+            return self.__idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"No connection available after {self.timeout} seconds"
+            )
+
+    def __release(self, conn: sqlite3.Connection) -> None:
+        # Never hand a connection with a dangling transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+
+        self.__idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrows a connection from the pool for the duration of a `with` block.
+
+        Yields:
+            sqlite3.Connection: A connection reserved for the calling thread
+            until the block exits.
+
+        Raises:
+            PoolTimeoutError: If the pool is exhausted and no connection is
+                released within `timeout` seconds.
+            sqlite3.ProgrammingError: If the pool has been closed.
+        """
+
+        conn = self.__acquire()
+        try:
+            yield conn
+        finally:
+            self.__release(conn)
+
+    def close(self) -> None:
+        """
+        Closes every connection opened by the pool.
+        """
+
+        with self.__lock:
+            self.__closed = True
+            for conn in self.__connections:
+                conn.close()
+            self.__connections.clear()
@@ -0,0 +1,238 @@
+from __future__ import annotations
+from dataclasses import dataclass
+
+import sqlite3
+import threading
+import time
+
+
+def normalize(sql: str) -> str:
+    """
+    Collapses the whitespace of a statement, so the same SQL written with
+    different indentation is compiled and counted once.
+
+    Line comments are dropped, they would otherwise swallow the rest of the
+    statement once on one line.
+
+    NOTE: String literals are not parsed, whitespace and "--" inside them are
+    treated the same way; statements must pass such values as parameters.
+    """
+
+    if "--" in sql:
+        sql = "\n".join(line.split("--", 1)[0] for line in sql.splitlines())
+    return " ".join(sql.split())
+
+
+@dataclass
+class StatementStats:
+    """
+    Counters of a statement.
+
+    Attributes:
+        name (str | None): Name the statement was registered with, None if
+            it was executed without being registered.
+        sql (str): The normalized SQL.
+        executions (int): Number of `execute` and `executemany` calls.
+        rows (int): Rows fetched by queries, or changed by other statements.
+        total_time (float): Seconds spent executing the statement and
+            fetching its rows.
+    """
+
+    name: str | None
+    sql: str
+    executions: int = 0
+    rows: int = 0
+    total_time: float = 0.0
+
+
+class StatementRegistry:
+    """
+    Named, normalized SQL statements and their execution counters.
+
+    Statements are registered where they are defined with `register`, which
+    names them and returns the normalized SQL to execute. Connections opened
+    with `StatementConnection` normalize any other statement on the fly and
+    count every execution, so `stats()` covers the whole load.
+
+    NOTE: Counters are updated without locking, to keep the overhead per
+    execution low; concurrent executions of the same statement may
+    occasionally lose an increment.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        # Raw and normalized SQL to the counters of the normalized statement,
+        # so each literal is normalized once
+        self.__stats: dict[str, StatementStats] = {}
+
+    def lookup(self, sql: str) -> StatementStats:
+        """
+        Returns the live counters of `sql`, creating them on first use.
+
+        Args:
+            sql (str): The statement, in any layout.
+
+        Returns:
+            StatementStats: The counters, whose `sql` is the normalized
+            statement to execute.
+        """
+
+        stats = self.__stats.get(sql)
+        if stats is None:
+            normalized = normalize(sql)
+            with self.__lock:
+                stats = self.__stats.setdefault(
+                    normalized, StatementStats(None, normalized)
+                )
+                self.__stats[sql] = stats
+        return stats
+
+    def normalize(self, sql: str) -> str:
+        """
+        Returns the normalized form of `sql`, see `normalize`.
+        """
+
+        return self.lookup(sql).sql
+
+    def register(self, name: str, sql: str) -> str:
+        """
+        Names a statement. Registering it again is cheap and does nothing.
+
+        A statement registered under several names is counted under the
+        first one.
+
+        Args:
+            name (str): Name shown by `stats()`.
+            sql (str): The statement, in any layout.
+
+        Returns:
+            str: The normalized SQL to execute.
+        """
+
+        stats = self.lookup(sql)
+        if stats.name is None:
+            stats.name = name
+        return stats.sql
+
+    def stats(self) -> list[StatementStats]:
+        """
+        Returns a copy of the counters of the executed statements, the ones
+        that took the longest first.
+        """
+
+        with self.__lock:
+            unique = {id(s): s for s in self.__stats.values()}.values()
+            stats = [
+                StatementStats(s.name, s.sql, s.executions, s.rows, s.total_time)
+                for s in unique
+                if s.executions
+            ]
+        return sorted(stats, key=lambda s: s.total_time, reverse=True)
+
+    def reset(self) -> None:
+        """
+        Zeroes every counter, keeping the registered names.
+        """
+
+        with self.__lock:
+            for stats in self.__stats.values():
+                stats.executions = 0
+                stats.rows = 0
+                stats.total_time = 0.0
+
+
+class StatementCursor(sqlite3.Cursor):
+    """
+    A cursor counting its executions and fetched rows in the registry of
+    its `StatementConnection`.
+    """
+
+    # Counters of the last query executed, its rows are counted as fetched
+    __stats: StatementStats | None = None
+
+    def __execute(self, execute, sql: str, parameters) -> StatementCursor:
+        stats = self.connection.statements.lookup(sql)
+        self.__stats = None
+        start = time.perf_counter()
+        try:
+            execute(stats.sql, parameters)
+        finally:
+            stats.total_time += time.perf_counter() - start
+            stats.executions += 1
+
+        # NOTE: -1 for queries, their rows are counted as they are fetched
+        if self.rowcount >= 0:
+            stats.rows += self.rowcount
+        else:
+            self.__stats = stats
+        return self
+
+    def execute(self, sql: str, parameters=(), /) -> StatementCursor:
+        return self.__execute(super().execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters, /) -> StatementCursor:
+        return self.__execute(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        stats = self.__stats
+        if stats is None:
+            return super().fetchone()
+
+        start = time.perf_counter()
+        row = super().fetchone()
+        stats.total_time += time.perf_counter() - start
+        stats.rows += row is not None
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        size = self.arraysize if size is None else size
+        stats = self.__stats
+        if stats is None:
+            return super().fetchmany(size)
+
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        stats.total_time += time.perf_counter() - start
+        stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        stats = self.__stats
+        if stats is None:
+            return super().fetchall()
+
+        start = time.perf_counter()
+        rows = super().fetchall()
+        stats.total_time += time.perf_counter() - start
+        stats.rows += len(rows)
+        return rows
+
+    def __next__(self):
+        stats = self.__stats
+        if stats is None:
+            return super().__next__()
+
+        start = time.perf_counter()
+        row = super().__next__()
+        stats.total_time += time.perf_counter() - start
+        stats.rows += 1
+        return row
+
+
+class StatementConnection(sqlite3.Connection):
+    """
+    A connection whose cursors count their statements in `statements`.
+
+    Pass it as `factory` to `sqlite3.connect`, then set `statements`.
+    """
+
+    statements: StatementRegistry
+
+    def cursor(self, factory=StatementCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters, /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
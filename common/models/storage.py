@@ -0,0 +1,521 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Iterator, List, Self
+
+import base64
+import json
+
+from common.models import emergency, user, enc_emergency
+
+# Rows read per statement by the paginated getters
+DEFAULT_PAGE_SIZE = 100
+# Bytes read per step when streaming a photo
+PHOTO_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of a batch insert.
+
+    Attributes:
+        inserted (list[int]): Positions, in the input iterable, of the rows
+            written to the database.
+        conflicts (list[int]): Positions of the rows skipped because their
+            primary key already exists, either in the database or earlier in
+            the same batch.
+        ids (list[int]): Emergency IDs of the written rows, aligned with
+            `inserted`. Empty for users.
+    """
+
+    inserted: list[int] = field(default_factory=list)
+    conflicts: list[int] = field(default_factory=list)
+    ids: list[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    A change to the emergency tables, as read from the change log.
+
+    Attributes:
+        seq (int): Position of the change in the log. Sequence numbers only
+            grow, pass the last one read to `get_changes_since` to continue.
+        table (str): Either "emergency" or "encrypted_emergency".
+        op (str): Either "insert", "update" or "delete".
+        emergency_id (int): ID of the changed row.
+        user_uuid (str): UUID of the user of the changed row.
+        record (emergency.Emergency | enc_emergency.EncryptedEmergency | None):
+            Current state of the row, or None if it no longer exists.
+        updated_at (datetime | None): When the row was last written, to
+            resolve conflicts when applying the change (see
+            `Storage.upsert_emergency`).
+    """
+
+    seq: int
+    table: str
+    op: str
+    emergency_id: int
+    user_uuid: str
+    record: emergency.Emergency | enc_emergency.EncryptedEmergency | None = None
+    updated_at: datetime | None = None
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """
+    Keyset position of the last row of a page, in triage order.
+
+    Rows are ordered by `resolved` (unresolved first), decreasing `severity`,
+    `created_at` (oldest first) and finally by primary key. The next page
+    starts right after this position with an index seek, so reading page N
+    costs the same as reading the first one.
+
+    Attributes:
+        resolved (bool): Resolved flag of the row. Always False for encrypted
+            emergencies, which have no resolved state.
+        severity (int): Severity score of the row.
+        created_at (str): Creation timestamp, as stored in the database.
+        emergency_id (int): Emergency ID of the row.
+        user_uuid (str): UUID of the user associated with the row.
+    """
+
+    resolved: bool
+    severity: int
+    created_at: str
+    emergency_id: int
+    user_uuid: str
+
+    def encode(self) -> str:
+        """
+        Serializes the cursor into an opaque, URL-safe token.
+
+        Returns:
+            str: The token to hand back to `PageCursor.decode`.
+        """
+
+        data = json.dumps(
+            [
+                self.resolved,
+                self.severity,
+                self.created_at,
+                self.emergency_id,
+                self.user_uuid,
+            ]
+        )
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @classmethod
+    def decode(cls: type[Self], token: str) -> Self:
+        """
+        Rebuilds a cursor from a token produced by `encode`.
+
+        Args:
+            token (str): The token to decode.
+
+        Returns:
+            PageCursor: The decoded cursor.
+
+        Raises:
+            ValueError: If the token is malformed.
+        """
+
+        try:
+            resolved, severity, created_at, emergency_id, user_uuid = json.loads(
+                base64.urlsafe_b64decode(token.encode())
+            )
+        except Exception as e:
+            raise ValueError("Invalid page cursor: " + str(e))
+
+        return cls(bool(resolved), severity, created_at, emergency_id, user_uuid)
+
+
+class Storage(ABC):
+    """
+    The operations the application needs from a database.
+
+    `db.DatabaseManager` implements them on SQLite, for the clients and for
+    a single cloud process. `postgres.PostgresStorage` implements them on a
+    PostgreSQL server.
+
+    Every write method runs in its own transaction, unless it is called
+    inside `transaction()`. Errors are the ones of the underlying driver.
+    """
+
+    @abstractmethod
+    def transaction(self) -> AbstractContextManager[None]:
+        """
+        Groups the write methods called in the block into one transaction,
+        committed when the block exits or rolled back if it raises.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Releases every connection.
+        """
+
+    @abstractmethod
+    def insert_user(self, user: user.User) -> None:
+        """
+        Inserts a User.
+        """
+
+    @abstractmethod
+    def insert_users_many(self, users: Iterable[user.User]) -> BatchResult:
+        """
+        Inserts several Users at once, skipping the ones already stored.
+        """
+
+    @abstractmethod
+    def get_users(self) -> List[user.User]:
+        """
+        Retrieves every User.
+        """
+
+    @abstractmethod
+    def get_user_by_uuid(self, uuid: str) -> user.User | None:
+        """
+        Retrieves a User, None if there is no User with that UUID.
+        """
+
+    @abstractmethod
+    def get_rescuers(self) -> List[user.User]:
+        """
+        Retrieves the Users that are rescuers.
+        """
+
+    @abstractmethod
+    def get_rescuees(self) -> List[user.User]:
+        """
+        Retrieves the Users that are not rescuers.
+        """
+
+    @abstractmethod
+    def update_user(self, uuid: str, user: user.User) -> None:
+        """
+        Overwrites the fields of the User with the given UUID.
+        """
+
+    @abstractmethod
+    def delete_user(self, uuid: str) -> None:
+        """
+        Deletes the User with the given UUID.
+        """
+
+    @abstractmethod
+    def insert_emergency(self, emergency: emergency.Emergency) -> int | None:
+        """
+        Inserts an Emergency with a newly allocated ID, and returns the ID.
+        """
+
+    @abstractmethod
+    def insert_emergency_from_rescuee(self, emergency: emergency.Emergency) -> None:
+        """
+        Inserts an Emergency keeping its own ID.
+        """
+
+    @abstractmethod
+    def insert_emergencies_many(
+        self, emergencies: Iterable[emergency.Emergency], assign_ids: bool = False
+    ) -> BatchResult:
+        """
+        Inserts several Emergencies at once, either keeping their IDs and
+        skipping the ones already stored, or allocating new IDs.
+        """
+
+    @abstractmethod
+    def upsert_emergency(
+        self, emergency: emergency.Emergency, updated_at: datetime | None = None
+    ) -> bool:
+        """
+        Inserts an Emergency keeping its own ID, or replaces the stored one
+        if it was last written before `updated_at` (now if None). Returns
+        whether it was written.
+        """
+
+    @abstractmethod
+    def upsert_emergencies_many(
+        self,
+        emergencies: Iterable[emergency.Emergency],
+        updated_at: datetime | None = None,
+    ) -> int:
+        """
+        Upserts several Emergencies at once, like `upsert_emergency`, and
+        returns how many were written.
+        """
+
+    @abstractmethod
+    def get_emergencies(self) -> List[emergency.Emergency]:
+        """
+        Retrieves every Emergency, in triage order.
+        """
+
+    @abstractmethod
+    def get_emergency_by_id(
+        self, user_uuid: str, id: int
+    ) -> emergency.Emergency | None:
+        """
+        Retrieves an Emergency, None if it does not exist.
+        """
+
+    @abstractmethod
+    def get_emergencies_by_user_uuid(self, user_uuid: str) -> List[emergency.Emergency]:
+        """
+        Retrieves the Emergencies of a User.
+        """
+
+    @abstractmethod
+    def get_emergencies_in_bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        resolved: bool | None = None,
+    ) -> List[emergency.Emergency]:
+        """
+        Retrieves the Emergencies inside a bounding box, in triage order. A
+        box crossing the antimeridian has `max_lon` < `min_lon`.
+        """
+
+    @abstractmethod
+    def get_emergencies_near(
+        self,
+        lat: float,
+        lon: float,
+        radius: float,
+        resolved: bool | None = None,
+    ) -> List[emergency.Emergency]:
+        """
+        Retrieves the Emergencies within `radius` meters of a point, closest
+        first.
+        """
+
+    @abstractmethod
+    def get_emergencies_page(
+        self,
+        after: PageCursor | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        resolved: bool | None = None,
+    ) -> tuple[List[emergency.Emergency], PageCursor | None]:
+        """
+        Retrieves the page of Emergencies following `after` in triage order,
+        and the cursor of the next page, None after the last one.
+        """
+
+    @abstractmethod
+    def get_emergency_summaries(
+        self,
+        after: PageCursor | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        resolved: bool | None = None,
+    ) -> tuple[List[emergency.LazyEmergency], PageCursor | None]:
+        """
+        Works like `get_emergencies_page`, but the photo and the details are
+        only read when accessed.
+        """
+
+    @abstractmethod
+    def iter_emergencies(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        resolved: bool | None = None,
+        summary: bool = False,
+    ) -> Iterator[emergency.Emergency]:
+        """
+        Iterates over the Emergencies in triage order, reading one page of
+        `get_emergencies_page` (or `get_emergency_summaries`) at a time.
+        """
+
+    @abstractmethod
+    def get_photo_size(self, photo_hash: str) -> int | None:
+        """
+        Retrieves the size in bytes of the photo with the given hash, None if
+        there is none.
+        """
+
+    @abstractmethod
+    def iter_photo(
+        self, photo_hash: str, chunk_size: int = PHOTO_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Streams the raw bytes of the photo with the given hash, at most
+        `chunk_size` at a time. Nothing is yielded if there is no such photo.
+        """
+
+    @abstractmethod
+    def get_changes_since(
+        self, seq: int = 0, limit: int = DEFAULT_PAGE_SIZE
+    ) -> List[Change]:
+        """
+        Retrieves the changes to the emergency tables logged after `seq`,
+        the last change of each row only.
+        """
+
+    @abstractmethod
+    def update_emergency(
+        self, uuid: str, id: int, emergency: emergency.Emergency
+    ) -> None:
+        """
+        Overwrites the fields of an Emergency.
+        """
+
+    @abstractmethod
+    def delete_emergency(self, user_uuid: str, id: int) -> None:
+        """
+        Deletes an Emergency.
+        """
+
+    @abstractmethod
+    def insert_encrypted_emergency(
+        self, enc_emergency: enc_emergency.EncryptedEmergency
+    ) -> None:
+        """
+        Inserts an EncryptedEmergency.
+        """
+
+    @abstractmethod
+    def insert_encrypted_emergencies_many(
+        self, enc_emergencies: Iterable[enc_emergency.EncryptedEmergency]
+    ) -> BatchResult:
+        """
+        Inserts several EncryptedEmergencies at once, skipping the ones
+        already stored.
+        """
+
+    @abstractmethod
+    def upsert_encrypted_emergency(
+        self,
+        enc_emergency: enc_emergency.EncryptedEmergency,
+        updated_at: datetime | None = None,
+    ) -> bool:
+        """
+        Inserts an EncryptedEmergency, or replaces the stored one like
+        `upsert_emergency`.
+        """
+
+    @abstractmethod
+    def upsert_encrypted_emergencies_many(
+        self,
+        enc_emergencies: Iterable[enc_emergency.EncryptedEmergency],
+        updated_at: datetime | None = None,
+    ) -> int:
+        """
+        Upserts several EncryptedEmergencies at once, and returns how many
+        were written.
+        """
+
+    @abstractmethod
+    def get_encrypted_emergencies(self) -> List[enc_emergency.EncryptedEmergency]:
+        """
+        Retrieves every EncryptedEmergency, in triage order.
+        """
+
+    @abstractmethod
+    def get_encrypted_emergency_by_id(
+        self, user_uuid: str, emergency_id: int
+    ) -> enc_emergency.EncryptedEmergency | None:
+        """
+        Retrieves an EncryptedEmergency, None if it does not exist.
+        """
+
+    @abstractmethod
+    def get_encrypted_emergencies_page(
+        self, after: PageCursor | None = None, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> tuple[List[enc_emergency.EncryptedEmergency], PageCursor | None]:
+        """
+        Retrieves the page of EncryptedEmergencies following `after` in
+        triage order, and the cursor of the next page.
+        """
+
+    @abstractmethod
+    def iter_encrypted_emergencies(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[enc_emergency.EncryptedEmergency]:
+        """
+        Iterates over the EncryptedEmergencies in triage order, one page at a
+        time.
+        """
+
+    @abstractmethod
+    def update_encrypted_emergency(
+        self,
+        user_uuid: str,
+        emergency_id: int,
+        enc_emergency: enc_emergency.EncryptedEmergency,
+    ) -> None:
+        """
+        Overwrites the fields of an EncryptedEmergency.
+        """
+
+    @abstractmethod
+    def delete_encrypted_emergency(self, user_uuid: str, emergency_id: int) -> None:
+        """
+        Deletes an EncryptedEmergency.
+        """
+
+    @abstractmethod
+    def save_queue_entries(
+        self,
+        entries: Iterable[
+            tuple[int, emergency.Emergency | enc_emergency.EncryptedEmergency]
+        ],
+    ) -> None:
+        """
+        Records emergencies as waiting in a tier of the durable
+        `EmergencyQueue`. Only their keys are recorded.
+        """
+
+    @abstractmethod
+    def delete_queue_entries(self, keys: Iterable[tuple[int, str, int]]) -> None:
+        """
+        Removes the (tier, user UUID, emergency ID) entries from the journal
+        of the durable `EmergencyQueue`.
+        """
+
+    @abstractmethod
+    def get_queue_entries(self) -> list[tuple[int, str, str, int, int, datetime]]:
+        """
+        Retrieves the tier, table name, user UUID, emergency ID, severity and
+        creation time of the journaled emergencies still pending.
+        """
+
+
+# Storage returned by `get_storage`, set with `use_storage`
+_storage: Storage | None = None
+
+
+def use_storage(storage: Storage | None) -> None:
+    """
+    Selects the storage returned by `get_storage`.
+
+    Args:
+        storage (Storage | None): The storage to use, None to go back to the
+            `DatabaseManager` singleton.
+    """
+
+    global _storage
+    _storage = storage
+
+
+def get_storage() -> Storage:
+    """
+    Returns the storage selected with `use_storage`, or the `DatabaseManager`
+    singleton if none was.
+
+    Raises:
+        ValueError: If no storage was selected and the `DatabaseManager`
+            singleton was never created.
+    """
+
+    if _storage is not None:
+        return _storage
+
+    # NOTE: Imported here, `db` itself depends on this module
+    from common.models.db import DatabaseManager
+
+    return DatabaseManager.get_instance()
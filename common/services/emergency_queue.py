@@ -1,10 +1,23 @@
-import heapq
+from __future__ import annotations
+from collections import deque
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
-from typing import Self
+from operator import itemgetter
+from typing import Callable, Generic, Hashable, Iterable, Iterator, Self, TypeVar
+
+import heapq
+import itertools
+import threading
+import time
 
+from common.models.storage import Storage
 from common.models.emergency import Emergency
 from common.models.enc_emergency import EncryptedEmergency
 
+T = TypeVar("T")
+
 
 class SeverityType(Enum):
     LOW = 0  # Severity score range: 0 <= x < 35
@@ -12,17 +25,523 @@ class SeverityType(Enum):
     HIGH = 2  # Severity score range: x >= 65
 
 
+class Admission(Enum):
+    """
+    What `EmergencyQueue.push_emergency` did with an emergency.
+    """
+
+    ADMITTED = 0  # Not queued yet, added
+    COALESCED = 1  # Already queued, updated to the new priority
+    DROPPED = 2  # Already queued with the same priority, ignored
+
+
+@dataclass(frozen=True)
+class AdmissionStats:
+    """
+    Pushes of one source into an `EmergencyQueue`, by `Admission`.
+
+    Attributes:
+        admitted (int): Emergencies that were not queued yet.
+        coalesced (int): Pushes that updated an emergency already queued.
+        dropped (int): Duplicates of an emergency already queued.
+    """
+
+    admitted: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+
+
+@dataclass(frozen=True)
+class DispatchWeights:
+    """
+    Share of the emergencies `EmergencyQueue.next` takes from each severity
+    category while several of them have work queued.
+
+    With the defaults, out of every 10 emergencies dispatched 6 are HIGH, 3
+    MEDIUM and 1 LOW, interleaved, so a LOW emergency at the head of its
+    queue waits about `high + medium` dispatches at most. A weight of 0
+    serves a category only when the others are empty.
+
+    Attributes:
+        low (int): Weight of the LOW category.
+        medium (int): Weight of the MEDIUM category.
+        high (int): Weight of the HIGH category.
+    """
+
+    low: int = 1
+    medium: int = 3
+    high: int = 6
+
+    def __post_init__(self) -> None:
+        if min(self.low, self.medium, self.high) < 0:
+            raise ValueError("Dispatch weights must not be negative")
+
+    def of(self, severity_type: SeverityType) -> int:
+        """
+        Returns the weight of a severity category.
+        """
+
+        match severity_type:
+            case SeverityType.LOW:
+                return self.low
+            case SeverityType.MEDIUM:
+                return self.medium
+            case SeverityType.HIGH:
+                return self.high
+
+
+def _best_first(heap: list[list]) -> Iterator[list]:
+    """
+    Iterates over the entries of a max-heap list from the highest rank down,
+    without changing the list.
+
+    The heap is walked best-first from the root, so taking the first k
+    entries costs O(k log k) whatever the size of the heap.
+    """
+
+    # NOTE: Ranks are unique, the slots next to them are never compared
+    frontier = [(heap[0][0], 0)] if heap else []
+    while frontier:
+        _, slot = heapq.heappop_max(frontier)
+        yield heap[slot]
+        for child in (2 * slot + 1, 2 * slot + 2):
+            if child < len(heap):
+                heapq.heappush_max(frontier, (heap[child][0], child))
+
+
+class HeapSnapshot(Generic[T]):
+    """
+    The items of an `IndexedHeap` when `IndexedHeap.snapshot` was called.
+
+    Later changes to the heap are not seen by the snapshot.
+    """
+
+    def __init__(self, heap: list[list]) -> None:
+        # NOTE: Shared with the heap until its next change, never modified
+        self.__heap = heap
+
+    def __len__(self) -> int:
+        return len(self.__heap)
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Iterates over the items in heap order, not in priority order.
+        """
+
+        return (entry[2] for entry in self.__heap)
+
+    def ordered(self) -> Iterator[T]:
+        """
+        Iterates over the items from the highest priority down, see
+        `IndexedHeap.ordered`.
+        """
+
+        return (entry[2] for entry in _best_first(self.__heap))
+
+    def ranked(self) -> Iterator[tuple[tuple, T]]:
+        """
+        Iterates over the items from the highest priority down, each with its
+        rank: its priority followed by the reversed push order.
+        """
+
+        return ((entry[0], entry[2]) for entry in _best_first(self.__heap))
+
+
+class IndexedHeap(Generic[T]):
+    """
+    A max-heap whose items can be found, re-prioritized and removed by
+    identity in O(log n).
+
+    Every item is stored with a hashable identity and a priority. A map from
+    identity to heap slot is kept in step with every swap, so `update` and
+    `remove` jump to the item instead of scanning the heap, and restore the
+    heap invariant by sifting it up or down.
+
+    Items with equal priorities are popped in the order they were pushed.
+    Items themselves are never compared.
+
+    `snapshot` is O(1): the snapshot shares the heap list, and the heap
+    copies the list before its next change (copy-on-write). Entries are
+    replaced rather than modified for the same reason.
+    """
+
+    # Pushes the batch of `push_many` one by one while it is smaller than
+    # the heap divided by this. Larger batches are added with one heapify
+    BULK_PUSH_RATIO = 3
+
+    def __init__(self) -> None:
+        # Entries are [(*priority, -push order), identity, item]
+        self.__heap: list[list] = []
+        self.__slots: dict[Hashable, int] = {}
+        self.__counter = itertools.count()
+        # Whether a snapshot shares `__heap`
+        self.__shared = False
+
+    def __len__(self) -> int:
+        return len(self.__heap)
+
+    def __contains__(self, identity: Hashable) -> bool:
+        return identity in self.__slots
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Iterates over the items in heap order, not in priority order.
+        """
+
+        return (entry[2] for entry in self.__heap)
+
+    def ordered(self) -> Iterator[T]:
+        """
+        Iterates over the items from the highest priority down, without
+        removing them.
+
+        The heap is walked best-first from the root, so taking the first k
+        items costs O(k log k) whatever the size of the heap. The heap must
+        not change while the iterator is in use, iterate over a `snapshot`
+        otherwise.
+        """
+
+        return (entry[2] for entry in _best_first(self.__heap))
+
+    def snapshot(self) -> HeapSnapshot[T]:
+        """
+        Returns the current items, unaffected by later changes, in O(1).
+        """
+
+        self.__shared = True
+        return HeapSnapshot(self.__heap)
+
+    def __own(self) -> None:
+        # NOTE: Called before every change of `__heap`
+        if self.__shared:
+            self.__heap = self.__heap.copy()
+            self.__shared = False
+
+    def clear(self) -> None:
+        """
+        Removes every item.
+        """
+
+        self.__heap = []
+        self.__shared = False
+        self.__slots.clear()
+
+    def heapify(self, entries: Iterable[tuple[Hashable, tuple, T]]) -> None:
+        """
+        Replaces the contents of the heap with `entries` in one pass.
+
+        Much faster than pushing the entries one by one: the heap is built
+        bottom-up in O(n), in C.
+
+        Args:
+            entries (Iterable[tuple[Hashable, tuple, T]]): Identity, priority
+                and item of each entry, see `push`.
+
+        Raises:
+            ValueError: If two entries have the same identity.
+        """
+
+        start = next(self.__counter)
+        heap = [
+            [(*priority, -seq), identity, item]
+            for seq, (identity, priority, item) in enumerate(entries, start)
+        ]
+        self.__counter = itertools.count(start + len(heap))
+        # NOTE: Ranks are unique, identities and items are never compared
+        heapq.heapify_max(heap)
+
+        slots = {entry[1]: slot for slot, entry in enumerate(heap)}
+        if len(slots) != len(heap):
+            raise ValueError("Duplicate identities")
+
+        self.__heap, self.__slots = heap, slots
+        self.__shared = False
+
+    def get(self, identity: Hashable) -> T | None:
+        """
+        Returns the item with the given identity, None if there is none.
+        """
+
+        slot = self.__slots.get(identity)
+        return self.__heap[slot][2] if slot is not None else None
+
+    def peek(self) -> T:
+        """
+        Returns the item with the highest priority without removing it.
+
+        Raises:
+            IndexError: If the heap is empty.
+        """
+
+        if not self.__heap:
+            raise IndexError("peek from an empty heap")
+        return self.__heap[0][2]
+
+    def push(self, identity: Hashable, priority: tuple, item: T) -> None:
+        """
+        Adds an item, or updates it if its identity is already in the heap.
+
+        Args:
+            identity (Hashable): Identifies the item in `update` and `remove`.
+            priority (tuple): Items with greater priorities are popped first.
+            item (T): The item.
+        """
+
+        if identity in self.__slots:
+            self.update(identity, priority, item)
+            return
+
+        self.__own()
+        self.__heap.append([(*priority, -next(self.__counter)), identity, item])
+        self.__slots[identity] = len(self.__heap) - 1
+        self.__sift_up(len(self.__heap) - 1)
+
+    def push_many(self, entries: Iterable[tuple[Hashable, tuple, T]]) -> None:
+        """
+        Adds several items, or updates the ones whose identity is already in
+        the heap, see `push`.
+
+        A batch at least `1 / BULK_PUSH_RATIO` the size of the heap is
+        appended and the heap rebuilt with one heapify in O(n + k), which is
+        then cheaper than k pushes in O(k log n).
+
+        Args:
+            entries (Iterable[tuple[Hashable, tuple, T]]): Identity, priority
+                and item of each entry. The last of the entries sharing an
+                identity wins.
+        """
+
+        fresh: dict[Hashable, tuple[tuple, T]] = {}
+        for identity, priority, item in entries:
+            if identity in self.__slots:
+                self.update(identity, priority, item)
+            else:
+                fresh[identity] = (priority, item)
+
+        if len(fresh) * self.BULK_PUSH_RATIO < len(self.__heap):
+            for identity, (priority, item) in fresh.items():
+                self.push(identity, priority, item)
+            return
+
+        self.__own()
+        heap, counter = self.__heap, self.__counter
+        heap.extend(
+            [(*priority, -next(counter)), identity, item]
+            for identity, (priority, item) in fresh.items()
+        )
+        # NOTE: Ranks are unique, identities and items are never compared
+        heapq.heapify_max(heap)
+        self.__slots = {entry[1]: slot for slot, entry in enumerate(heap)}
+
+    def pop(self) -> T:
+        """
+        Removes and returns the item with the highest priority.
+
+        Raises:
+            IndexError: If the heap is empty.
+        """
+
+        if not self.__heap:
+            raise IndexError("pop from an empty heap")
+        return self.__remove_slot(0)
+
+    def update(self, identity: Hashable, priority: tuple, item: T) -> None:
+        """
+        Replaces an item and its priority, keeping its place among the items
+        of equal priority.
+
+        Raises:
+            KeyError: If no item has the given identity.
+        """
+
+        slot = self.__slots[identity]
+        self.__own()
+        entry = self.__heap[slot]
+        self.__heap[slot] = [(*priority, entry[0][-1]), identity, item]
+        self.__sift_down(self.__sift_up(slot))
+
+    def remove(self, identity: Hashable) -> T:
+        """
+        Removes and returns the item with the given identity.
+
+        Raises:
+            KeyError: If no item has the given identity.
+        """
+
+        return self.__remove_slot(self.__slots[identity])
+
+    def __remove_slot(self, slot: int) -> T:
+        self.__own()
+        heap = self.__heap
+        entry = heap[slot]
+        del self.__slots[entry[1]]
+
+        last = heap.pop()
+        if slot < len(heap):
+            heap[slot] = last
+            self.__slots[last[1]] = slot
+            self.__sift_down(self.__sift_up(slot))
+
+        return entry[2]
+
+    def __sift_up(self, slot: int) -> int:
+        heap, slots = self.__heap, self.__slots
+        entry = heap[slot]
+        while slot > 0:
+            parent = (slot - 1) >> 1
+            if heap[parent][0] >= entry[0]:
+                break
+            heap[slot] = heap[parent]
+            slots[heap[slot][1]] = slot
+            slot = parent
+
+        heap[slot] = entry
+        slots[entry[1]] = slot
+        return slot
+
+    def __sift_down(self, slot: int) -> int:
+        heap, slots = self.__heap, self.__slots
+        size = len(heap)
+        entry = heap[slot]
+        while True:
+            child = 2 * slot + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] > heap[child][0]:
+                child += 1
+            if heap[child][0] <= entry[0]:
+                break
+            heap[slot] = heap[child]
+            slots[heap[slot][1]] = slot
+            slot = child
+
+        heap[slot] = entry
+        slots[entry[1]] = slot
+        return slot
+
+
+@dataclass(slots=True)
+class _JournaledEmergency:
+    """
+    An emergency reloaded from the journal by `EmergencyQueue.enable_journal`.
+
+    Only what the queue orders by is kept; the emergency is fetched from
+    `source` when it leaves the queue.
+    """
+
+    source: Storage
+    table_name: str
+    user_uuid: str
+    emergency_id: int
+    severity: int
+    created_at: datetime
+
+    def load(self) -> Emergency | EncryptedEmergency | None:
+        """
+        Fetches the emergency, None if it was deleted or resolved since it
+        was reloaded.
+        """
+
+        if self.table_name == "encrypted_emergency":
+            return self.source.get_encrypted_emergency_by_id(
+                self.user_uuid, self.emergency_id
+            )
+
+        emergency = self.source.get_emergency_by_id(self.user_uuid, self.emergency_id)
+        return emergency if emergency is not None and not emergency.resolved else None
+
+
+class QueueSnapshot:
+    """
+    The emergencies of an `EmergencyQueue` at the time `EmergencyQueue.snapshot`
+    was called, for read-only consumers such as dashboards.
+
+    Emergencies reloaded from the journal are fetched from the database as
+    they are read, and skipped if they were deleted or resolved meanwhile.
+    """
+
+    def __init__(self, tiers: list[HeapSnapshot]) -> None:
+        # One HeapSnapshot per SeverityType
+        self.__tiers = tiers
+
+    def __len__(self) -> int:
+        return sum(len(tier) for tier in self.__tiers)
+
+    def count(self, severity_type: SeverityType) -> int:
+        """
+        Returns the number of emergencies in a severity category.
+        """
+
+        return len(self.__tiers[severity_type.value])
+
+    def ordered(
+        self, severity_type: SeverityType | None = None
+    ) -> Iterator[Emergency | EncryptedEmergency]:
+        """
+        Iterates over the emergencies in the order `EmergencyQueue.pop` would
+        dispatch them.
+
+        Args:
+            severity_type (SeverityType | None): If set, only iterate over the
+                emergencies of that category.
+        """
+
+        if severity_type is not None:
+            emergencies = self.__tiers[severity_type.value].ordered()
+        else:
+            # NOTE: Severity ranges do not overlap, so ordering by rank serves
+            # the categories from HIGH down like `pop`
+            emergencies = (
+                emergency
+                for _, emergency in heapq.merge(
+                    *(tier.ranked() for tier in self.__tiers),
+                    key=itemgetter(0),
+                    reverse=True,
+                )
+            )
+
+        for emergency in emergencies:
+            if isinstance(emergency, _JournaledEmergency):
+                emergency = emergency.load()
+                if emergency is None:
+                    continue
+            yield emergency
+
+    def peek(
+        self, n: int = 1, severity_type: SeverityType | None = None
+    ) -> list[Emergency | EncryptedEmergency]:
+        """
+        Returns the first `n` emergencies of `ordered`.
+
+        Raises:
+            ValueError: If `n` is negative.
+        """
+
+        if n < 0:
+            raise ValueError("'n' must not be negative")
+        return list(itertools.islice(self.ordered(severity_type), n))
+
+
 class EmergencyQueue:
+    """
+    Pending emergencies, in one priority queue per SeverityType.
+
+    Every method is thread-safe. Consumer threads wait for work with `next`,
+    `pop` or `pop_batch`. Waiting consumers are served in the order they
+    started waiting, so none of them starves while others keep taking work.
+
+    An emergency is queued at most once, whatever its severity: pushing one
+    already queued updates it or is dropped, see `push_emergency`.
+    """
+
+    # Source counted by `admission_stats` when a push names none
+    DEFAULT_SOURCE = "unknown"
+
     __instance = None
     __allow_init = False
 
     min_medium_sev_score = 35
     min_high_sev_score = 65
-    queue: list[list[tuple[int, float, Emergency | EncryptedEmergency]],] = [
-        [],
-        [],
-        [],
-    ]
 
     def __init__(self) -> None:
         if not EmergencyQueue.__allow_init:
@@ -30,14 +549,35 @@ class EmergencyQueue:
                 "EmergencyQueue singleton must be created using EmergencyQueue.get_instance"
             )
 
-        heapq.heapify_max(self.queue[SeverityType.LOW.value])  # Low severity
-        heapq.heapify_max(self.queue[SeverityType.MEDIUM.value])  # Medium severity
-        heapq.heapify_max(self.queue[SeverityType.HIGH.value])  # High severity
+        # One heap per SeverityType, indexed by (user_uuid, emergency_id)
+        self.queue: list[IndexedHeap[Emergency | EncryptedEmergency]] = [
+            IndexedHeap(),
+            IndexedHeap(),
+            IndexedHeap(),
+        ]
 
         self.low_queue = self.queue[SeverityType.LOW.value]
         self.medium_queue = self.queue[SeverityType.MEDIUM.value]
         self.high_queue = self.queue[SeverityType.HIGH.value]
 
+        self.__lock = threading.Lock()
+        # Conditions of the consumers blocked in `next`, `pop` or
+        # `pop_batch`, in arrival order. Only the first one may take an
+        # emergency
+        self.__waiters: deque[threading.Condition] = deque()
+        # Shares of `next` across the severity categories
+        self.weights = DispatchWeights()
+        # Smooth weighted round-robin credit of each category, see `next`
+        self.__credits = [0] * len(SeverityType)
+        # Database the queue is journaled to, see `enable_journal`
+        self.__journal: Storage | None = None
+        # Source to its counters, indexed by Admission value
+        self.__admissions: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return sum(len(heap) for heap in self.queue)
+
     @classmethod
     def get_instance(cls: type[Self]) -> Self:
         """
@@ -54,7 +594,42 @@ class EmergencyQueue:
 
         return cls.__instance
 
-    def push_emergency(self, emergency: Emergency | EncryptedEmergency):
+    def severity_type(self, severity: int) -> SeverityType:
+        """
+        Returns the severity category of a severity score.
+
+        Args:
+            severity (int): The severity score.
+
+        Returns:
+            SeverityType: The category whose range contains the score.
+
+        Raises:
+            ValueError: If the score is negative.
+        """
+
+        if severity < 0:
+            raise ValueError("Invalid severity level")
+        if severity < self.min_medium_sev_score:
+            return SeverityType.LOW
+        if severity < self.min_high_sev_score:
+            return SeverityType.MEDIUM
+        return SeverityType.HIGH
+
+    @staticmethod
+    def __identity(emergency: Emergency | EncryptedEmergency) -> tuple[str, int]:
+        return (emergency.user_uuid, emergency.emergency_id)
+
+    @staticmethod
+    def __priority(emergency: Emergency | EncryptedEmergency) -> tuple[int, float]:
+        # NOTE: Older emergencies first among the ones of equal severity
+        return (emergency.severity, -emergency.created_at.timestamp())
+
+    def push_emergency(
+        self,
+        emergency: Emergency | EncryptedEmergency,
+        source: str = DEFAULT_SOURCE,
+    ) -> Admission:
         """
         Adds an emergency to the appropriate priority queue.
 
@@ -63,38 +638,110 @@ class EmergencyQueue:
         primarily by severity and secondarily by creation time, ensuring that
         higher-severity and older emergencies are processed first.
 
+        The same emergency may reach the queue several times, e.g. over BLE,
+        through the cloud and from relays. An emergency already queued, in
+        any severity category, is found in O(1) by `(user_uuid,
+        emergency_id)`: if its severity or creation time changed it is
+        updated in O(log n), otherwise the push is dropped and the queued
+        instance kept.
+
         Args:
             emergency (Emergency | EncryptedEmergency): The emergency instance
                 to be added to the queue.
+            source (str): Where the emergency came from, see
+                `admission_stats`.
+
+        Returns:
+            Admission: What was done with the emergency.
 
         Raises:
             ValueError: If the severity level of the emergency is invalid
                 (e.g., negative or outside defined severity thresholds).
         """
 
-        severity = emergency.severity
-        created_at = -emergency.created_at.timestamp()
+        tier = self.severity_type(emergency.severity).value
+        with self.__lock:
+            with self.__journal_transaction():
+                admission = self.__admit(tier, emergency)
 
-        # TODO: Establish the maximum possible score
-        if (severity >= 0) and (severity < self.min_medium_sev_score):
-            heapq.heappush_max(
-                self.low_queue,
-                (severity, created_at, (emergency)),
-            )
-        elif (severity >= self.min_medium_sev_score) and (
-            severity < self.min_high_sev_score
-        ):
-            heapq.heappush_max(
-                self.medium_queue,
-                (severity, created_at, emergency),
-            )
-        elif severity >= self.min_high_sev_score:
-            heapq.heappush_max(
-                self.high_queue,
-                (severity, created_at, emergency),
-            )
-        else:
-            raise ValueError("Invalid severity level")
+            self.__count(source, admission)
+            self.__wake_next()
+            return admission
+
+    def __find(self, identity: tuple[str, int]) -> int | None:
+        # NOTE: Called with the lock held. Every heap indexes its emergencies
+        for tier, heap in enumerate(self.queue):
+            if identity in heap:
+                return tier
+        return None
+
+    def __admit(self, tier: int, emergency: Emergency | EncryptedEmergency) -> Admission:
+        # NOTE: Called with the lock held, inside a journal transaction
+        identity, priority = self.__identity(emergency), self.__priority(emergency)
+
+        queued_tier = self.__find(identity)
+        if queued_tier is None:
+            if self.__journal is not None:
+                self.__journal.save_queue_entries([(tier, emergency)])
+            self.queue[tier].push(identity, priority, emergency)
+            return Admission.ADMITTED
+
+        queued = self.queue[queued_tier].get(identity)
+        if queued_tier == tier and self.__priority(queued) == priority:
+            return Admission.DROPPED
+
+        self.__move(identity, queued_tier, tier, emergency)
+        return Admission.COALESCED
+
+    def __move(
+        self,
+        identity: tuple[str, int],
+        old_tier: int,
+        new_tier: int,
+        emergency: Emergency | EncryptedEmergency,
+    ) -> None:
+        # NOTE: Called with the lock held, inside a journal transaction
+        if old_tier == new_tier:
+            self.queue[new_tier].update(identity, self.__priority(emergency), emergency)
+            return
+
+        if self.__journal is not None:
+            self.__journal.delete_queue_entries([(old_tier, *identity)])
+            self.__journal.save_queue_entries([(new_tier, emergency)])
+
+        self.queue[old_tier].remove(identity)
+        self.queue[new_tier].push(identity, self.__priority(emergency), emergency)
+
+    def __count(self, source: str, admission: Admission, n: int = 1) -> None:
+        # NOTE: Called with the lock held
+        counters = self.__admissions.setdefault(source, [0] * len(Admission))
+        counters[admission.value] += n
+
+    def admission_stats(self) -> dict[str, AdmissionStats]:
+        """
+        Returns what was done with the pushed emergencies, by source.
+
+        During mesh flooding most pushes are expected to be dropped
+        duplicates, while the queue holds each emergency once.
+
+        Returns:
+            dict[str, AdmissionStats]: The counters of each source that
+            pushed emergencies since the last `reset_admission_stats`.
+        """
+
+        with self.__lock:
+            return {
+                source: AdmissionStats(*counters)
+                for source, counters in self.__admissions.items()
+            }
+
+    def reset_admission_stats(self) -> None:
+        """
+        Zeroes the counters of `admission_stats`.
+        """
+
+        with self.__lock:
+            self.__admissions.clear()
 
     def pop_emergency(
         self, severity_type: SeverityType
@@ -117,13 +764,162 @@ class EmergencyQueue:
             IndexError: If the selected queue is empty.
         """
 
-        match severity_type:
-            case SeverityType.LOW:
-                return heapq.heappop_max(self.low_queue)[2]
-            case SeverityType.MEDIUM:
-                return heapq.heappop_max(self.medium_queue)[2]
-            case SeverityType.HIGH:
-                return heapq.heappop_max(self.high_queue)[2]
+        while True:
+            with self.__lock:
+                taken = self.__take(severity_type.value)
+
+            emergency = self.__resolve(taken)
+            if emergency is not None:
+                return emergency
+
+    def push_many(
+        self,
+        emergencies: Iterable[Emergency | EncryptedEmergency],
+        source: str = DEFAULT_SOURCE,
+    ) -> AdmissionStats:
+        """
+        Adds several emergencies at once, see `push_emergency`.
+
+        The new emergencies are journaled in one statement, and a batch
+        large compared to its queue is added with one heapify (see
+        `IndexedHeap.push_many`). Duplicates inside the batch are coalesced
+        like duplicates of queued emergencies.
+
+        Args:
+            emergencies (Iterable[Emergency | EncryptedEmergency]): The
+                emergencies to add.
+            source (str): Where the emergencies came from, see
+                `admission_stats`.
+
+        Returns:
+            AdmissionStats: What was done with the emergencies of the batch.
+
+        Raises:
+            ValueError: If the severity level of an emergency is invalid, in
+                which case none of them is added.
+        """
+
+        batch = [
+            (self.severity_type(emergency.severity).value, emergency)
+            for emergency in emergencies
+        ]
+
+        counts = [0] * len(Admission)
+        with self.__lock:
+            # Emergencies of the batch not queued yet, by identity, with
+            # their tier and priority
+            fresh: dict[tuple[str, int], tuple] = {}
+            with self.__journal_transaction():
+                for tier, emergency in batch:
+                    identity = self.__identity(emergency)
+                    priority = self.__priority(emergency)
+
+                    if identity in fresh:
+                        if fresh[identity][:2] == (tier, priority):
+                            admission = Admission.DROPPED
+                        else:
+                            fresh[identity] = (tier, priority, emergency)
+                            admission = Admission.COALESCED
+                    elif self.__find(identity) is None:
+                        fresh[identity] = (tier, priority, emergency)
+                        admission = Admission.ADMITTED
+                    else:
+                        admission = self.__admit(tier, emergency)
+                    counts[admission.value] += 1
+
+                if self.__journal is not None:
+                    self.__journal.save_queue_entries(
+                        (tier, emergency) for tier, _, emergency in fresh.values()
+                    )
+
+            tiers: list[list] = [[] for _ in self.queue]
+            for identity, (tier, priority, emergency) in fresh.items():
+                tiers[tier].append((identity, priority, emergency))
+            for heap, entries in zip(self.queue, tiers):
+                heap.push_many(entries)
+
+            for admission in Admission:
+                if counts[admission.value]:
+                    self.__count(source, admission, counts[admission.value])
+            self.__wake_next()
+
+        return AdmissionStats(*counts)
+
+    def snapshot(self) -> QueueSnapshot:
+        """
+        Returns the emergencies queued now, unaffected by later changes.
+
+        Taking a snapshot is O(1) and holds the lock only for that: the
+        snapshot shares the heaps of the queue, which copy themselves before
+        their next change (copy-on-write).
+
+        Returns:
+            QueueSnapshot: The snapshot.
+        """
+
+        with self.__lock:
+            return QueueSnapshot([heap.snapshot() for heap in self.queue])
+
+    def peek(
+        self, n: int = 1, severity_type: SeverityType | None = None
+    ) -> list[Emergency | EncryptedEmergency]:
+        """
+        Returns the first emergencies `pop` would dispatch, without removing
+        them.
+
+        The heaps are walked best-first under the lock, in O(n log n)
+        whatever the size of the queue, without a snapshot: a snapshot would
+        make the next change of the queue copy its heaps. Emergencies
+        reloaded from the journal are fetched once the lock is released, and
+        the walk is repeated past the ones deleted or resolved meanwhile.
+
+        Args:
+            n (int): Maximum number of emergencies to return.
+            severity_type (SeverityType | None): If set, only look at the
+                emergencies of that category.
+
+        Returns:
+            list[Emergency | EncryptedEmergency]: Up to `n` emergencies,
+            highest priority first.
+
+        Raises:
+            ValueError: If `n` is negative.
+        """
+
+        if n < 0:
+            raise ValueError("'n' must not be negative")
+
+        tiers = (
+            [severity_type] if severity_type is not None else list(reversed(SeverityType))
+        )
+        # Identities of the journaled emergencies found stale
+        stale: set[tuple[str, int]] = set()
+        while True:
+            with self.__lock:
+                # NOTE: Severity ranges do not overlap, so `pop` serves the
+                # categories one after the other from HIGH down
+                candidates = list(
+                    itertools.islice(
+                        (
+                            em
+                            for tier in tiers
+                            for em in self.queue[tier.value].ordered()
+                            if self.__identity(em) not in stale
+                        ),
+                        n,
+                    )
+                )
+
+            emergencies = []
+            for candidate in candidates:
+                emergency = self.__resolve(candidate)
+                if emergency is None:
+                    stale.add(self.__identity(candidate))
+                else:
+                    emergencies.append(emergency)
+
+            if len(emergencies) == len(candidates):
+                return emergencies
 
     def update_emergency(
         self, old_emergency_severity: int, emergency: Emergency | EncryptedEmergency
@@ -131,14 +927,11 @@ class EmergencyQueue:
         """
         Updates an existing emergency in the priority queue.
 
-        This method removes a previously queued emergency based on its old
-        severity level and re-inserts the updated emergency into the
-        appropriate priority queue. This allows the emergency to be
-        re-prioritized if its severity or other relevant attributes have
-        changed.
-
-        A linear search is used to locate the existing emergency within the
-        queue, as the internal lists are not sorted.
+        This method finds the previously queued emergency, in the queue of its
+        old severity level, through the index of the queue. If the severity
+        category is unchanged the emergency is re-prioritized in place,
+        otherwise it is moved to the queue of its new category. Either way the
+        update costs O(log n).
 
         Args:
             old_emergency_severity (int): The previous severity level of the
@@ -148,52 +941,348 @@ class EmergencyQueue:
                 instance to be re-queued.
 
         Raises:
-            Exception: If the emergency to be updated cannot be found in the
-                queue corresponding to the old severity level.
-        """
-
-        # NOTE: Linear Search is the best in this case because the lists are not
-        # sorted.
-        def linear_search(
-            arr: list, new_emergency: Emergency | EncryptedEmergency
-        ) -> int:
-            index: int = 0
-            for elem in arr:
-                if (
-                    (elem[2] is not None)
-                    and (elem[2].user_uuid == new_emergency.user_uuid)
-                    and (elem[2].emergency_id == new_emergency.emergency_id)
-                ):
-                    return index
-                index += 1
-
-            if index == len(arr):
-                return -1
-
-            return index
-
-        pos: int = -1
-        if (old_emergency_severity >= 0) and (
-            old_emergency_severity < self.min_medium_sev_score
-        ):
-            pos = linear_search(self.low_queue, emergency)
-            if pos == -1:
-                raise ValueError("Old emergency not found")
+            ValueError: If the emergency to be updated cannot be found in the
+                queue corresponding to the old severity level, or if the new
+                severity level is invalid.
+        """
 
-            self.low_queue.pop(pos)
-        elif (old_emergency_severity >= self.min_medium_sev_score) and (
-            old_emergency_severity < self.min_high_sev_score
-        ):
-            pos = linear_search(self.medium_queue, emergency)
-            if pos == -1:
-                raise ValueError("Old emergency not found")
+        old_tier = self.severity_type(old_emergency_severity).value
+        new_tier = self.severity_type(emergency.severity).value
 
-            self.medium_queue.pop(pos)
-        else:
-            pos = linear_search(self.high_queue, emergency)
-            if pos == -1:
+        identity = self.__identity(emergency)
+        with self.__lock:
+            if identity not in self.queue[old_tier]:
                 raise ValueError("Old emergency not found")
 
-            self.high_queue.pop(pos)
+            with self.__journal_transaction():
+                self.__move(identity, old_tier, new_tier, emergency)
+
+    def remove_emergency(
+        self, emergency: Emergency | EncryptedEmergency
+    ) -> Emergency | EncryptedEmergency:
+        """
+        Removes a queued emergency, e.g. when it is cancelled or resolved.
+
+        The emergency is looked up by `(user_uuid, emergency_id)`, whatever
+        its severity, and removed in O(log n).
+
+        Args:
+            emergency (Emergency | EncryptedEmergency): The emergency to
+                remove, or any object with the same `user_uuid` and
+                `emergency_id`.
+
+        Returns:
+            Emergency | EncryptedEmergency: The instance that was queued.
+
+        Raises:
+            ValueError: If the emergency is not in the queue.
+        """
+
+        identity = self.__identity(emergency)
+        with self.__lock:
+            tier = self.__find(identity)
+            if tier is None:
+                raise ValueError("Emergency not found")
+
+            if self.__journal is not None:
+                self.__journal.delete_queue_entries([(tier, *identity)])
+            queued = self.queue[tier].remove(identity)
+
+        return self.__resolve(queued) or emergency
+
+    def enable_journal(self, journal: Storage) -> int:
+        """
+        Makes the queue durable, journaling every change to `journal`.
+
+        The emergencies journaled by a previous process are reloaded first
+        and merged with the ones already in memory, with one bulk build of
+        each heap. Only their keys and priorities are read: each emergency is
+        fetched from the database when it leaves the queue, and skipped if it
+        has been deleted or resolved in the meantime. An emergency both in
+        memory and in the journal, in any tier, is queued once as it is in
+        memory, and its leftover journal entries are deleted.
+
+        From then on every push, pop, update and removal is written to the
+        journal before the queue changes, so a failed write leaves the queue
+        as it was. Only emergencies stored in the database can be reloaded.
+
+        Args:
+            journal (Storage): The database to journal to.
+
+        Returns:
+            int: Number of emergencies queued once reloaded.
+
+        Raises:
+            sqlite3.Error | psycopg.Error: If the journal cannot be read or
+                written.
+        """
+
+        with self.__lock:
+            # Journaled emergencies by identity, with their tier and priority
+            journaled: dict[tuple[str, int], tuple] = {}
+            # Journal entries to drop, as keys of `delete_queue_entries`
+            stale: list[tuple[int, str, int]] = []
+            for tier, table_name, user_uuid, emergency_id, severity, created_at in (
+                journal.get_queue_entries()
+            ):
+                identity = (user_uuid, emergency_id)
+                entry = (
+                    tier,
+                    (severity, -created_at.timestamp()),
+                    _JournaledEmergency(
+                        journal, table_name, user_uuid, emergency_id, severity, created_at
+                    ),
+                )
+
+                # NOTE: Journaled in several tiers, keep the tier of its severity
+                kept = journaled.get(identity)
+                if kept is not None:
+                    if self.severity_type(severity).value != tier:
+                        stale.append((tier, *identity))
+                        continue
+                    stale.append((kept[0], *identity))
+                journaled[identity] = entry
+
+            # NOTE: The emergencies in memory are newer than the journaled ones,
+            # whatever tier each was journaled in
+            in_memory = {
+                self.__identity(em): (tier, em)
+                for tier, heap in enumerate(self.queue)
+                for em in heap
+            }
+            tiers: list[list] = [[] for _ in self.queue]
+            for identity, (tier, priority, em) in journaled.items():
+                if identity not in in_memory:
+                    tiers[tier].append((identity, priority, em))
+                elif in_memory[identity][0] != tier:
+                    stale.append((tier, *identity))
+            for identity, (tier, em) in in_memory.items():
+                tiers[tier].append((identity, self.__priority(em), em))
+
+            with journal.transaction():
+                journal.delete_queue_entries(stale)
+                journal.save_queue_entries(
+                    (tier, em)
+                    for tier, em in in_memory.values()
+                    if not isinstance(em, _JournaledEmergency)
+                )
+
+            for heap, entries in zip(self.queue, tiers):
+                heap.heapify(entries)
+
+            self.__journal = journal
+            self.__wake_next()
+            return sum(len(heap) for heap in self.queue)
+
+    def disable_journal(self) -> None:
+        """
+        Stops journaling the queue. The journal keeps the emergencies queued
+        at this point.
+        """
+
+        with self.__lock:
+            self.__journal = None
+
+    def __take(self, tier: int) -> Emergency | EncryptedEmergency | _JournaledEmergency:
+        """
+        Removes the first emergency of a tier, journaling it first. Must be
+        called with the lock held.
+
+        Raises:
+            IndexError: If the tier is empty.
+        """
+
+        heap = self.queue[tier]
+        emergency = heap.peek()
+        if self.__journal is not None:
+            self.__journal.delete_queue_entries([(tier, *self.__identity(emergency))])
+        return heap.pop()
+
+    @staticmethod
+    def __resolve(
+        emergency: Emergency | EncryptedEmergency | _JournaledEmergency,
+    ) -> Emergency | EncryptedEmergency | None:
+        """
+        Fetches an emergency reloaded from the journal, see
+        `_JournaledEmergency.load`. Other emergencies are returned as they are.
+
+        NOTE: Must be called without the lock held, so a database read does
+        not block the other producers and consumers, and outside a journal
+        transaction, an in-memory database has a single connection
+        """
+
+        if isinstance(emergency, _JournaledEmergency):
+            return emergency.load()
+        return emergency
+
+    def __journal_transaction(self) -> AbstractContextManager:
+        # NOTE: Called with the lock held
+        if self.__journal is None:
+            return nullcontext()
+        return self.__journal.transaction()
+
+    def __wake_next(self) -> None:
+        # NOTE: Called with the lock held
+        if self.__waiters and any(self.queue):
+            self.__waiters[0].notify()
+
+    def __pop_highest(self) -> Emergency | EncryptedEmergency | _JournaledEmergency:
+        # NOTE: Called with the lock held, with at least one emergency queued
+        for severity_type in reversed(SeverityType):
+            if self.queue[severity_type.value]:
+                return self.__take(severity_type.value)
+        raise IndexError("pop from an empty queue")
+
+    def __pop_scheduled(self) -> Emergency | EncryptedEmergency | _JournaledEmergency:
+        # NOTE: Called with the lock held, with at least one emergency queued.
+        # Smooth weighted round-robin: every queued category earns its weight
+        # in credit, the richest is served and pays back the total weight
+        ready = [t for t in reversed(SeverityType) if self.queue[t.value]]
+        for severity_type in SeverityType:
+            if severity_type not in ready:
+                self.__credits[severity_type.value] = 0
+
+        total = 0
+        for severity_type in ready:
+            weight = self.weights.of(severity_type)
+            self.__credits[severity_type.value] += weight
+            total += weight
+
+        # NOTE: On equal credit the higher category wins, `ready` is sorted
+        chosen = max(ready, key=lambda t: self.__credits[t.value])
+        self.__credits[chosen.value] -= total
+        return self.__take(chosen.value)
+
+    def __wait_turn(self, timeout: float | None) -> bool:
+        """
+        Waits until the calling consumer is first in line and an emergency is
+        queued. Must be called with the lock held.
+
+        Returns:
+            bool: False if `timeout` seconds went by first.
+        """
+
+        if not self.__waiters and any(self.queue):
+            return True
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        waiter = threading.Condition(self.__lock)
+        self.__waiters.append(waiter)
+        try:
+            while self.__waiters[0] is not waiter or not any(self.queue):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                waiter.wait(remaining)
+            return True
+        finally:
+            self.__waiters.remove(waiter)
+
+    def __dispatch(
+        self,
+        pop_one: Callable[[], Emergency | EncryptedEmergency | _JournaledEmergency],
+        n: int,
+        timeout: float | None,
+    ) -> list[Emergency | EncryptedEmergency]:
+        """
+        Waits for the turn of the caller and takes up to `n` emergencies with
+        `pop_one`, skipping the ones that no longer need dispatching.
+
+        Returns:
+            list[Emergency | EncryptedEmergency]: The emergencies, empty if
+            the timeout expired first.
+        """
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self.__lock:
+                remaining = (
+                    max(0.0, deadline - time.monotonic()) if deadline is not None else None
+                )
+                if not self.__wait_turn(remaining):
+                    return []
+
+                # NOTE: One journal commit for the whole batch. If it fails the
+                # batch is lost from memory but stays journaled, and is queued
+                # again on the next `enable_journal`
+                taken = []
+                with self.__journal_transaction():
+                    while len(taken) < n and any(self.queue):
+                        taken.append(pop_one())
+
+                # Hands the rest of the queue to the next consumer in line
+                self.__wake_next()
+
+            # NOTE: Outside the lock, fetching a journaled emergency reads the
+            # database. If every one taken went stale, wait in line again
+            batch = [em for em in map(self.__resolve, taken) if em is not None]
+            if batch:
+                return batch
+
+    def next(self, timeout: float | None = None) -> Emergency | EncryptedEmergency | None:
+        """
+        Removes and returns the next emergency to dispatch, waiting for one if
+        the queue is empty.
+
+        Unlike `pop`, lower severity categories are not starved by a steady
+        stream of higher ones: while several categories have work queued,
+        they are served in the proportions given by `weights`, interleaved.
+        Within a category emergencies come out in priority order.
+
+        Args:
+            timeout (float | None): Seconds to wait for an emergency, forever
+                if None.
+
+        Returns:
+            Emergency | EncryptedEmergency | None: The emergency, None if the
+            timeout expired first.
+        """
+
+        batch = self.__dispatch(self.__pop_scheduled, 1, timeout)
+        return batch[0] if batch else None
+
+    def pop(self, timeout: float | None = None) -> Emergency | EncryptedEmergency | None:
+        """
+        Removes and returns the highest-priority emergency of any severity,
+        waiting for one if the queue is empty.
+
+        HIGH emergencies are returned before MEDIUM ones, and MEDIUM before
+        LOW ones. Consumers waiting at the same time are served in the order
+        they called `pop` or `pop_batch`.
+
+        Args:
+            timeout (float | None): Seconds to wait for an emergency, forever
+                if None.
+
+        Returns:
+            Emergency | EncryptedEmergency | None: The emergency, None if the
+            timeout expired first.
+        """
+
+        batch = self.__dispatch(self.__pop_highest, 1, timeout)
+        return batch[0] if batch else None
+
+    def pop_batch(
+        self, n: int, timeout: float | None = None
+    ) -> list[Emergency | EncryptedEmergency]:
+        """
+        Removes and returns up to `n` emergencies, in the order `pop` would
+        return them, waiting for at least one if the queue is empty.
+
+        Args:
+            n (int): Maximum number of emergencies to return.
+            timeout (float | None): Seconds to wait for the first emergency,
+                forever if None.
+
+        Returns:
+            list[Emergency | EncryptedEmergency]: The emergencies, empty if
+            the timeout expired first.
+
+        Raises:
+            ValueError: If `n` is not positive.
+        """
+
+        if n < 1:
+            raise ValueError("'n' must be at least 1")
 
-        self.push_emergency(emergency)
+        return self.__dispatch(self.__pop_highest, n, timeout)
@@ -0,0 +1,311 @@
+from __future__ import annotations
+from typing import Hashable, Iterator, Mapping, Protocol, Self
+
+import heapq
+import math
+import threading
+
+from common.models.geometry import bounding_box, haversine
+from common.models.emergency import Emergency
+from common.services.emergency_queue import IndexedHeap
+
+# Position the client stores when the user did not give one
+UNKNOWN_POSITION = (0.0, 0.0)
+
+
+class Rescuer(Protocol):
+    """
+    What `GeoEmergencyQueue.match_rescuers` reads of a rescuer.
+
+    Attributes:
+        busy (bool): Whether the rescuer is already handling an emergency.
+        position (tuple[float, float] | None): Last known latitude and
+            longitude, None if unknown.
+    """
+
+    busy: bool
+    position: tuple[float, float] | None
+
+
+class GeoEmergencyQueue:
+    """
+    Pending emergencies, partitioned by location into a grid of cells.
+
+    Every cell is a priority queue ordered like `EmergencyQueue`, by severity
+    and then by age. A search around a point only visits the cells that
+    overlap the bounding box of the circle, starting from the cell whose best
+    emergency ranks highest, and stops as soon as no remaining cell can beat
+    the best emergency found within the radius. Within a cell emergencies are
+    visited in priority order, so only the ones out of range are looked past.
+
+    Every method is thread-safe.
+    """
+
+    __instance = None
+    __allow_init = False
+
+    # Side of a cell, in degrees. About 5.5 km of latitude
+    cell_size = 0.05
+
+    def __init__(self) -> None:
+        if not GeoEmergencyQueue.__allow_init:
+            raise TypeError(
+                "GeoEmergencyQueue singleton must be created using GeoEmergencyQueue.get_instance"
+            )
+
+        self.__lock = threading.Lock()
+        # Non-empty cells by grid coordinates, each indexed by
+        # (user_uuid, emergency_id)
+        self.__cells: dict[tuple[int, int], IndexedHeap[Emergency]] = {}
+        # (user_uuid, emergency_id) of every queued emergency to its cell
+        self.__located: dict[Hashable, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__located)
+
+    @classmethod
+    def get_instance(cls: type[Self]) -> Self:
+        """
+        Returns the singleton instance of GeoEmergencyQueue.
+
+        Returns:
+            GeoEmergencyQueue: The singleton instance of the queue.
+        """
+
+        if cls.__instance is None:
+            cls.__allow_init = True
+            cls.__instance = cls()
+            cls.__allow_init = False
+
+        return cls.__instance
+
+    @staticmethod
+    def __identity(emergency: Emergency) -> tuple[str, int]:
+        return (emergency.user_uuid, emergency.emergency_id)
+
+    @staticmethod
+    def __priority(emergency: Emergency) -> tuple[int, float]:
+        # NOTE: Same order as `EmergencyQueue`
+        return (emergency.severity, -emergency.created_at.timestamp())
+
+    def __cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def clear(self) -> None:
+        """
+        Removes every emergency.
+        """
+
+        with self.__lock:
+            self.__cells.clear()
+            self.__located.clear()
+
+    def push_emergency(self, emergency: Emergency) -> None:
+        """
+        Adds an emergency to the cell of its position.
+
+        Pushing an emergency already queued replaces it, moving it to the
+        cell of its new position if needed.
+
+        Args:
+            emergency (Emergency): The emergency to add.
+
+        Raises:
+            ValueError: If the emergency has no known position.
+        """
+
+        if emergency.position == UNKNOWN_POSITION:
+            raise ValueError("Emergency has no position")
+
+        identity = self.__identity(emergency)
+        cell = self.__cell(*emergency.position)
+        with self.__lock:
+            if self.__located.get(identity, cell) != cell:
+                self.__discard(identity)
+
+            self.__cells.setdefault(cell, IndexedHeap()).push(
+                identity, self.__priority(emergency), emergency
+            )
+            self.__located[identity] = cell
+
+    def remove_emergency(self, emergency: Emergency) -> Emergency | None:
+        """
+        Removes an emergency, found by user UUID and emergency ID.
+
+        Args:
+            emergency (Emergency): The emergency, or any object with the same
+                `user_uuid` and `emergency_id`.
+
+        Returns:
+            Emergency | None: The removed emergency, None if it was not
+            queued.
+        """
+
+        with self.__lock:
+            return self.__discard(self.__identity(emergency))
+
+    def __discard(self, identity: Hashable) -> Emergency | None:
+        # NOTE: Called with the lock held
+        cell = self.__located.pop(identity, None)
+        if cell is None:
+            return None
+
+        heap = self.__cells[cell]
+        emergency = heap.remove(identity)
+        if not heap:
+            del self.__cells[cell]
+        return emergency
+
+    def __cells_in_box(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ) -> Iterator[tuple[int, int]]:
+        # NOTE: Called with the lock held. Yields the non-empty cells only
+        lat_range = range(
+            math.floor(min_lat / self.cell_size), math.floor(max_lat / self.cell_size) + 1
+        )
+        lon_ranges = [
+            range(math.floor(west / self.cell_size), math.floor(east / self.cell_size) + 1)
+            for west, east in (
+                [(min_lon, max_lon)]
+                if min_lon <= max_lon
+                else [(min_lon, 180.0), (-180.0, max_lon)]
+            )
+        ]
+
+        # NOTE: Large boxes hold more cells than are in use
+        box_size = len(lat_range) * sum(len(r) for r in lon_ranges)
+        if box_size > len(self.__cells):
+            for lat_cell, lon_cell in self.__cells:
+                if lat_cell in lat_range and any(lon_cell in r for r in lon_ranges):
+                    yield (lat_cell, lon_cell)
+            return
+
+        for lat_cell in lat_range:
+            for lon_range in lon_ranges:
+                for lon_cell in lon_range:
+                    if (lat_cell, lon_cell) in self.__cells:
+                        yield (lat_cell, lon_cell)
+
+    def __best_within(
+        self, lat: float, lon: float, radius: float
+    ) -> tuple[tuple[int, float], Emergency] | None:
+        # NOTE: Called with the lock held
+        if radius < 0:
+            raise ValueError("'radius' must not be negative")
+
+        tops = [
+            (self.__priority(self.__cells[cell].peek()), cell)
+            for cell in self.__cells_in_box(*bounding_box(lat, lon, radius))
+        ]
+        tops.sort(reverse=True)
+
+        best = None
+        for top, cell in tops:
+            if best is not None and top <= best[0]:
+                break
+
+            for emergency in self.__cells[cell].ordered():
+                priority = self.__priority(emergency)
+                if best is not None and priority <= best[0]:
+                    break
+                if haversine(lat, lon, *emergency.position) <= radius:
+                    best = (priority, emergency)
+                    break
+
+        return best
+
+    def peek_nearest(self, lat: float, lon: float, radius: float) -> Emergency | None:
+        """
+        Returns the emergency with the highest priority within a distance
+        from a point, without removing it.
+
+        Args:
+            lat (float): Latitude of the center, in degrees.
+            lon (float): Longitude of the center, in degrees.
+            radius (float): Maximum distance from the center, in meters.
+
+        Returns:
+            Emergency | None: The emergency, None if there is none within
+            `radius` meters.
+
+        Raises:
+            ValueError: If `radius` is negative.
+        """
+
+        with self.__lock:
+            best = self.__best_within(lat, lon, radius)
+        return best[1] if best is not None else None
+
+    def pop_nearest(self, lat: float, lon: float, radius: float) -> Emergency | None:
+        """
+        Removes and returns the emergency with the highest priority within a
+        distance from a point.
+
+        See `peek_nearest`.
+        """
+
+        with self.__lock:
+            best = self.__best_within(lat, lon, radius)
+            if best is None:
+                return None
+            return self.__discard(self.__identity(best[1]))
+
+    def match_rescuers(
+        self, rescuers: Mapping[str, Rescuer], radius: float
+    ) -> list[tuple[str, Emergency]]:
+        """
+        Assigns queued emergencies to the idle rescuers near them.
+
+        Each rescuer that is not busy and has a known position is offered
+        the emergency with the highest priority within `radius` meters.
+        Offers are settled from the highest priority down: when two rescuers
+        want the same emergency, the first settled gets it and the other is
+        offered its next best one. The assigned emergencies are removed from
+        the queue.
+
+        Args:
+            rescuers (Mapping[str, Rescuer]): The rescuers by UUID, like
+                `cloud.RESCUERS`.
+            radius (float): Maximum distance between a rescuer and the
+                emergency assigned to them, in meters.
+
+        Returns:
+            list[tuple[str, Emergency]]: UUID of the rescuer and emergency
+            of each assignment, from the highest priority down.
+
+        Raises:
+            ValueError: If `radius` is negative.
+        """
+
+        idle = [
+            (uuid, rescuer.position)
+            for uuid, rescuer in list(rescuers.items())
+            if not rescuer.busy and rescuer.position is not None
+        ]
+
+        matches = []
+        with self.__lock:
+            # NOTE: UUIDs are unique, the emergencies next to them are never
+            # compared
+            offers = []
+            for uuid, position in idle:
+                best = self.__best_within(*position, radius)
+                if best is not None:
+                    offers.append((best[0], uuid, position, best[1]))
+            heapq.heapify_max(offers)
+
+            while offers:
+                _, uuid, position, emergency = heapq.heappop_max(offers)
+                identity = self.__identity(emergency)
+                if identity in self.__located:
+                    self.__discard(identity)
+                    matches.append((uuid, emergency))
+                    continue
+
+                # NOTE: Taken by a rescuer settled earlier
+                best = self.__best_within(*position, radius)
+                if best is not None:
+                    heapq.heappush_max(offers, (best[0], uuid, position, best[1]))
+
+        return matches
@@ -0,0 +1,63 @@
+import pytest
+import datetime
+
+from common.models.emergency import Emergency
+from common.models.enc_emergency import EncryptedEmergency
+from tests.utils import bytes_per_instance
+
+
+CREATED_AT = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "cls, fields",
+    [
+        pytest.param(
+            Emergency,
+            dict(
+                emergency_id=1,
+                user_uuid="user-uuid",
+                severity=30,
+                emergency_type="Test type",
+                description="Test description",
+                created_at=CREATED_AT,
+                address="Via Roma",
+                city="Roma",
+                street_number=10,
+                resolved=False,
+                position=(12.34, 56.78),
+                place_description="Near park",
+                photo_b64="aaaa",
+                details_json='{"a": 1}',
+            ),
+            id="Emergency",
+        ),
+        pytest.param(
+            EncryptedEmergency,
+            dict(
+                emergency_id=1,
+                user_uuid="user-uuid",
+                severity=30,
+                routing_info_json='{"a": 1}',
+                blob=b"encrypted_payload",
+                created_at=CREATED_AT,
+            ),
+            id="EncryptedEmergency",
+        ),
+    ],
+)
+def test_slots_shrink_instances(cls, fields, record_property):
+    assert not hasattr(cls(**fields), "__dict__")
+
+    # The same class with a __dict__, as it was before __slots__
+    with_dict_cls = type(f"Dict{cls.__name__}", (), {"__init__": cls.__init__})
+
+    slotted = bytes_per_instance(lambda: cls(**fields))
+    with_dict = bytes_per_instance(lambda: with_dict_cls(**fields))
+
+    # Reported in the JUnit XML, and printed for `pytest -rP`
+    record_property("bytes_with_dict", round(with_dict))
+    record_property("bytes_slotted", round(slotted))
+    print(f"{cls.__name__}: {with_dict:.0f} -> {slotted:.0f} bytes per instance")
+
+    assert slotted < with_dict
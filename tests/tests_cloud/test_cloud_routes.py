@@ -2,6 +2,7 @@ import os
 import tempfile
 import pytest
 import base64
+import datetime
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
@@ -169,6 +170,75 @@ def test_emergency_submit_success(
     mock_emergency_model.unpack.assert_called()
 
 
+def test_emergency_submit_real_emergency(client, mock_crypto, mock_cloud_state):
+    """Submits a packed emergency, unpacked by the real Emergency.unpack."""
+    from common.models.emergency import Emergency
+    from common.services.emergency_queue import EmergencyQueue
+    from common.services.geo_queue import GeoEmergencyQueue
+
+    user_uuid = "user-123"
+    cloud.CLIENTS[user_uuid] = MagicMock()
+    mock_crypto.decrypt.return_value = Emergency(
+        emergency_id=1,
+        user_uuid=user_uuid,
+        position=(45.4642, 9.19),
+        address="Via Roma",
+        city="Milano",
+        street_number=1,
+        place_description="place",
+        photo_b64="",
+        severity=50,
+        resolved=False,
+        emergency_type="fire",
+        description="desc",
+        details_json="{}",
+        created_at=datetime.datetime(2024, 1, 1, 12, 0),
+    ).pack()
+
+    payload = {
+        "emergency_id": 1,
+        "user_uuid": user_uuid,
+        "severity": 50,
+        "blob": base64.b64encode(b"encrypted_data").decode("utf-8"),
+        "routing_info_json": "{}",
+    }
+    try:
+        response = client.post("/emergency/submit/", json=payload)
+
+        assert response.status_code == 200
+        nearest = GeoEmergencyQueue.get_instance().peek_nearest(45.4642, 9.19, 100)
+        assert nearest.position == (45.4642, 9.19)
+    finally:
+        GeoEmergencyQueue.get_instance().clear()
+        for heap in EmergencyQueue.get_instance().queue:
+            heap.clear()
+
+
+def test_emergency_submit_broadcast_skips_geo_queue(
+    client, mock_crypto, mock_cloud_state, mock_emergency_model
+):
+    """A broadcast emergency is not dispatched again by position."""
+    user_uuid = "user-123"
+    cloud.CLIENTS[user_uuid] = MagicMock()
+    cloud.RESCUERS["rescuer-456"] = MagicMock(busy=False)
+
+    payload = {
+        "emergency_id": 1,
+        "user_uuid": user_uuid,
+        "severity": 1,
+        "blob": base64.b64encode(b"encrypted_data").decode("utf-8"),
+        "routing_info_json": "{}",
+    }
+    with patch("cloud.routes.network") as mock_network:
+        mock_network.broadcast_emergency_to_rescuers.return_value = 1
+        response = client.post("/emergency/submit/", json=payload)
+
+    assert response.status_code == 200
+    mock_network.sync_new_emergency.assert_called_once_with(
+        mock_emergency_model.unpack.return_value, locate=False
+    )
+
+
 def test_emergency_update_success(client, mock_persistence):
     payload = {
         "emergency_id": 1,
@@ -235,3 +305,18 @@ def test_emergency_accept_success(
 
     mock_crypto.encrypt.assert_called()
 
+
+
+def test_rescuer_position_dispatches_nearby(client, mock_cloud_state):
+    rescuer_uuid = "rescuer-456"
+    cloud.RESCUERS[rescuer_uuid] = MagicMock(busy=False, position=None)
+
+    with patch("cloud.routes.network") as mock_network:
+        response = client.post(
+            "/rescuer/position/",
+            json={"uuid": rescuer_uuid, "lat": 45.4642, "lon": 9.19},
+        )
+
+    assert response.status_code == 200
+    assert cloud.RESCUERS[rescuer_uuid].position == (45.4642, 9.19)
+    mock_network.schedule_dispatch.assert_called_once()
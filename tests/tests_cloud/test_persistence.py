@@ -0,0 +1,132 @@
+import os
+import tempfile
+import datetime
+import logging
+import sqlite3
+import threading
+import pytest
+from pathlib import Path
+
+# --- SETUP ENVIRONMENT BEFORE IMPORTING CLOUD ---
+temp_dir_obj = tempfile.TemporaryDirectory()
+cert_dir = Path(temp_dir_obj.name) / "certs"
+db_dir = Path(temp_dir_obj.name) / "db"
+os.makedirs(cert_dir, exist_ok=True)
+os.makedirs(db_dir, exist_ok=True)
+
+os.environ.setdefault("CERTIFICATE_DIR", str(cert_dir))
+os.environ.setdefault("SIGNING_KEY_NAME", "signing.key")
+os.environ.setdefault("CERTIFICATE_NAME", "cert.pem")
+os.environ.setdefault("DB_DIR", str(db_dir))
+os.environ.setdefault("DB_NAME", "test.db")
+
+from cloud import persistence
+from common.models.db import DatabaseManager
+from common.models.user import User, BloodType
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path):
+    previous = DatabaseManager._DatabaseManager__instance
+    DatabaseManager._DatabaseManager__instance = None
+    dbm = DatabaseManager.get_instance(tmp_path / "persistence.db")
+    yield dbm
+    persistence.disable_write_behind()
+    dbm.close()
+    DatabaseManager._DatabaseManager__instance = previous
+
+
+def make_user(uuid: str) -> User:
+    return User(
+        uuid=uuid,
+        is_rescuer=False,
+        name="Mario",
+        surname="Rossi",
+        birthday=datetime.date(1990, 1, 1),
+        blood_type=BloodType.OPOS,
+        health_info_json="{}",
+    )
+
+
+def test_synchronous_mode_is_the_default(db):
+    future = persistence.save_user(make_user("user-1"))
+
+    assert future.done()
+    assert db.get_user_by_uuid("user-1") is not None
+    with pytest.raises(sqlite3.IntegrityError):
+        persistence.save_user(make_user("user-1"))
+
+
+def test_write_behind_commits_in_order(db):
+    persistence.enable_write_behind()
+
+    futures = [persistence.save_user(make_user(f"user-{i}")) for i in range(50)]
+    futures.append(persistence.delete_user("user-0"))
+    persistence.flush(timeout=5)
+
+    assert all(f.done() for f in futures)
+    assert len(db.get_users()) == 49
+    assert db.get_user_by_uuid("user-0") is None
+
+
+def test_write_behind_reports_errors_per_mutation(db):
+    persistence.enable_write_behind(max_delay=0.05)
+
+    first = persistence.save_user(make_user("user-1"))
+    duplicate = persistence.save_user(make_user("user-1"))
+    other = persistence.save_user(make_user("user-2"))
+    persistence.flush(timeout=5)
+
+    assert first.exception() is None
+    assert isinstance(duplicate.exception(), sqlite3.IntegrityError)
+    assert other.exception() is None
+    assert {u.uuid for u in db.get_users()} == {"user-1", "user-2"}
+
+
+def test_write_behind_logs_errors(db):
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    # NOTE: On the module logger itself, whatever handlers its parents have
+    persistence.logger.addHandler(handler)
+    try:
+        persistence.enable_write_behind()
+
+        persistence.save_user(make_user("user-1"))
+        persistence.save_user(make_user("user-1"))
+        persistence.flush(timeout=5)
+    finally:
+        persistence.logger.removeHandler(handler)
+
+    assert [r.getMessage() for r in records] == ["Write-behind insert_user failed"]
+    assert records[0].exc_info[0] is sqlite3.IntegrityError
+
+
+def test_write_behind_groups_commits(db):
+    persistence.enable_write_behind(max_batch=100, max_delay=0.05)
+    commits = []
+    transaction = db.transaction
+
+    def counting_transaction():
+        commits.append(threading.current_thread().name)
+        return transaction()
+
+    db.transaction = counting_transaction
+    for i in range(20):
+        persistence.save_user(make_user(f"user-{i}"))
+    persistence.flush(timeout=5)
+
+    assert len(db.get_users()) == 20
+    assert len(commits) < 20
+    assert set(commits) == {"persistence-writer"}
+
+
+def test_disable_write_behind_drains_queue(db):
+    persistence.enable_write_behind()
+    futures = [persistence.save_user(make_user(f"user-{i}")) for i in range(10)]
+
+    persistence.disable_write_behind(timeout=5)
+
+    assert all(f.done() for f in futures)
+    assert len(db.get_users()) == 10
+    assert persistence.save_user(make_user("user-10")).done()
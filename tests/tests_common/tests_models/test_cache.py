@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from common.models import cache as cache_module
+from common.models.cache import LRUCache
+
+
+def test_get_or_load_caches_values():
+    cache = LRUCache(4)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return "value"
+
+    assert cache.get_or_load("a", loader) == "value"
+    assert cache.get_or_load("a", loader) == "value"
+    assert cache.get_or_load("missing", lambda: None) is None
+    assert cache.get_or_load("missing", lambda: None) is None
+
+    stats = cache.stats()
+    assert len(loads) == 1
+    assert (stats.hits, stats.misses, stats.size) == (1, 3, 1)
+    assert stats.hit_rate == 0.25
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("c", lambda: 3)
+
+    assert cache.get_or_load("a", lambda: None) == 1
+    assert cache.get_or_load("b", lambda: None) is None
+    assert cache.stats().evictions == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+    cache = LRUCache(2, ttl=10)
+    cache.get_or_load("a", lambda: 1)
+    now[0] += 11
+
+    assert cache.get_or_load("a", lambda: 2) == 2
+    assert cache.stats().expirations == 1
+
+
+def test_invalidate_during_load_skips_store():
+    cache = LRUCache(2)
+    loading, invalidated = threading.Event(), threading.Event()
+
+    def stale_loader():
+        loading.set()
+        invalidated.wait(5)
+        return "stale"
+
+    thread = threading.Thread(target=cache.get_or_load, args=("a", stale_loader))
+    thread.start()
+    loading.wait(5)
+    cache.invalidate("a")
+    invalidated.set()
+    thread.join(5)
+
+    assert cache.get_or_load("a", lambda: "fresh") == "fresh"
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        LRUCache(0)
@@ -1,7 +1,13 @@
 import pytest
+import base64
+import copy
 import datetime
+import hashlib
+import sqlite3
+import threading
 
-from common.models.db import DatabaseManager
+from common.models import db as db_module
+from common.models.db import DatabaseManager, PageCursor, StorageProfile
 from common.models.user import User, BloodType
 from common.models.emergency import Emergency
 from common.models.enc_emergency import EncryptedEmergency
@@ -211,3 +217,894 @@ def test_delete_encrypted_emergency(db, sample_user, sample_enc_emergency):
         sample_user.uuid,
         sample_enc_emergency.emergency_id,
     )
+
+
+def test_file_db_concurrent_reads(tmp_path, sample_user):
+    dbm = DatabaseManager.get_instance(tmp_path / "rescuecom.db", pool_size=4)
+    dbm.insert_user(sample_user)
+
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(50):
+                assert dbm.get_user_by_uuid(sample_user.uuid).uuid == sample_user.uuid
+                assert len(dbm.get_users()) == 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert dbm.read_pool.size <= 4
+    dbm.close()
+
+
+def test_memory_db_uses_single_connection():
+    dbm = DatabaseManager.get_instance(":memory:", pool_size=4)
+    assert dbm.read_pool is dbm.write_pool
+    assert dbm.write_pool.max_size == 1
+
+
+def test_file_db_applies_storage_profile(tmp_path):
+    profile = StorageProfile(cache_size=-1024, busy_timeout=1234)
+    dbm = DatabaseManager.get_instance(tmp_path / "rescuecom.db", profile=profile)
+
+    with dbm.write_pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+
+    with dbm.read_pool.connection() as conn:
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -1024
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM user")
+
+    dbm.close()
+
+
+def test_reads_not_blocked_by_open_write(tmp_path, sample_user):
+    dbm = DatabaseManager.get_instance(tmp_path / "rescuecom.db")
+    dbm.insert_user(sample_user)
+
+    with dbm.write_pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM user")
+
+        # The uncommitted delete is invisible and does not stall readers
+        assert len(dbm.get_users()) == 1
+
+        conn.rollback()
+
+    dbm.close()
+
+
+def test_insert_users_many(db, sample_user, rescuer_user):
+    result = db.insert_users_many([sample_user, rescuer_user])
+
+    assert result.inserted == [0, 1]
+    assert result.conflicts == []
+    assert len(db.get_users()) == 2
+
+
+def test_insert_users_many_reports_conflicts(db, sample_user, rescuer_user):
+    db.insert_user(sample_user)
+
+    result = db.insert_users_many([sample_user, rescuer_user, rescuer_user])
+
+    assert result.inserted == [1]
+    assert result.conflicts == [0, 2]
+    assert len(db.get_users()) == 2
+
+
+def test_insert_emergencies_many_keeps_ids(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    db.insert_emergency_from_rescuee(sample_emergency)
+
+    other = Emergency(
+        emergency_id=7,
+        user_uuid=sample_user.uuid,
+        severity=40,
+        emergency_type="fire",
+        description="desc",
+        created_at=datetime.datetime.now(),
+    )
+
+    result = db.insert_emergencies_many([sample_emergency, other])
+
+    assert result.inserted == [1]
+    assert result.conflicts == [0]
+    assert result.ids == [7]
+    assert db.get_emergency_by_id(sample_user.uuid, 7) is not None
+
+
+def test_insert_emergencies_many_assign_ids(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    first = db.insert_emergency(sample_emergency)
+
+    result = db.insert_emergencies_many(
+        [sample_emergency, sample_emergency, sample_emergency], assign_ids=True
+    )
+
+    assert result.conflicts == []
+    assert result.ids == [first + 1, first + 2, first + 3]
+    assert len(db.get_emergencies()) == 4
+
+
+def test_insert_encrypted_emergencies_many(db, sample_user, sample_enc_emergency):
+    db.insert_user(sample_user)
+
+    batch = [
+        EncryptedEmergency(
+            emergency_id=i,
+            user_uuid=sample_user.uuid,
+            severity=i,
+            routing_info_json="{}",
+            blob=b"secret",
+            created_at=datetime.datetime.now(),
+        )
+        for i in range(1, 1001)
+    ]
+
+    result = db.insert_encrypted_emergencies_many(batch + [sample_enc_emergency])
+
+    assert len(result.inserted) == 1000
+    assert result.conflicts == [1000]
+    assert len(db.get_encrypted_emergencies()) == 1000
+
+
+def test_insert_many_rolls_back_on_error(db, sample_user):
+    broken = User(
+        uuid="broken",
+        is_rescuer=False,
+        name=None,  # violates NOT NULL
+        surname="Rossi",
+        birthday=datetime.date(1990, 1, 1),
+        blood_type=BloodType.OPOS,
+        health_info_json="{}",
+    )
+
+    with pytest.raises(sqlite3.IntegrityError):
+        db.insert_users_many([sample_user, broken])
+
+    assert db.get_users() == []
+
+
+def test_insert_emergency_ids_are_sequential(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+
+    ids = [db.insert_emergency(sample_emergency) for _ in range(3)]
+
+    assert ids == [1, 2, 3]
+
+
+def test_reserve_emergency_ids(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    db.insert_emergency(sample_emergency)
+
+    reserved = db.reserve_emergency_ids(10)
+
+    assert reserved == range(2, 12)
+    assert db.insert_emergency(sample_emergency) == 12
+
+
+def test_explicit_ids_advance_sequence(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    sample_emergency.emergency_id = 41
+    db.insert_emergency_from_rescuee(sample_emergency)
+
+    assert db.insert_emergency(sample_emergency) == 42
+
+
+def test_sequence_seeded_from_existing_rows(tmp_path, sample_user, sample_emergency):
+    db_file = tmp_path / "rescuecom.db"
+    dbm = DatabaseManager.get_instance(db_file)
+    sample_emergency.emergency_id = 5
+    dbm.insert_emergency_from_rescuee(sample_emergency)
+
+    # Simulate a database created before the sequence table existed
+    with dbm.write_pool.connection() as conn:
+        conn.execute("DROP TABLE id_sequence")
+        conn.commit()
+    dbm.close()
+    DatabaseManager._DatabaseManager__instance = None
+
+    dbm = DatabaseManager.get_instance(db_file)
+    assert dbm.insert_emergency(sample_emergency) == 6
+    dbm.close()
+
+
+def test_concurrent_insert_emergency_unique_ids(tmp_path, sample_user, sample_emergency):
+    dbm = DatabaseManager.get_instance(tmp_path / "rescuecom.db")
+    dbm.insert_user(sample_user)
+
+    ids = []
+    lock = threading.Lock()
+
+    def writer():
+        for _ in range(25):
+            eid = dbm.insert_emergency(sample_emergency)
+            with lock:
+                ids.append(eid)
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(ids) == list(range(1, 101))
+    dbm.close()
+
+
+@pytest.fixture
+def many_emergencies(db, sample_user):
+    db.insert_user(sample_user)
+    base = datetime.datetime(2024, 1, 1, 12, 0, 0, 1)
+
+    emergencies = [
+        Emergency(
+            emergency_id=i,
+            user_uuid=sample_user.uuid,
+            severity=(i * 7) % 5 * 20,  # several rows share a severity
+            resolved=i % 4 == 0,
+            emergency_type="fire",
+            description="desc",
+            created_at=base + datetime.timedelta(minutes=i % 3),
+        )
+        for i in range(1, 38)
+    ]
+    db.insert_emergencies_many(emergencies)
+    return emergencies
+
+
+def test_get_emergencies_page_walks_triage_order(db, many_emergencies):
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = db.get_emergencies_page(cursor, page_size=5)
+        assert len(page) <= 5
+        seen += [(e.resolved, -e.severity, e.created_at, e.emergency_id) for e in page]
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen)
+    assert len(seen) == len(many_emergencies)
+
+
+def test_get_emergencies_page_resolved_filter(db, many_emergencies):
+    page, cursor = db.get_emergencies_page(page_size=100, resolved=True)
+
+    assert cursor is None
+    assert all(e.resolved for e in page)
+    assert len(page) == sum(1 for e in many_emergencies if e.resolved)
+
+
+def test_iter_emergencies_matches_get_emergencies(db, many_emergencies):
+    paged = [(e.emergency_id, e.user_uuid) for e in db.iter_emergencies(page_size=4)]
+    full = [(e.emergency_id, e.user_uuid) for e in db.get_emergencies()]
+
+    assert paged == full
+
+
+def test_iter_encrypted_emergencies(db, sample_user):
+    db.insert_user(sample_user)
+    db.insert_encrypted_emergencies_many(
+        EncryptedEmergency(
+            emergency_id=i,
+            user_uuid=sample_user.uuid,
+            severity=i % 3,
+            routing_info_json="{}",
+            blob=b"secret",
+            created_at=datetime.datetime(2024, 1, 1, 0, 0, 0, 1),
+        )
+        for i in range(1, 12)
+    )
+
+    paged = [e.emergency_id for e in db.iter_encrypted_emergencies(page_size=3)]
+    full = [e.emergency_id for e in db.get_encrypted_emergencies()]
+
+    assert paged == full
+    assert len(paged) == 11
+
+
+def test_page_cursor_roundtrip():
+    cursor = PageCursor(True, 42, "2024-01-01 00:00:00.000001", 7, "user-1")
+
+    assert PageCursor.decode(cursor.encode()) == cursor
+
+    with pytest.raises(ValueError):
+        PageCursor.decode("not a cursor")
+
+
+def test_get_emergencies_page_invalid_size(db):
+    with pytest.raises(ValueError):
+        db.get_emergencies_page(page_size=0)
+
+
+def test_get_emergency_summaries_lazy_fields(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    eid = db.insert_emergency(sample_emergency)
+
+    page, cursor = db.get_emergency_summaries()
+
+    assert cursor is None
+    assert len(page) == 1
+    summary = page[0]
+    assert summary.emergency_id == eid
+    assert summary.has_photo
+    assert summary.photo_b64 == sample_emergency.photo_b64
+
+    # The details were never read: they are fetched now, and found missing
+    db.delete_emergency(sample_user.uuid, eid)
+    assert summary.details_json == ""
+
+
+def test_iter_emergencies_summary(db, many_emergencies):
+    summaries = list(db.iter_emergencies(page_size=6, summary=True))
+
+    assert len(summaries) == len(many_emergencies)
+    assert all(not s.has_photo and s.photo_b64 == "" for s in summaries)
+
+
+PHOTO = bytes(range(256)) * 10
+PHOTO_B64 = base64.b64encode(PHOTO).decode()
+PHOTO_HASH = hashlib.sha256(PHOTO).hexdigest()
+
+
+def test_photo_stored_once_per_content(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    sample_emergency.photo_b64 = PHOTO_B64
+    first = db.insert_emergency(sample_emergency)
+    second = db.insert_emergency(sample_emergency)
+
+    for eid in (first, second):
+        stored = db.get_emergency_by_id(sample_user.uuid, eid)
+        assert stored.photo_b64 == PHOTO_B64
+        assert stored.photo_hash == PHOTO_HASH
+
+    with db.read_pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM photo").fetchone()[0] == 1
+        assert conn.execute(
+            "SELECT COUNT(*) FROM emergency WHERE photo_b64 IS NOT NULL"
+        ).fetchone()[0] == 0
+    assert db.get_photo_size(PHOTO_HASH) == len(PHOTO)
+
+
+def test_non_canonical_photo_kept_as_text(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    eid = db.insert_emergency(sample_emergency)
+
+    stored = db.get_emergency_by_id(sample_user.uuid, eid)
+    assert stored.photo_b64 == sample_emergency.photo_b64
+    assert stored.photo_hash == ""
+
+
+def test_iter_photo_streams_chunks(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    sample_emergency.photo_b64 = PHOTO_B64
+    db.insert_emergency(sample_emergency)
+
+    chunks = list(db.iter_photo(PHOTO_HASH, chunk_size=1000))
+
+    assert [len(c) for c in chunks] == [1000, 1000, 560]
+    assert b"".join(chunks) == PHOTO
+    assert list(db.iter_photo("missing")) == []
+    assert db.get_photo_size("missing") is None
+
+
+def test_unreferenced_photo_is_deleted(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    sample_emergency.photo_b64 = PHOTO_B64
+    first = db.insert_emergency(sample_emergency)
+    second = db.insert_emergency(sample_emergency)
+
+    db.delete_emergency(sample_user.uuid, first)
+    assert db.get_photo_size(PHOTO_HASH) == len(PHOTO)
+
+    sample_emergency.photo_b64 = ""
+    db.update_emergency(sample_user.uuid, second, sample_emergency)
+    assert db.get_photo_size(PHOTO_HASH) is None
+
+
+def legacy_db(monkeypatch, db_file, version, *rows):
+    """
+    Creates a database with only the first `version` migrations applied and
+    inserts raw emergency rows in the schema of that version.
+    """
+
+    with monkeypatch.context() as m:
+        m.setattr(db_module, "MIGRATIONS", db_module.MIGRATIONS[:version])
+        dbm = DatabaseManager.get_instance(db_file)
+        with dbm.write_pool.connection() as conn:
+            for row in rows:
+                columns = ", ".join(row)
+                marks = ", ".join("?" * len(row))
+                conn.execute(
+                    f"INSERT INTO emergency ({columns}) VALUES ({marks})",
+                    tuple(row.values()),
+                )
+            conn.commit()
+        dbm.close()
+
+    DatabaseManager._DatabaseManager__instance = None
+
+
+LEGACY_ROW = dict(
+    emergency_id=1,
+    user_uuid="user-1",
+    severity=3,
+    resolved=0,
+    emergency_type="fire",
+    description="desc",
+    created_at="2024-01-01 00:00:00.000000",
+)
+
+
+def test_migration_moves_text_photos(monkeypatch, tmp_path):
+    db_file = tmp_path / "rescuecom.db"
+    legacy_db(monkeypatch, db_file, 2, dict(LEGACY_ROW, photo_b64=PHOTO_B64))
+
+    dbm = DatabaseManager.get_instance(db_file)
+    stored = dbm.get_emergency_by_id("user-1", 1)
+    assert stored.photo_b64 == PHOTO_B64
+    assert stored.photo_hash == PHOTO_HASH
+    dbm.close()
+
+
+def test_migration_parses_text_positions(monkeypatch, tmp_path):
+    db_file = tmp_path / "rescuecom.db"
+    legacy_db(
+        monkeypatch,
+        db_file,
+        3,
+        dict(LEGACY_ROW, position="45.4642,9.19"),
+        dict(LEGACY_ROW, emergency_id=2, position="garbage"),
+    )
+
+    dbm = DatabaseManager.get_instance(db_file)
+    assert dbm.get_emergency_by_id("user-1", 1).position == (45.4642, 9.19)
+    assert dbm.get_emergency_by_id("user-1", 2).position == (0.0, 0.0)
+    assert [e.emergency_id for e in dbm.get_emergencies_near(45.4642, 9.19, 10)] == [1]
+    dbm.close()
+
+
+def test_migration_pages_through_legacy_timestamps(monkeypatch, tmp_path):
+    db_file = tmp_path / "rescuecom.db"
+    legacy_db(
+        monkeypatch,
+        db_file,
+        7,
+        *(
+            dict(LEGACY_ROW, emergency_id=i, created_at="2024-01-01 12:00:00")
+            for i in (1, 2, 3)
+        ),
+    )
+
+    dbm = DatabaseManager.get_instance(db_file)
+    ids, cursor = [], None
+    while True:
+        page, cursor = dbm.get_emergencies_page(cursor, page_size=1)
+        ids += [e.emergency_id for e in page]
+        if cursor is None:
+            break
+
+    assert ids == [1, 2, 3]
+    assert {c.op for c in dbm.get_changes_since(0)} == {"insert"}
+    dbm.close()
+
+
+@pytest.fixture
+def placed_emergencies(db, sample_user):
+    db.insert_user(sample_user)
+    places = {
+        "duomo": (45.4642, 9.1900),
+        "castello": (45.4705, 9.1795),
+        "bergamo": (45.6983, 9.6773),
+        "fiji-east": (-17.0, 179.9),
+        "fiji-west": (-17.0, -179.9),
+    }
+    ids = {}
+    for name, position in places.items():
+        ids[name] = db.insert_emergency(
+            Emergency(
+                emergency_id=0,
+                user_uuid=sample_user.uuid,
+                severity=5,
+                emergency_type="fire",
+                description=name,
+                position=position,
+                created_at=datetime.datetime.now(),
+            )
+        )
+    return ids
+
+
+def test_get_emergencies_in_bbox(db, placed_emergencies):
+    found = db.get_emergencies_in_bbox(45.4, 9.1, 45.5, 9.2)
+
+    assert {e.description for e in found} == {"duomo", "castello"}
+    assert all(isinstance(c, float) for e in found for c in e.position)
+
+
+def test_get_emergencies_in_bbox_across_antimeridian(db, placed_emergencies):
+    found = db.get_emergencies_in_bbox(-18.0, 179.0, -16.0, -179.0)
+
+    assert {e.description for e in found} == {"fiji-east", "fiji-west"}
+
+
+def test_get_emergencies_in_bbox_follows_updates(db, sample_user, placed_emergencies):
+    moved = db.get_emergency_by_id(sample_user.uuid, placed_emergencies["bergamo"])
+    moved.position = (45.4650, 9.1910)
+    db.update_emergency(sample_user.uuid, moved.emergency_id, moved)
+    db.delete_emergency(sample_user.uuid, placed_emergencies["castello"])
+
+    found = db.get_emergencies_in_bbox(45.4, 9.1, 45.5, 9.2)
+
+    assert {e.description for e in found} == {"duomo", "bergamo"}
+
+
+def test_get_emergencies_near(db, placed_emergencies):
+    # Duomo and Castello are about 1 km apart, Bergamo about 45 km away
+    assert [e.description for e in db.get_emergencies_near(45.4642, 9.19, 1500)] == [
+        "duomo",
+        "castello",
+    ]
+    assert len(db.get_emergencies_near(45.4642, 9.19, 50_000)) == 3
+    assert {e.description for e in db.get_emergencies_near(-17.0, 180.0, 20_000)} == {
+        "fiji-east",
+        "fiji-west",
+    }
+
+    with pytest.raises(ValueError):
+        db.get_emergencies_near(0, 0, -1)
+
+
+def test_typed_rows(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    # Whole seconds used to be stored without microseconds and fail to parse
+    sample_emergency.created_at = datetime.datetime(2024, 5, 1, 12, 30)
+    eid = db.insert_emergency(sample_emergency)
+
+    stored_user = db.get_user_by_uuid(sample_user.uuid)
+    stored = db.get_emergency_by_id(sample_user.uuid, eid)
+
+    assert type(stored_user.birthday) is datetime.date
+    assert stored_user.birthday == sample_user.birthday
+    assert stored_user.blood_type is sample_user.blood_type
+    assert stored.created_at == sample_emergency.created_at
+    with db.read_pool.connection() as conn:
+        raw = conn.execute("SELECT created_at || '' FROM emergency").fetchone()[0]
+    assert raw == "2024-05-01 12:30:00.000000"
+
+
+def test_transaction_groups_writes(db, sample_user, rescuer_user):
+    with db.transaction():
+        db.insert_user(sample_user)
+        with pytest.raises(sqlite3.IntegrityError):
+            db.insert_user(sample_user)
+        db.insert_user(rescuer_user)
+
+    assert {u.uuid for u in db.get_users()} == {sample_user.uuid, rescuer_user.uuid}
+
+
+def test_transaction_rolls_back_on_error(db, sample_user):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.insert_user(sample_user)
+            raise RuntimeError("abort")
+
+    assert db.get_users() == []
+
+
+T0 = datetime.datetime(2024, 1, 1, 12, 0)
+T1 = datetime.datetime(2024, 1, 1, 12, 5)
+
+
+def test_upsert_emergency_last_writer_wins(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    sample_emergency.emergency_id = 7
+
+    assert db.upsert_emergency(sample_emergency, updated_at=T0)
+
+    sample_emergency.severity = 90
+    assert db.upsert_emergency(sample_emergency, updated_at=T1)
+
+    # Older and replayed writes are ignored
+    sample_emergency.severity = 10
+    assert not db.upsert_emergency(sample_emergency, updated_at=T0)
+    assert not db.upsert_emergency(sample_emergency, updated_at=T1)
+
+    assert db.get_emergency_by_id(sample_user.uuid, 7).severity == 90
+    assert db.insert_emergency(sample_emergency) == 8
+
+
+def test_upsert_never_overwrites_later_local_write(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    eid = db.insert_emergency(sample_emergency)
+    sample_emergency.emergency_id = eid
+
+    sample_emergency.resolved = True
+    assert not db.upsert_emergency(sample_emergency, updated_at=T0)
+    assert not db.get_emergency_by_id(sample_user.uuid, eid).resolved
+
+
+def test_upsert_emergencies_many(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    sample_emergency.photo_b64 = PHOTO_B64
+    emergencies = []
+    for eid in range(1, 4):
+        em = copy.copy(sample_emergency)
+        em.emergency_id = eid
+        emergencies.append(em)
+
+    assert db.upsert_emergencies_many(emergencies, updated_at=T1) == 3
+
+    # Only the missing emergency is written, its photo is kept
+    emergencies[0].photo_b64 = base64.b64encode(b"stale").decode()
+    emergencies.append(copy.copy(emergencies[0]))
+    emergencies[-1].emergency_id = 4
+    assert db.upsert_emergencies_many(emergencies[:1], updated_at=T0) == 0
+    assert db.upsert_emergencies_many(emergencies[3:], updated_at=T0) == 1
+
+    with db.read_pool.connection() as conn:
+        hashes = {h for (h,) in conn.execute("SELECT hash FROM photo")}
+    assert hashes == {PHOTO_HASH, hashlib.sha256(b"stale").hexdigest()}
+    assert db.get_emergency_by_id(sample_user.uuid, 1).photo_b64 == PHOTO_B64
+
+
+def test_upsert_encrypted_emergencies(db, sample_user, sample_enc_emergency):
+    db.insert_user(sample_user)
+
+    assert db.upsert_encrypted_emergency(sample_enc_emergency, updated_at=T0)
+    sample_enc_emergency.severity = 99
+    assert db.upsert_encrypted_emergencies_many(
+        [sample_enc_emergency], updated_at=T1
+    ) == 1
+    sample_enc_emergency.severity = 1
+    assert not db.upsert_encrypted_emergency(sample_enc_emergency, updated_at=T0)
+
+    (stored,) = db.get_encrypted_emergencies()
+    assert stored.severity == 99
+
+
+def test_get_changes_since(db, sample_user, sample_emergency, sample_enc_emergency):
+    db.insert_user(sample_user)
+    first = db.insert_emergency(sample_emergency)
+    second = db.insert_emergency(sample_emergency)
+    db.insert_encrypted_emergency(sample_enc_emergency)
+
+    changes = db.get_changes_since(0)
+    assert [(c.table, c.op, c.emergency_id) for c in changes] == [
+        ("emergency", "insert", first),
+        ("emergency", "insert", second),
+        ("encrypted_emergency", "insert", sample_enc_emergency.emergency_id),
+    ]
+    assert changes[0].record.description == sample_emergency.description
+    assert changes[2].record.blob == sample_enc_emergency.blob
+    assert isinstance(changes[0].updated_at, datetime.datetime)
+
+    last_seq = changes[-1].seq
+    sample_emergency.severity = 99
+    db.update_emergency(sample_user.uuid, first, sample_emergency)
+    db.update_emergency(sample_user.uuid, first, sample_emergency)
+    db.delete_emergency(sample_user.uuid, second)
+
+    # Only the last change of each row, with its current state
+    changes = db.get_changes_since(last_seq)
+    assert [(c.op, c.emergency_id) for c in changes] == [
+        ("update", first),
+        ("delete", second),
+    ]
+    assert changes[0].record.severity == 99
+    assert changes[1].record is None
+    assert changes[0].seq > last_seq
+    assert db.get_changes_since(changes[-1].seq) == []
+
+
+def test_get_changes_since_pages(db, many_emergencies):
+    seen = []
+    seq = 0
+    while changes := db.get_changes_since(seq, limit=7):
+        assert all(c.seq > seq for c in changes)
+        seen += changes
+        seq = changes[-1].seq
+
+    assert len(seen) == len(many_emergencies)
+
+    with pytest.raises(ValueError):
+        db.get_changes_since(0, limit=0)
+
+
+def test_run_maintenance_archives_expired(tmp_path, sample_user):
+    dbm = DatabaseManager.get_instance(tmp_path / "rescuecom.db")
+    dbm.insert_user(sample_user)
+    now = datetime.datetime.now()
+
+    def make(resolved, created_at, i):
+        return Emergency(
+            emergency_id=0,
+            user_uuid=sample_user.uuid,
+            severity=5,
+            resolved=resolved,
+            emergency_type="fire",
+            description="desc",
+            photo_b64=base64.b64encode(bytes([i]) * 50_000).decode(),
+            created_at=created_at,
+        )
+
+    resolved_ids = dbm.insert_emergencies_many(
+        [make(True, now, i) for i in range(20)], assign_ids=True
+    ).ids
+    old_id = dbm.insert_emergency(make(False, now - datetime.timedelta(days=60), 100))
+    open_id = dbm.insert_emergency(make(False, now, 101))
+    seq = dbm.get_changes_since()[-1].seq
+
+    policy = db_module.RetentionPolicy(resolved_after=datetime.timedelta(0), batch_size=7)
+    report = dbm.run_maintenance(policy)
+
+    assert report.archived_emergencies == 21
+    assert report.archived_encrypted_emergencies == 0
+    assert report.reclaimed_bytes > 15 * 50_000
+    assert [e.emergency_id for e in dbm.get_emergencies()] == [open_id]
+    assert {c.emergency_id for c in dbm.get_changes_since(seq)} == {*resolved_ids, old_id}
+
+    with dbm.write_pool.connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+        assert conn.execute("SELECT COUNT(*) FROM main.photo").fetchone()[0] == 1
+
+    dbm.close()
+
+    archive = sqlite3.connect(tmp_path / "rescuecom.archive.db")
+    archived_ids = [r[0] for r in archive.execute("SELECT emergency_id FROM emergency")]
+    assert sorted(archived_ids) == sorted([*resolved_ids, old_id])
+    assert archive.execute("SELECT COUNT(*) FROM photo").fetchone()[0] == 21
+    archive.close()
+
+
+def test_run_maintenance_converts_auto_vacuum(tmp_path, sample_user):
+    db_file = tmp_path / "rescuecom.db"
+    dbm = DatabaseManager.get_instance(db_file, profile=StorageProfile(auto_vacuum="NONE"))
+    dbm.insert_user(sample_user)
+    ids = [
+        dbm.insert_emergency(
+            Emergency(
+                emergency_id=0,
+                user_uuid=sample_user.uuid,
+                severity=5,
+                emergency_type="fire",
+                description=str(i),
+                position=(10.0 * i, 9.0),
+                created_at=datetime.datetime.now(),
+            )
+        )
+        for i in range(5)
+    ]
+    # Leaves a hole in the rowids for VACUUM to close
+    dbm.delete_emergency(sample_user.uuid, ids[0])
+    dbm.close()
+
+    DatabaseManager._DatabaseManager__instance = None
+    dbm = DatabaseManager.get_instance(db_file)
+    dbm.run_maintenance(db_module.RetentionPolicy(max_age=None))
+
+    with dbm.write_pool.connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    found = dbm.get_emergencies_in_bbox(25.0, 8.0, 35.0, 10.0)
+    assert [e.description for e in found] == ["3"]
+    dbm.close()
+
+
+def test_start_maintenance_runs_on_schedule(db):
+    reports = []
+    ran = threading.Event()
+
+    def on_report(report):
+        reports.append(report)
+        ran.set()
+
+    db.start_maintenance(interval=0.01, on_report=on_report)
+    with pytest.raises(RuntimeError):
+        db.start_maintenance()
+
+    assert ran.wait(5)
+    db.stop_maintenance()
+    assert isinstance(reports[0], db_module.MaintenanceReport)
+
+
+def test_statement_stats(db, sample_user):
+    db.insert_user(sample_user)
+    for _ in range(3):
+        db.user_cache.clear()
+        db.get_user_by_uuid(sample_user.uuid)
+
+    stats = {s.name: s for s in db.statements.stats()}
+    assert (stats["get_user_by_uuid"].executions, stats["get_user_by_uuid"].rows) == (3, 3)
+    assert stats["insert_user"].rows == 1
+
+
+def test_statement_tracking_disabled(tmp_path, sample_user):
+    profile = StorageProfile(track_statements=False, cached_statements=16)
+    dbm = DatabaseManager.get_instance(tmp_path / "rescuecom.db", profile=profile)
+    dbm.insert_user(sample_user)
+
+    assert dbm.get_user_by_uuid(sample_user.uuid).uuid == sample_user.uuid
+    assert dbm.statements.stats() == []
+    dbm.close()
+
+
+def test_get_storage_defaults_to_database_manager(db):
+    from common.models import storage
+
+    assert isinstance(db, storage.Storage)
+    assert storage.get_storage() is db
+
+
+def test_point_lookups_are_cached(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    eid = db.insert_emergency(sample_emergency)
+
+    first = db.get_emergency_by_id(sample_user.uuid, eid)
+    first.severity = 9
+    assert db.get_emergency_by_id(sample_user.uuid, eid).severity == sample_emergency.severity
+    db.get_user_by_uuid(sample_user.uuid)
+    db.get_user_by_uuid(sample_user.uuid)
+
+    assert (db.emergency_cache.stats().hits, db.emergency_cache.stats().misses) == (1, 1)
+    assert (db.user_cache.stats().hits, db.user_cache.stats().misses) == (1, 1)
+
+
+def test_writes_invalidate_cache(db, sample_user, sample_emergency):
+    db.insert_user(sample_user)
+    eid = db.insert_emergency(sample_emergency)
+    db.get_user_by_uuid(sample_user.uuid)
+    db.get_emergency_by_id(sample_user.uuid, eid)
+
+    sample_user.name = "Luigi"
+    db.update_user(sample_user.uuid, sample_user)
+    sample_emergency.severity = 7
+    db.update_emergency(sample_user.uuid, eid, sample_emergency)
+    assert db.get_user_by_uuid(sample_user.uuid).name == "Luigi"
+    assert db.get_emergency_by_id(sample_user.uuid, eid).severity == 7
+
+    sample_emergency.emergency_id = eid
+    sample_emergency.severity = 8
+    db.upsert_emergency(sample_emergency)
+    assert db.get_emergency_by_id(sample_user.uuid, eid).severity == 8
+
+    with db.transaction():
+        db.delete_emergency(sample_user.uuid, eid)
+        db.delete_user(sample_user.uuid)
+    assert db.get_emergency_by_id(sample_user.uuid, eid) is None
+    assert db.get_user_by_uuid(sample_user.uuid) is None
+
+
+def test_queue_entries_skip_resolved_and_deleted(db, sample_user, sample_emergency, sample_enc_emergency):
+    db.insert_user(sample_user)
+    ems = []
+    for _ in range(3):
+        sample_emergency.emergency_id = db.insert_emergency(sample_emergency)
+        ems.append(db.get_emergency_by_id(sample_user.uuid, sample_emergency.emergency_id))
+    db.insert_encrypted_emergency(sample_enc_emergency)
+
+    db.save_queue_entries([(0, ems[0]), (1, ems[1]), (2, ems[2]), (2, sample_enc_emergency)])
+    db.save_queue_entries([(0, ems[0])])
+
+    ems[1].resolved = True
+    db.update_emergency(sample_user.uuid, ems[1].emergency_id, ems[1])
+    db.delete_emergency(sample_user.uuid, ems[2].emergency_id)
+
+    entries = sorted(db.get_queue_entries())
+    assert [entry[:4] for entry in entries] == [
+        (0, "emergency", sample_user.uuid, ems[0].emergency_id),
+        (2, "encrypted_emergency", sample_enc_emergency.user_uuid, sample_enc_emergency.emergency_id),
+    ]
+    assert entries[0][4:] == (ems[0].severity, ems[0].created_at)
+
+    db.delete_queue_entries([(0, sample_user.uuid, ems[0].emergency_id)])
+    assert len(db.get_queue_entries()) == 1
@@ -1,7 +1,8 @@
 import pytest
+import copy
 import datetime
 
-from common.models.emergency import Emergency
+from common.models.emergency import Emergency, LazyEmergency
 from tests.utils import not_raises
 
 
@@ -94,6 +95,7 @@ def test_pack_unpack_roundtrip(emergency_factory):
 
     assert unpacked.emergency_id == em.emergency_id
     assert unpacked.user_uuid == em.user_uuid
+    assert unpacked.position == (12.34, 56.78)
     assert unpacked.address == em.address
     assert unpacked.city == em.city
     assert unpacked.street_number == em.street_number
@@ -190,7 +192,7 @@ def test_position_partitions(base_kwargs, position):
         data=packed,
     )
 
-    assert unpacked.position == tuple(map(str, position))
+    assert unpacked.position == position
 
 
 @pytest.mark.parametrize("severity", [0, 1, 5, 2**31 - 1])
@@ -299,3 +301,80 @@ def test_created_at_partitions(created_at):
     )
 
     assert unpacked.created_at == created_at
+
+
+# ---- LazyEmergency ----
+
+
+@pytest.fixture
+def lazy_factory(base_kwargs):
+    def _factory(has_photo=True, has_details=True):
+        calls = []
+
+        def loader(field):
+            calls.append(field)
+            return {"photo_b64": "aaaa", "details_json": '{"a": 1}'}[field]
+
+        em = LazyEmergency(
+            loader=loader,
+            has_photo=has_photo,
+            has_details=has_details,
+            severity=30,
+            **base_kwargs,
+        )
+        return em, calls
+
+    return _factory
+
+
+def test_lazy_fields_loaded_on_first_access(lazy_factory):
+    em, calls = lazy_factory()
+
+    assert em.has_photo
+    assert calls == []
+
+    assert em.photo_b64 == "aaaa"
+    assert em.photo_b64 == "aaaa"
+    assert calls == ["photo_b64"]
+
+    assert em.details_json == '{"a": 1}'
+    assert calls == ["photo_b64", "details_json"]
+
+
+def test_lazy_empty_fields_never_loaded(lazy_factory):
+    em, calls = lazy_factory(has_photo=False, has_details=False)
+
+    assert not em.has_photo
+    assert em.photo_b64 == ""
+    assert em.details_json == ""
+    assert calls == []
+
+
+def test_lazy_assignment_skips_loader(lazy_factory):
+    em, calls = lazy_factory()
+
+    em.photo_b64 = "bbbb"
+
+    assert em.photo_b64 == "bbbb"
+    assert calls == []
+
+
+def test_lazy_to_db_tuple_loads_fields(lazy_factory):
+    em, _ = lazy_factory()
+
+    db_tuple = em.to_db_tuple()
+
+    assert db_tuple[7] == "aaaa"
+    assert db_tuple[12] == '{"a": 1}'
+
+
+def test_lazy_copy_keeps_fields_unloaded(lazy_factory):
+    em, calls = lazy_factory()
+
+    clone = copy.copy(em)
+
+    assert calls == []
+    assert not hasattr(clone, "__dict__")
+    assert (clone.emergency_id, clone.severity) == (em.emergency_id, em.severity)
+    assert clone.photo_b64 == "aaaa"
+    assert calls == ["photo_b64"]
@@ -34,3 +34,4 @@ def test_to_db_tuple_content(encrypted_emergency_factory):
     assert db_tuple[3] == '{"a": 1}'  # routing_info_json
     assert db_tuple[4] == b"encrypted_payload"  # blob
     assert db_tuple[5] == datetime.datetime(2024, 1, 1, 12, 0, 0)  # created_at
+
@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+
+import pytest
+
+from common.models.pool import ConnectionPool, PoolTimeoutError
+
+
+@pytest.fixture
+def pool(tmp_path):
+    db_file = tmp_path / "pool.db"
+    p = ConnectionPool(
+        lambda: sqlite3.connect(db_file, check_same_thread=False), 2, timeout=0.1
+    )
+    yield p
+    p.close()
+
+
+def test_invalid_size_raises():
+    with pytest.raises(ValueError):
+        ConnectionPool(lambda: sqlite3.connect(":memory:"), 0)
+
+
+def test_connections_created_lazily(pool):
+    assert pool.size == 0
+
+    with pool.connection():
+        assert pool.size == 1
+
+    # Released connection is reused
+    with pool.connection():
+        assert pool.size == 1
+
+
+def test_concurrent_borrowers_get_distinct_connections(pool):
+    with pool.connection() as c1, pool.connection() as c2:
+        assert c1 is not c2
+        assert pool.size == 2
+
+
+def test_exhausted_pool_times_out(pool):
+    with pool.connection(), pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+
+
+def test_waiting_borrower_gets_released_connection(pool):
+    pool.timeout = 5
+    acquired = []
+
+    def worker():
+        with pool.connection() as conn:
+            acquired.append(conn)
+
+    with pool.connection() as c1, pool.connection() as c2:
+        t = threading.Thread(target=worker)
+        t.start()
+
+    t.join()
+    assert pool.size == 2
+    assert acquired[0] in (c1, c2)
+
+
+def test_release_rolls_back_open_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO t VALUES (1)")
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_closed_pool_raises(pool):
+    pool.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.connection():
+            pass
@@ -0,0 +1,348 @@
+import base64
+import datetime
+import glob
+import os
+import shutil
+import subprocess
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+pytest.importorskip("psycopg_pool")
+
+from common.models import storage
+from common.models.emergency import Emergency
+from common.models.enc_emergency import EncryptedEmergency
+from common.models.postgres import PostgresStorage
+from common.models.user import BloodType, User
+
+
+def find_server_binary(name):
+    path = shutil.which(name)
+    if path is not None:
+        return path
+
+    # Debian and Ubuntu packages keep the server binaries out of PATH
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    return candidates[-1] if candidates else None
+
+
+@pytest.fixture(scope="module")
+def postgres_dsn(tmp_path_factory):
+    """
+    Connection string of a throwaway PostgreSQL server.
+
+    Uses POSTGRES_TEST_DSN if set, otherwise starts a server of its own on a
+    Unix socket, with the binaries found on the machine. CI sets it to the
+    postgres service container of .github/workflows/tests.yml, so these tests
+    only skip on machines with neither.
+    """
+
+    dsn = os.getenv("POSTGRES_TEST_DSN")
+    if dsn:
+        yield dsn
+        return
+
+    initdb, pg_ctl = find_server_binary("initdb"), find_server_binary("pg_ctl")
+    if initdb is None or pg_ctl is None:
+        pytest.skip("PostgreSQL server binaries not found")
+    if os.geteuid() == 0:
+        pytest.skip("initdb cannot run as root, set POSTGRES_TEST_DSN")
+
+    data_dir = tmp_path_factory.mktemp("pgdata")
+    socket_dir = tmp_path_factory.mktemp("pgsocket")
+    subprocess.run(
+        [initdb, "-D", data_dir, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+        check=True,
+        capture_output=True,
+    )
+    subprocess.run(
+        [
+            pg_ctl, "-D", data_dir, "-l", data_dir / "server.log", "-w",
+            "-o", f"-k {socket_dir} -c listen_addresses=''", "start",
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    yield f"host={socket_dir} dbname=postgres user=postgres"
+
+    subprocess.run([pg_ctl, "-D", data_dir, "-m", "immediate", "stop"], capture_output=True)
+
+
+@pytest.fixture
+def pg(postgres_dsn):
+    with psycopg.connect(postgres_dsn, autocommit=True) as conn:
+        conn.execute("DROP SCHEMA public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+
+    PostgresStorage._PostgresStorage__instance = None
+    pg = PostgresStorage.get_instance(postgres_dsn, pool_size=4)
+    yield pg
+    pg.close()
+    PostgresStorage._PostgresStorage__instance = None
+    storage.use_storage(None)
+
+
+def make_user(uuid, is_rescuer=False):
+    return User(uuid, is_rescuer, "Mario", "Rossi", datetime.date(1990, 1, 1), BloodType.ONEG, "{}")
+
+
+def make_emergency(emergency_id, user_uuid="user-1", severity=3, resolved=False):
+    return Emergency(
+        emergency_id=emergency_id,
+        user_uuid=user_uuid,
+        position=(45.5, 9.25),
+        address="Via Roma",
+        city="Milano",
+        street_number=1,
+        place_description="place",
+        photo_b64="aaaa",
+        severity=severity,
+        resolved=resolved,
+        emergency_type="fire",
+        description="desc",
+        details_json="{}",
+        created_at=datetime.datetime(2024, 1, 1, 12, 0, severity),
+    )
+
+
+def make_enc_emergency(emergency_id, user_uuid="user-1", severity=3):
+    return EncryptedEmergency(
+        emergency_id=emergency_id,
+        user_uuid=user_uuid,
+        severity=severity,
+        routing_info_json="{}",
+        blob=b"\x00\x01secret",
+        created_at=datetime.datetime(2024, 1, 1, 12, 0, severity),
+    )
+
+
+def test_users_roundtrip(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_user(make_user("rescuer-1", is_rescuer=True))
+
+    stored = pg.get_user_by_uuid("user-1")
+    assert (stored.name, stored.birthday, stored.blood_type) == ("Mario", datetime.date(1990, 1, 1), BloodType.ONEG)
+    assert [u.uuid for u in pg.get_rescuers()] == ["rescuer-1"]
+    assert [u.uuid for u in pg.get_rescuees()] == ["user-1"]
+
+    updated = make_user("user-1")
+    updated.name = "Luigi"
+    pg.update_user("user-1", updated)
+    assert pg.get_user_by_uuid("user-1").name == "Luigi"
+
+    pg.delete_user("user-1")
+    assert pg.get_user_by_uuid("user-1") is None
+
+
+def test_insert_users_many_reports_conflicts(pg):
+    pg.insert_user(make_user("user-1"))
+
+    result = pg.insert_users_many(
+        [make_user("user-1"), make_user("user-2"), make_user("user-2"), make_user("user-3")]
+    )
+
+    assert (result.inserted, result.conflicts) == ([1, 3], [0, 2])
+    assert sorted(u.uuid for u in pg.get_users()) == ["user-1", "user-2", "user-3"]
+
+
+def test_emergency_ids_follow_explicit_ids(pg):
+    pg.insert_user(make_user("user-1"))
+
+    assert pg.insert_emergency(make_emergency(0)) == 1
+    pg.insert_emergency_from_rescuee(make_emergency(10))
+    assert pg.insert_emergency(make_emergency(0)) == 11
+
+    stored = pg.get_emergency_by_id("user-1", 10)
+    assert stored.position == (45.5, 9.25)
+    assert stored.resolved is False
+    assert stored.created_at == datetime.datetime(2024, 1, 1, 12, 0, 3)
+
+
+def test_insert_emergencies_many(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_emergency_from_rescuee(make_emergency(2))
+
+    result = pg.insert_emergencies_many([make_emergency(1), make_emergency(2), make_emergency(5)])
+    assert (result.inserted, result.conflicts, result.ids) == ([0, 2], [1], [1, 5])
+
+    assigned = pg.insert_emergencies_many([make_emergency(1), make_emergency(1)], assign_ids=True)
+    assert assigned.ids == [6, 7]
+    assert len(pg.get_emergencies_by_user_uuid("user-1")) == 5
+
+
+def test_get_emergencies_triage_order(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_emergencies_many(
+        [
+            make_emergency(1, severity=1),
+            make_emergency(2, severity=5, resolved=True),
+            make_emergency(3, severity=4),
+        ]
+    )
+
+    assert [e.emergency_id for e in pg.get_emergencies()] == [3, 1, 2]
+
+    updated = make_emergency(1, severity=9)
+    pg.update_emergency("user-1", 1, updated)
+    assert [e.emergency_id for e in pg.get_emergencies()] == [1, 3, 2]
+
+    pg.delete_emergency("user-1", 3)
+    assert [e.emergency_id for e in pg.get_emergencies()] == [1, 2]
+
+
+def test_encrypted_emergencies(pg):
+    pg.insert_encrypted_emergency(make_enc_emergency(1, severity=1))
+    result = pg.insert_encrypted_emergencies_many(
+        [make_enc_emergency(1), make_enc_emergency(2, severity=7)]
+    )
+    assert (result.inserted, result.conflicts, result.ids) == ([1], [0], [2])
+
+    stored = pg.get_encrypted_emergencies()
+    assert [e.emergency_id for e in stored] == [2, 1]
+    assert stored[0].blob == b"\x00\x01secret"
+
+    pg.update_encrypted_emergency("user-1", 1, make_enc_emergency(1, severity=9))
+    assert pg.get_encrypted_emergencies()[0].emergency_id == 1
+
+    pg.delete_encrypted_emergency("user-1", 1)
+    assert [e.emergency_id for e in pg.get_encrypted_emergencies()] == [2]
+
+
+def test_transaction_groups_writes(pg):
+    with pg.transaction():
+        pg.insert_user(make_user("user-1"))
+        pg.insert_users_many([make_user("user-2")])
+        with pytest.raises(psycopg.errors.UniqueViolation):
+            pg.insert_user(make_user("user-1"))
+        pg.insert_users_many([make_user("user-3")])
+
+    assert sorted(u.uuid for u in pg.get_users()) == ["user-1", "user-2", "user-3"]
+
+    with pytest.raises(RuntimeError):
+        with pg.transaction():
+            pg.insert_user(make_user("user-4"))
+            raise RuntimeError
+
+    assert pg.get_user_by_uuid("user-4") is None
+
+
+def test_use_storage(pg):
+    storage.use_storage(pg)
+    assert storage.get_storage() is pg
+
+
+def test_upsert_last_writer_wins(pg):
+    pg.insert_user(make_user("user-1"))
+    t0 = datetime.datetime(2024, 1, 1)
+    t1 = datetime.datetime(2024, 1, 2)
+
+    assert pg.upsert_emergency(make_emergency(5, severity=1), updated_at=t1)
+    assert not pg.upsert_emergency(make_emergency(5, severity=9), updated_at=t0)
+    assert pg.upsert_emergencies_many(
+        [make_emergency(5, severity=7), make_emergency(6)], updated_at=t1 + datetime.timedelta(1)
+    ) == 2
+    assert pg.get_emergency_by_id("user-1", 5).severity == 7
+    assert pg.insert_emergency(make_emergency(0)) == 7
+
+    assert pg.upsert_encrypted_emergency(make_enc_emergency(1, severity=1), updated_at=t1)
+    assert not pg.upsert_encrypted_emergencies_many([make_enc_emergency(1, severity=9)], updated_at=t0)
+    assert pg.get_encrypted_emergencies()[0].severity == 1
+
+
+def test_emergencies_page_walks_triage_order(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_emergencies_many(
+        [
+            make_emergency(1, severity=1),
+            make_emergency(2, severity=5, resolved=True),
+            make_emergency(3, severity=4),
+            make_emergency(4, severity=4),
+        ]
+    )
+
+    ids, cursor = [], None
+    while True:
+        page, cursor = pg.get_emergencies_page(cursor, page_size=1)
+        ids += [e.emergency_id for e in page]
+        if cursor is None:
+            break
+
+    assert ids == [3, 4, 1, 2]
+    assert [e.emergency_id for e in pg.iter_emergencies(page_size=2, resolved=False)] == [3, 4, 1]
+
+    summaries, _ = pg.get_emergency_summaries(page_size=1)
+    assert summaries[0].has_photo
+    assert summaries[0].photo_b64 == "aaaa"
+
+    pg.insert_encrypted_emergencies_many(
+        [make_enc_emergency(1, severity=1), make_enc_emergency(2, severity=7)]
+    )
+    assert [e.emergency_id for e in pg.iter_encrypted_emergencies(page_size=1)] == [2, 1]
+
+
+def test_get_changes_since(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_emergency_from_rescuee(make_emergency(1))
+    pg.insert_encrypted_emergency(make_enc_emergency(2))
+    pg.update_emergency("user-1", 1, make_emergency(1, severity=9))
+
+    changes = pg.get_changes_since(0)
+    assert [(c.table, c.op, c.emergency_id) for c in changes] == [
+        ("encrypted_emergency", "insert", 2),
+        ("emergency", "update", 1),
+    ]
+    assert changes[1].record.severity == 9
+    assert changes[1].updated_at is not None
+
+    pg.delete_emergency("user-1", 1)
+    deleted = pg.get_changes_since(changes[-1].seq)
+    assert [(c.op, c.record) for c in deleted] == [("delete", None)]
+
+
+def test_spatial_queries(pg):
+    pg.insert_user(make_user("user-1"))
+    positions = {1: (45.5, 9.25), 2: (45.51, 9.25), 3: (41.9, 12.5), 4: (45.5, 179.9)}
+    emergencies = []
+    for emergency_id, position in positions.items():
+        em = make_emergency(emergency_id, severity=emergency_id)
+        em.position = position
+        emergencies.append(em)
+    pg.insert_emergencies_many(emergencies)
+
+    assert [e.emergency_id for e in pg.get_emergencies_in_bbox(45, 9, 46, 10)] == [2, 1]
+    assert [e.emergency_id for e in pg.get_emergencies_in_bbox(45, 179, 46, -179)] == [4]
+    assert [e.emergency_id for e in pg.get_emergencies_near(45.5, 9.25, 2000)] == [1, 2]
+    assert pg.get_emergencies_near(45.5, 9.25, 500, resolved=True) == []
+
+
+def test_photos_by_hash(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_emergency_from_rescuee(make_emergency(1))
+
+    photo_hash = pg.get_emergency_by_id("user-1", 1).photo_hash
+    assert photo_hash
+    assert pg.get_photo_size(photo_hash) == 3
+    assert b"".join(pg.iter_photo(photo_hash, chunk_size=2)) == base64.b64decode("aaaa")
+    assert pg.get_photo_size("missing") is None
+    assert list(pg.iter_photo("missing")) == []
+
+
+def test_queue_journal(pg):
+    pg.insert_user(make_user("user-1"))
+    pg.insert_emergency_from_rescuee(make_emergency(1))
+    pg.insert_emergency_from_rescuee(make_emergency(2, resolved=True))
+    pg.insert_encrypted_emergency(make_enc_emergency(3))
+
+    pg.save_queue_entries(
+        [(0, make_emergency(1)), (0, make_emergency(2)), (1, make_enc_emergency(3))]
+    )
+    assert sorted(e[:4] for e in pg.get_queue_entries()) == [
+        (0, "emergency", "user-1", 1),
+        (1, "encrypted_emergency", "user-1", 3),
+    ]
+    assert pg.get_encrypted_emergency_by_id("user-1", 3).blob == b"\x00\x01secret"
+
+    pg.delete_queue_entries([(0, "user-1", 1)])
+    assert [e[3] for e in pg.get_queue_entries()] == [3]
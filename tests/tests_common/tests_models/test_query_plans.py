@@ -0,0 +1,151 @@
+import base64
+import datetime
+import hashlib
+import re
+
+import pytest
+
+from common.models.db import DatabaseManager, MIGRATIONS, PageCursor
+from common.models.user import User, BloodType
+from common.models.emergency import Emergency
+from common.models.enc_emergency import EncryptedEmergency
+
+# Plans that read a whole table without an index, or sort rows in memory
+FULL_SCAN = re.compile(r"^SCAN \w+$")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR ORDER BY")
+
+# Methods that return every row of a table by design
+FULL_SCAN_ALLOWED = {"get_users", "get_queue_entries"}
+
+# Cursor in the middle of the table, to exercise every keyset query
+CURSOR = PageCursor(False, 50, "2024-01-01 00:00:00.000000", 1, "user-1")
+
+# Hash of the photo of the fixture emergency
+PHOTO_HASH = hashlib.sha256(base64.b64decode("aaaa")).hexdigest()
+
+# Every get_* method of DatabaseManager with the arguments it is checked with
+QUERIES = {
+    "get_users": lambda db: db.get_users(),
+    "get_user_by_uuid": lambda db: db.get_user_by_uuid("user-1"),
+    "get_rescuers": lambda db: db.get_rescuers(),
+    "get_rescuees": lambda db: db.get_rescuees(),
+    "get_emergencies": lambda db: db.get_emergencies(),
+    "get_emergency_by_id": lambda db: db.get_emergency_by_id("user-1", 1),
+    "get_emergencies_by_user_uuid": lambda db: db.get_emergencies_by_user_uuid(
+        "user-1"
+    ),
+    "get_encrypted_emergencies": lambda db: db.get_encrypted_emergencies(),
+    "get_encrypted_emergency_by_id": lambda db: db.get_encrypted_emergency_by_id(
+        "user-1", 1
+    ),
+    "get_emergencies_page": lambda db: (
+        db.get_emergencies_page(page_size=10),
+        db.get_emergencies_page(CURSOR, page_size=10),
+    ),
+    "get_emergency_summaries": lambda db: [
+        (e.photo_b64, e.details_json)
+        for e in db.get_emergency_summaries(page_size=10)[0]
+        + db.get_emergency_summaries(CURSOR, page_size=10)[0]
+    ],
+    "get_encrypted_emergencies_page": lambda db: (
+        db.get_encrypted_emergencies_page(page_size=10),
+        db.get_encrypted_emergencies_page(CURSOR, page_size=10),
+    ),
+    "get_photo_size": lambda db: db.get_photo_size(PHOTO_HASH),
+    "get_emergencies_in_bbox": lambda db: db.get_emergencies_in_bbox(
+        45.0, 9.0, 46.0, 10.0
+    ),
+    "get_emergencies_near": lambda db: db.get_emergencies_near(45.46, 9.19, 1000),
+    "get_changes_since": lambda db: db.get_changes_since(0, limit=10),
+    "get_queue_entries": lambda db: db.get_queue_entries(),
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    DatabaseManager._DatabaseManager__instance = None
+    yield
+    DatabaseManager._DatabaseManager__instance = None
+
+
+@pytest.fixture
+def db():
+    dbm = DatabaseManager.get_instance(":memory:")
+    dbm.insert_user(
+        User(
+            uuid="user-1",
+            is_rescuer=False,
+            name="Mario",
+            surname="Rossi",
+            birthday=datetime.date(1990, 1, 1),
+            blood_type=BloodType.OPOS,
+            health_info_json="{}",
+        )
+    )
+    dbm.insert_emergency_from_rescuee(
+        Emergency(
+            emergency_id=1,
+            user_uuid="user-1",
+            severity=50,
+            emergency_type="fire",
+            description="desc",
+            photo_b64="aaaa",
+            details_json="{}",
+            created_at=datetime.datetime.now(),
+        )
+    )
+    dbm.insert_encrypted_emergency(
+        EncryptedEmergency(
+            emergency_id=1,
+            user_uuid="user-1",
+            severity=50,
+            routing_info_json="{}",
+            blob=b"secret",
+            created_at=datetime.datetime.now(),
+        )
+    )
+    return dbm
+
+
+def traced_selects(db: DatabaseManager, call) -> list[str]:
+    """Runs `call` and returns the SELECT statements it sent to SQLite"""
+    statements = []
+    with db.read_pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        with db.read_pool.connection() as conn:
+            conn.set_trace_callback(None)
+
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def query_plan(db: DatabaseManager, sql: str) -> list[str]:
+    with db.read_pool.connection() as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def test_every_getter_is_checked():
+    getters = {name for name in dir(DatabaseManager) if name.startswith("get_")}
+    getters.discard("get_instance")
+
+    assert getters == set(QUERIES)
+
+
+def test_migrations_recorded_in_user_version(db):
+    with db.write_pool.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+
+
+@pytest.mark.parametrize("name", sorted(QUERIES))
+def test_getter_uses_index(db, name):
+    statements = traced_selects(db, QUERIES[name])
+    assert statements, f"{name} did not run any SELECT"
+
+    for sql in statements:
+        plan = query_plan(db, sql)
+
+        assert not any(TEMP_SORT.search(step) for step in plan), (name, plan)
+        if name not in FULL_SCAN_ALLOWED:
+            assert not any(FULL_SCAN.match(step) for step in plan), (name, plan)
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from common.models.statements import (
+    StatementConnection,
+    StatementRegistry,
+    normalize,
+)
+
+
+@pytest.fixture
+def conn():
+    c = sqlite3.connect(":memory:", factory=StatementConnection)
+    c.statements = StatementRegistry()
+    c.execute("CREATE TABLE t (a INTEGER)")
+    yield c
+    c.close()
+
+
+def test_normalize_collapses_layout():
+    assert normalize("SELECT a\n    FROM t\n\tWHERE a = ?  ") == "SELECT a FROM t WHERE a = ?"
+    assert normalize("SELECT a -- the key\nFROM t") == "SELECT a FROM t"
+
+
+def test_register_names_once(conn):
+    registry = conn.statements
+    sql = registry.register("first", "SELECT a\n FROM t")
+
+    assert sql == "SELECT a FROM t"
+    assert registry.register("second", "SELECT a FROM t") == sql
+
+    conn.execute("SELECT   a FROM t").fetchall()
+    (stats,) = [s for s in registry.stats() if s.sql == sql]
+    assert stats.name == "first"
+
+
+def test_counts_executions_and_rows(conn):
+    registry = conn.statements
+    insert = registry.register("insert", "INSERT INTO t VALUES (?)")
+    select = registry.register("select", "SELECT a FROM t")
+
+    conn.executemany(insert, [(i,) for i in range(5)])
+    conn.execute(insert, (5,))
+    conn.execute(select).fetchall()
+    assert len(list(conn.execute(select))) == 6
+    conn.execute(select).fetchone()
+
+    stats = {s.name: s for s in registry.stats()}
+    assert (stats["insert"].executions, stats["insert"].rows) == (2, 6)
+    assert (stats["select"].executions, stats["select"].rows) == (3, 13)
+    assert stats["select"].total_time > 0
+
+    registry.reset()
+    assert [s for s in registry.stats() if s.name is not None] == []
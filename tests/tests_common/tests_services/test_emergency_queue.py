@@ -1,10 +1,21 @@
+import random
+import threading
+import time
 from datetime import datetime, timedelta
 
 import pytest
 
+from common.models.db import DatabaseManager
 from common.models.emergency import Emergency
 from common.models.enc_emergency import EncryptedEmergency
-from common.services.emergency_queue import EmergencyQueue, SeverityType
+from common.services.emergency_queue import (
+    Admission,
+    AdmissionStats,
+    DispatchWeights,
+    EmergencyQueue,
+    IndexedHeap,
+    SeverityType,
+)
 from tests.utils import not_raises
 
 # ---- Fixtures ----
@@ -18,6 +29,9 @@ def emergency_queue():
     eq.low_queue.clear()
     eq.medium_queue.clear()
     eq.high_queue.clear()
+    eq.weights = DispatchWeights()
+    eq.disable_journal()
+    eq.reset_admission_stats()
     return eq
 
 
@@ -78,7 +92,7 @@ def test_push_and_pop_low(emergency_queue, emergency_factory):
 
 def test_push_and_pop_medium_high(emergency_queue, emergency_factory):
     em_medium = emergency_factory(severity=40)
-    em_high = emergency_factory(severity=70)
+    em_high = emergency_factory(severity=70, emergency_id=2)
 
     emergency_queue.push_emergency(em_medium)
     emergency_queue.push_emergency(em_high)
@@ -134,7 +148,9 @@ def test_mixed_emergencies(
 def test_multiple_same_severity_ordering(emergency_queue, emergency_factory):
     now = datetime.now()
     em1 = emergency_factory(severity=10, created_at=now)
-    em2 = emergency_factory(severity=10, created_at=now + timedelta(seconds=10))
+    em2 = emergency_factory(
+        severity=10, emergency_id=2, created_at=now + timedelta(seconds=10)
+    )
     emergency_queue.push_emergency(em1)
     emergency_queue.push_emergency(em2)
 
@@ -252,3 +268,481 @@ def test_update_emergency_category_partition(
             )
     else:
         emergency_queue.update_emergency(old_emergency_severity=old_sev, emergency=upd)
+
+
+# ---- Tests of the indexed heap ----
+
+
+def test_indexed_heap_matches_sorted_order():
+    rng = random.Random(7)
+    heap = IndexedHeap()
+    expected = {}
+
+    for i in range(500):
+        priority = (rng.randrange(50),)
+        heap.push(i, priority, i)
+        expected[i] = priority
+    for i in rng.sample(range(500), 150):
+        priority = (rng.randrange(50),)
+        heap.update(i, priority, i)
+        expected[i] = priority
+    for i in rng.sample(range(500), 100):
+        assert heap.remove(i) == i
+        del expected[i]
+
+    ordered = list(heap.ordered())
+    assert len(heap) == len(expected)
+
+    popped = [heap.pop() for _ in range(len(heap))]
+    assert ordered == popped
+    # Ties are popped in push order
+    assert popped == sorted(expected, key=lambda i: (-expected[i][0], i))
+    assert not heap.get(popped[0])
+
+
+def test_indexed_heap_missing_identity():
+    heap = IndexedHeap()
+
+    with pytest.raises(KeyError):
+        heap.remove("missing")
+    with pytest.raises(IndexError):
+        heap.peek()
+
+
+@pytest.mark.parametrize("initial", [0, 1000])
+def test_indexed_heap_push_many(initial):
+    # Small batches are pushed one by one, large ones heapified
+    rng = random.Random(initial)
+    heap = IndexedHeap()
+    expected = {}
+
+    for i in range(initial):
+        expected[i] = (rng.randrange(50),)
+        heap.push(i, expected[i], i)
+
+    batch = []
+    for i in rng.sample(range(initial + 200), 200) + [initial + 7]:
+        expected[i] = (rng.randrange(50),)
+        batch.append((i, expected[i], i))
+    heap.push_many(batch)
+
+    # Ties are popped in push order, updated items keep their place
+    pushed = dict.fromkeys([*range(initial), *(i for i, _, _ in batch)])
+    order = {i: n for n, i in enumerate(pushed)}
+    assert [heap.pop() for _ in range(len(heap))] == sorted(
+        expected, key=lambda i: (-expected[i][0], order[i])
+    )
+
+
+def test_indexed_heap_push_many_keeps_priority_order():
+    heap = IndexedHeap()
+    heap.push_many((i, (i % 10,), i) for i in range(100))
+    heap.push_many((i, (i % 10,), i) for i in range(100, 110))
+
+    popped = [heap.pop() for _ in range(len(heap))]
+    assert [p % 10 for p in popped] == sorted((p % 10 for p in popped), reverse=True)
+    # Ties are popped in push order
+    assert [p for p in popped if p % 10 == 9] == list(range(9, 110, 10))
+
+
+def test_indexed_heap_snapshot_is_isolated():
+    heap = IndexedHeap()
+    for i in range(10):
+        heap.push(i, (i,), i)
+
+    snapshot = heap.snapshot()
+    heap.pop()
+    heap.update(0, (100,), "updated")
+    heap.remove(5)
+    heap.push(20, (20,), 20)
+
+    assert list(snapshot.ordered()) == list(range(9, -1, -1))
+    assert list(heap.ordered()) == ["updated", 20, 8, 7, 6, 4, 3, 2, 1]
+
+    heap.clear()
+    assert len(snapshot) == 10
+
+
+def test_update_emergency_same_tier_reorders(emergency_queue, emergency_factory):
+    now = datetime.now()
+    em1 = emergency_factory(severity=10, emergency_id=1, created_at=now)
+    em2 = emergency_factory(severity=20, emergency_id=2, created_at=now)
+    emergency_queue.push_emergency(em1)
+    emergency_queue.push_emergency(em2)
+
+    upd = emergency_factory(severity=30, emergency_id=1, created_at=now)
+    emergency_queue.update_emergency(old_emergency_severity=10, emergency=upd)
+
+    assert emergency_queue.pop_emergency(SeverityType.LOW) is upd
+    assert emergency_queue.pop_emergency(SeverityType.LOW) is em2
+    assert len(emergency_queue.low_queue) == 0
+
+
+def test_remove_emergency(emergency_queue, emergency_factory):
+    em1 = emergency_factory(severity=70, emergency_id=1)
+    em2 = emergency_factory(severity=80, emergency_id=2)
+    emergency_queue.push_emergency(em1)
+    emergency_queue.push_emergency(em2)
+
+    assert emergency_queue.remove_emergency(em2) is em2
+    assert emergency_queue.pop_emergency(SeverityType.HIGH) is em1
+
+    with pytest.raises(ValueError):
+        emergency_queue.remove_emergency(em2)
+
+
+# ---- Tests of the blocking consumers ----
+
+
+def test_pop_takes_highest_tier_first(emergency_queue, emergency_factory):
+    low = emergency_factory(severity=10, emergency_id=1)
+    high = emergency_factory(severity=90, emergency_id=2)
+    emergency_queue.push_emergency(low)
+    emergency_queue.push_emergency(high)
+
+    assert emergency_queue.pop_batch(5) == [high, low]
+    assert emergency_queue.pop(timeout=0.01) is None
+    assert emergency_queue.pop_batch(5, timeout=0.01) == []
+
+
+def test_pop_waits_for_push(emergency_queue, emergency_factory):
+    em = emergency_factory(severity=50)
+    timer = threading.Timer(0.05, emergency_queue.push_emergency, args=(em,))
+    timer.start()
+
+    assert emergency_queue.pop(timeout=5) is em
+    timer.join()
+
+
+def test_waiting_consumers_served_in_arrival_order(emergency_queue, emergency_factory):
+    now = datetime.now()
+    results = {}
+
+    def consume(i):
+        results[i] = emergency_queue.pop(timeout=5)
+
+    consumers = []
+    for i in range(3):
+        thread = threading.Thread(target=consume, args=(i,))
+        thread.start()
+        consumers.append(thread)
+        while len(emergency_queue._EmergencyQueue__waiters) <= i:
+            time.sleep(0.001)
+
+    ems = [
+        emergency_factory(
+            severity=10, emergency_id=i, created_at=now + timedelta(seconds=i)
+        )
+        for i in range(3)
+    ]
+    for em in ems:
+        emergency_queue.push_emergency(em)
+    for thread in consumers:
+        thread.join(5)
+
+    assert [results[i] for i in range(3)] == ems
+
+
+# ---- Tests of the scheduler ----
+
+
+def fill_tiers(emergency_queue, emergency_factory, per_tier):
+    for i in range(per_tier):
+        for severity in (10, 50, 90):
+            emergency_queue.push_emergency(
+                emergency_factory(severity=severity, emergency_id=severity * 1000 + i)
+            )
+
+
+def test_next_interleaves_by_weight(emergency_queue, emergency_factory):
+    fill_tiers(emergency_queue, emergency_factory, 20)
+
+    picked = [
+        emergency_queue.severity_type(emergency_queue.next().severity)
+        for _ in range(10)
+    ]
+
+    assert picked.count(SeverityType.HIGH) == 6
+    assert picked.count(SeverityType.MEDIUM) == 3
+    assert picked.count(SeverityType.LOW) == 1
+    # Interleaved, not HIGH six times in a row
+    assert picked[:6] != [SeverityType.HIGH] * 6
+
+
+def test_next_zero_weight_serves_when_alone(emergency_queue, emergency_factory):
+    emergency_queue.weights = DispatchWeights(low=0)
+    fill_tiers(emergency_queue, emergency_factory, 2)
+
+    picked = [
+        emergency_queue.severity_type(emergency_queue.next(timeout=0).severity)
+        for _ in range(6)
+    ]
+
+    assert picked[4:] == [SeverityType.LOW, SeverityType.LOW]
+    assert emergency_queue.next(timeout=0.01) is None
+
+
+def test_negative_weight_raises():
+    with pytest.raises(ValueError):
+        DispatchWeights(medium=-1)
+
+
+# ---- Tests of the journal ----
+
+
+@pytest.fixture
+def journal():
+    DatabaseManager._DatabaseManager__instance = None
+    dbm = DatabaseManager.get_instance(":memory:")
+    yield dbm
+    dbm.close()
+    DatabaseManager._DatabaseManager__instance = None
+
+
+def test_journal_survives_restart(
+    emergency_queue, journal, emergency_factory, encrypted_emergency_factory
+):
+    now = datetime.now()
+    ems = [
+        emergency_factory(severity=sev, emergency_id=i, created_at=now)
+        for i, sev in enumerate((10, 20, 50, 90))
+    ]
+    enc = encrypted_emergency_factory(severity=70, created_at=now)
+    journal.insert_emergencies_many(ems)
+    journal.insert_encrypted_emergency(enc)
+
+    emergency_queue.push_emergency(ems[0])
+    assert emergency_queue.enable_journal(journal) == 1
+    for em in ems[1:]:
+        emergency_queue.push_emergency(em)
+    emergency_queue.push_emergency(enc)
+
+    assert emergency_queue.pop().emergency_id == 3
+    emergency_queue.update_emergency(20, emergency_factory(
+        severity=60, emergency_id=1, created_at=now
+    ))
+    emergency_queue.remove_emergency(ems[2])
+
+    # Restart: the queue in memory is lost, the journal is reloaded
+    emergency_queue.disable_journal()
+    for heap in emergency_queue.queue:
+        heap.clear()
+    assert emergency_queue.enable_journal(journal) == 3
+
+    assert emergency_queue.pop_emergency(SeverityType.HIGH).user_uuid == "user_enc"
+    assert emergency_queue.pop_emergency(SeverityType.MEDIUM).emergency_id == 1
+    assert [em.emergency_id for em in emergency_queue.pop_batch(5)] == [0]
+    assert journal.get_queue_entries() == []
+
+
+def test_push_many(emergency_queue, emergency_factory):
+    now = datetime.now()
+    emergency_queue.push_emergency(emergency_factory(severity=20, emergency_id=0))
+    emergency_queue.push_many(
+        emergency_factory(
+            severity=sev, emergency_id=i, created_at=now - timedelta(seconds=i)
+        )
+        for i, sev in enumerate((10, 90, 50, 90, 20))
+    )
+
+    assert len(emergency_queue) == 5
+    assert [em.emergency_id for em in emergency_queue.pop_batch(5)] == [3, 1, 2, 4, 0]
+
+    with pytest.raises(ValueError):
+        emergency_queue.push_many(
+            [emergency_factory(severity=10), emergency_factory(severity=-1)]
+        )
+    assert len(emergency_queue) == 0
+
+
+def test_peek_does_not_mutate(emergency_queue, emergency_factory):
+    now = datetime.now()
+    emergency_queue.push_many(
+        emergency_factory(severity=sev, emergency_id=i, created_at=now)
+        for i, sev in enumerate((10, 90, 50, 70, 20))
+    )
+
+    assert [em.emergency_id for em in emergency_queue.peek(3)] == [1, 3, 2]
+    assert [em.emergency_id for em in emergency_queue.peek(5, SeverityType.LOW)] == [4, 0]
+    assert emergency_queue.peek(0) == []
+    assert len(emergency_queue) == 5
+    assert emergency_queue.pop().emergency_id == 1
+
+
+def test_snapshot_is_isolated(emergency_queue, emergency_factory):
+    now = datetime.now()
+    for i, sev in enumerate((10, 90, 50)):
+        emergency_queue.push_emergency(
+            emergency_factory(severity=sev, emergency_id=i, created_at=now)
+        )
+
+    snapshot = emergency_queue.snapshot()
+    emergency_queue.pop()
+    emergency_queue.push_emergency(emergency_factory(severity=99, emergency_id=3))
+
+    assert [em.emergency_id for em in snapshot.ordered()] == [1, 2, 0]
+    assert snapshot.count(SeverityType.HIGH) == 1
+    assert [em.emergency_id for em in emergency_queue.peek(4)] == [3, 2, 0]
+
+
+def test_peek_skips_stale_journaled(emergency_queue, journal, emergency_factory):
+    now = datetime.now()
+    ems = [
+        emergency_factory(severity=sev, emergency_id=i, created_at=now)
+        for i, sev in enumerate((10, 90, 50))
+    ]
+    journal.insert_emergencies_many(ems)
+    emergency_queue.enable_journal(journal)
+    emergency_queue.push_many(ems)
+
+    # Restart, then resolve one of the reloaded emergencies
+    emergency_queue.disable_journal()
+    for heap in emergency_queue.queue:
+        heap.clear()
+    emergency_queue.enable_journal(journal)
+    resolved = emergency_factory(severity=90, emergency_id=1, created_at=now)
+    resolved.resolved = True
+    journal.update_emergency(resolved.user_uuid, 1, resolved)
+
+    assert [em.emergency_id for em in emergency_queue.peek(3)] == [2, 0]
+    assert len(emergency_queue) == 3
+
+
+def test_repeat_pushes_are_coalesced(emergency_queue, emergency_factory):
+    now = datetime.now()
+    em = emergency_factory(severity=10, created_at=now)
+
+    assert emergency_queue.push_emergency(em, source="ble") is Admission.ADMITTED
+    for _ in range(3):
+        relayed = emergency_factory(severity=10, created_at=now)
+        admission = emergency_queue.push_emergency(relayed, source="relay")
+        assert admission is Admission.DROPPED
+    assert len(emergency_queue) == 1
+    assert emergency_queue.peek()[0] is em
+
+    escalated = emergency_factory(severity=90, created_at=now)
+    admission = emergency_queue.push_emergency(escalated, source="cloud")
+    assert admission is Admission.COALESCED
+    assert len(emergency_queue) == 1
+    assert emergency_queue.pop_emergency(SeverityType.HIGH) is escalated
+
+    assert emergency_queue.admission_stats() == {
+        "ble": AdmissionStats(admitted=1),
+        "relay": AdmissionStats(dropped=3),
+        "cloud": AdmissionStats(coalesced=1),
+    }
+
+
+def test_push_many_deduplicates(emergency_queue, emergency_factory):
+    now = datetime.now()
+    emergency_queue.push_emergency(
+        emergency_factory(severity=10, emergency_id=1, created_at=now)
+    )
+
+    stats = emergency_queue.push_many(
+        [
+            emergency_factory(severity=10, emergency_id=1, created_at=now),
+            emergency_factory(severity=50, emergency_id=2, created_at=now),
+            emergency_factory(severity=50, emergency_id=2, created_at=now),
+            emergency_factory(severity=80, emergency_id=2, created_at=now),
+            emergency_factory(severity=70, emergency_id=1, created_at=now),
+        ],
+        source="relay",
+    )
+
+    assert stats == AdmissionStats(admitted=1, coalesced=2, dropped=2)
+    assert emergency_queue.admission_stats()["relay"] == stats
+    assert [(em.emergency_id, em.severity) for em in emergency_queue.pop_batch(5)] == [
+        (2, 80),
+        (1, 70),
+    ]
+
+
+def test_remove_emergency_any_severity(emergency_queue, emergency_factory):
+    emergency_queue.push_emergency(emergency_factory(severity=90))
+
+    stale = emergency_factory(severity=10)
+    assert emergency_queue.remove_emergency(stale).severity == 90
+    assert len(emergency_queue) == 0
+
+
+def test_coalesced_push_moves_journal_entry(emergency_queue, journal, emergency_factory):
+    now = datetime.now()
+    em = emergency_factory(severity=10, created_at=now)
+    journal.insert_emergencies_many([em])
+    emergency_queue.enable_journal(journal)
+
+    emergency_queue.push_emergency(em)
+    escalated = emergency_factory(severity=90, created_at=now)
+    journal.update_emergency(em.user_uuid, em.emergency_id, escalated)
+    emergency_queue.push_emergency(escalated)
+
+    assert [entry[:4] for entry in journal.get_queue_entries()] == [
+        (SeverityType.HIGH.value, "emergency", em.user_uuid, em.emergency_id)
+    ]
+
+
+def test_journal_reload_keeps_new_severity(emergency_queue, journal, emergency_factory):
+    now = datetime.now()
+    em = emergency_factory(severity=10, created_at=now)
+    journal.insert_emergencies_many([em])
+    emergency_queue.enable_journal(journal)
+    emergency_queue.push_emergency(em)
+
+    # Restart, and the emergency is escalated before the journal is reloaded
+    emergency_queue.disable_journal()
+    for heap in emergency_queue.queue:
+        heap.clear()
+    escalated = emergency_factory(severity=90, created_at=now)
+    journal.update_emergency(em.user_uuid, em.emergency_id, escalated)
+    emergency_queue.push_emergency(escalated)
+
+    assert emergency_queue.enable_journal(journal) == 1
+    assert [entry[:4] for entry in journal.get_queue_entries()] == [
+        (SeverityType.HIGH.value, "emergency", em.user_uuid, em.emergency_id)
+    ]
+    assert emergency_queue.pop() is escalated
+    assert emergency_queue.pop(timeout=0) is None
+    assert journal.get_queue_entries() == []
+
+
+def test_journaled_emergency_loaded_outside_lock(
+    monkeypatch, emergency_queue, journal, emergency_factory
+):
+    now = datetime.now()
+    ems = [
+        emergency_factory(severity=sev, emergency_id=i, created_at=now)
+        for i, sev in enumerate((90, 50))
+    ]
+    journal.insert_emergencies_many(ems)
+    emergency_queue.enable_journal(journal)
+    emergency_queue.push_many(ems)
+
+    emergency_queue.disable_journal()
+    for heap in emergency_queue.queue:
+        heap.clear()
+    emergency_queue.enable_journal(journal)
+    journal.delete_emergency(ems[0].user_uuid, 0)
+
+    lock = emergency_queue._EmergencyQueue__lock
+    get_emergency_by_id = journal.get_emergency_by_id
+
+    def unlocked_get(*args):
+        assert lock.acquire(blocking=False)
+        lock.release()
+        return get_emergency_by_id(*args)
+
+    monkeypatch.setattr(journal, "get_emergency_by_id", unlocked_get)
+
+    # The deleted emergency is skipped, and the next one taken
+    assert emergency_queue.pop(timeout=0).emergency_id == 1
+
+
+def test_peek_takes_no_snapshot(emergency_queue, emergency_factory):
+    emergency_queue.push_many(
+        emergency_factory(severity=sev, emergency_id=i) for i, sev in enumerate((10, 90))
+    )
+
+    assert [em.emergency_id for em in emergency_queue.peek(2)] == [1, 0]
+    # NOTE: A shared heap would be copied by the next push
+    assert not any(heap._IndexedHeap__shared for heap in emergency_queue.queue)
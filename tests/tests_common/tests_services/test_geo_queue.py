@@ -0,0 +1,135 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import pytest
+
+from common.models.geometry import haversine
+from common.models.emergency import Emergency
+from common.services.geo_queue import GeoEmergencyQueue
+
+# Around Salerno
+CENTER = (40.68, 14.77)
+
+
+@dataclass
+class FakeRescuer:
+    position: tuple[float, float] | None
+    busy: bool = False
+
+
+@pytest.fixture
+def geo_queue():
+    gq = GeoEmergencyQueue.get_instance()
+    gq.clear()
+    return gq
+
+
+def make_emergency(emergency_id, position, severity=50, age=0):
+    return Emergency(
+        emergency_id=emergency_id,
+        user_uuid="user1",
+        severity=severity,
+        emergency_type="fire",
+        description="desc",
+        created_at=datetime(2024, 1, 1) - timedelta(seconds=age),
+        position=position,
+    )
+
+
+def offset(meters_north, meters_east):
+    lat = CENTER[0] + meters_north / 111_195
+    lon = CENTER[1] + meters_east / (111_195 * 0.7584)
+    return (lat, lon)
+
+
+def test_singleton():
+    with pytest.raises(TypeError):
+        GeoEmergencyQueue()
+    assert GeoEmergencyQueue.get_instance() is GeoEmergencyQueue.get_instance()
+
+
+def test_unknown_position_raises(geo_queue):
+    with pytest.raises(ValueError):
+        geo_queue.push_emergency(make_emergency(1, (0.0, 0.0)))
+
+
+def test_nearest_prefers_priority_within_radius(geo_queue):
+    geo_queue.push_emergency(make_emergency(1, offset(500, 0), severity=40))
+    geo_queue.push_emergency(make_emergency(2, offset(0, 3000), severity=60))
+    geo_queue.push_emergency(make_emergency(3, offset(20_000, 0), severity=90))
+
+    assert geo_queue.peek_nearest(*CENTER, 5000).emergency_id == 2
+    assert geo_queue.peek_nearest(*CENTER, 1000).emergency_id == 1
+    assert geo_queue.peek_nearest(*CENTER, 100) is None
+    assert geo_queue.peek_nearest(*CENTER, 30_000).emergency_id == 3
+
+    assert geo_queue.pop_nearest(*CENTER, 5000).emergency_id == 2
+    assert geo_queue.pop_nearest(*CENTER, 5000).emergency_id == 1
+    assert geo_queue.pop_nearest(*CENTER, 5000) is None
+    assert len(geo_queue) == 1
+
+    with pytest.raises(ValueError):
+        geo_queue.peek_nearest(*CENTER, -1)
+
+
+def test_push_again_moves_emergency(geo_queue):
+    geo_queue.push_emergency(make_emergency(1, offset(0, 0)))
+    geo_queue.push_emergency(make_emergency(1, offset(50_000, 0)))
+
+    assert len(geo_queue) == 1
+    assert geo_queue.peek_nearest(*CENTER, 1000) is None
+    assert geo_queue.remove_emergency(make_emergency(1, offset(0, 0))) is not None
+    assert geo_queue.remove_emergency(make_emergency(1, offset(0, 0))) is None
+    assert len(geo_queue) == 0
+
+
+def test_nearest_matches_brute_force(geo_queue):
+    rng = random.Random(7)
+    emergencies = [
+        make_emergency(
+            i,
+            offset(rng.uniform(-30_000, 30_000), rng.uniform(-30_000, 30_000)),
+            severity=rng.randrange(100),
+            age=rng.randrange(1000),
+        )
+        for i in range(1, 2001)
+    ]
+    for em in emergencies:
+        geo_queue.push_emergency(em)
+
+    for _ in range(50):
+        point = offset(rng.uniform(-30_000, 30_000), rng.uniform(-30_000, 30_000))
+        radius = rng.uniform(500, 10_000)
+        within = [
+            em for em in emergencies if haversine(*point, *em.position) <= radius
+        ]
+        expected = max(
+            within, key=lambda em: (em.severity, -em.created_at.timestamp()), default=None
+        )
+
+        found = geo_queue.peek_nearest(*point, radius)
+        assert (found and found.emergency_id) == (expected and expected.emergency_id)
+
+
+def test_match_rescuers(geo_queue):
+    geo_queue.push_emergency(make_emergency(1, offset(0, 500), severity=90))
+    geo_queue.push_emergency(make_emergency(2, offset(0, 800), severity=30))
+    geo_queue.push_emergency(make_emergency(3, offset(40_000, 0), severity=99))
+
+    rescuers = {
+        "r1": FakeRescuer(CENTER),
+        "r2": FakeRescuer(offset(0, 1000)),
+        "r3": FakeRescuer(CENTER, busy=True),
+        "r4": FakeRescuer(None),
+    }
+
+    matches = geo_queue.match_rescuers(rescuers, 2000)
+
+    assert sorted((uuid, em.emergency_id) for uuid, em in matches) in (
+        [("r1", 1), ("r2", 2)],
+        [("r1", 2), ("r2", 1)],
+    )
+    assert [em.emergency_id for _, em in matches] == [1, 2]
+    assert len(geo_queue) == 1
+    assert geo_queue.match_rescuers(rescuers, 2000) == []
@@ -1,6 +1,7 @@
 import pytest
 import sys
 import random
+import tracemalloc
 
 from pathlib import Path
 from contextlib import contextmanager
@@ -26,6 +27,32 @@ def not_raises(ex):
     except Exception:
         pass
 
+def bytes_per_instance(factory: Callable[[], object], n: int = 10_000) -> float:
+    """
+    Measure the memory allocated by each object built by `factory`
+
+    The fields passed by `factory` are shared between the instances, so only
+    the instance itself and its attribute storage are counted.
+
+    Args:
+        factory (Callable[[], object]): builds one instance
+        n (int): number of instances to average over (default: 10_000)
+
+    Returns:
+        float: bytes allocated per instance, list slot excluded
+    """
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        instances = [factory() for _ in range(n)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # NOTE: Each instance also takes a pointer in the list
+    return (after - before) / len(instances) - 8
+
 def test_type_combs(func: Callable,
                     num_required: int,
                     num_default: int,